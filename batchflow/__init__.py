@@ -1,13 +1,13 @@
 """ BatchFlow enables a fast processing of large dataset using flexible pipelines """
 
 import sys
+import importlib
 
 if sys.version_info < (3, 5):
     raise ImportError("BatchFlow module requires Python 3.5 or higher")
 
 from .base import Baseset
 from .batch import Batch
-from .batch_image import ImagesBatch
 from .config import Config
 from .dataset import Dataset
 from .pipeline import Pipeline
@@ -17,8 +17,37 @@ from .named_expr import NamedExpression, B, C, F, L, V, M, D, R, W, P, I
 from .dsindex import DatasetIndex, FilesIndex
 from .decorators import action, inbatch_parallel, parallel, any_action_failed, mjit, deprecated, apply_parallel
 from .exceptions import SkipBatchException, EmptyBatchSequence
-from .sampler import Sampler, ConstantSampler, NumpySampler, HistoSampler, ScipySampler
 from .utils import save_data_to
 
 
+# names which are imported from submodules with heavy dependencies only when they are accessed
+_LAZY = {
+    'batch_image': ['ImagesBatch', 'StackedImagesBatch'],
+    'sampler': ['Sampler', 'ConstantSampler', 'NumpySampler', 'HistoSampler', 'ScipySampler'],
+}
+_LAZY = {name: module for module, names in _LAZY.items() for name in names}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        value = getattr(importlib.import_module('.' + _LAZY[name], __name__), name)
+        globals()[name] = value
+        return value
+    try:
+        # submodules, e.g. `batchflow.models` or `batchflow.research`
+        return importlib.import_module('.' + name, __name__)
+    except ModuleNotFoundError as e:
+        if e.name != __name__ + '.' + name:
+            raise
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+def __dir__():
+    return sorted([*globals(), *_LAZY])
+
+if sys.version_info < (3, 7):
+    # module __getattr__ (PEP 562) is not supported
+    for _name in _LAZY:
+        __getattr__(_name)
+
+
 __version__ = '0.3.0'
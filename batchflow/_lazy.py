@@ -0,0 +1,40 @@
+""" Deferred imports of heavy dependencies """
+import sys
+import importlib
+
+
+class LazyModule:
+    """ Module proxy which imports the module at the first access to its attributes.
+
+    Parameters
+    ----------
+    name : str
+        module name, e.g. 'pandas' or 'pyarrow.feather'
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        return '<lazy module {}>'.format(self._name)
+
+
+def isinstance_lazy(obj, module, *classes):
+    """ Check whether `obj` is an instance of any of `classes` from `module` without importing the module:
+    until the module is imported there are no instances of its classes.
+
+    Examples
+    --------
+    ::
+
+        isinstance_lazy(data, 'pandas', 'DataFrame', 'Series')
+    """
+    module = sys.modules.get(module)
+    if module is None:
+        return False
+    return isinstance(obj, tuple(getattr(module, cls) for cls in classes))
@@ -5,33 +5,54 @@ import traceback
 import threading
 import warnings
 import functools
+import copy as cp
 
 import dill
-try:
-    import blosc
-except ImportError:
-    pass
 import numpy as np
-try:
-    import pandas as pd
-except ImportError:
-    import _fake as pd
-try:
-    import feather
-except ImportError:
-    pass
-try:
-    import dask.dataframe as dd
-except ImportError:
-    import _fake as dd
 
+from ._lazy import LazyModule, isinstance_lazy
 from .dsindex import DatasetIndex, FilesIndex
 # renaming apply_parallel decorator is needed as Batch.apply_parallel method is also in the same namespace
 # and can serve as a decorator too
 from .decorators import action, inbatch_parallel, any_action_failed, apply_parallel as apply_parallel_
 from .components import create_item_class, BaseComponents
+from .sources import TableSource, read_file
 from .named_expr import P, R
 
+blosc = LazyModule('blosc')
+pd = LazyModule('pandas')
+feather = LazyModule('feather')
+
+# the first positional argument of the original table readers (`pd.read_csv`, `pd.read_hdf`, `feather.read_dataframe`)
+TABLE_POSITIONAL_ARGS = dict(csv='sep', hdf5='key', feather='columns')
+
+
+def _copy_data(data):
+    """ Copy batch data structure with arrays in it (raise TypeError for unknown types) """
+    if data is None or isinstance(data, (str, bytes, int, float, complex, np.generic)):
+        return data
+    if isinstance(data, np.ndarray):
+        if data.dtype == object:
+            new_data = np.empty_like(data)
+            for i, item in enumerate(data.flat):
+                new_data.flat[i] = _copy_data(item)
+            return new_data
+        return np.array(data)
+    if isinstance_lazy(data, 'pandas', 'DataFrame', 'Series'):
+        return data.copy()
+    if isinstance(data, BaseComponents) and data._crop:     # pylint: disable=protected-access
+        # cropped components own their data, while others refer to the data source
+        new_data = cp.copy(data)
+        new_data.data = _copy_data(data.data)
+        return new_data
+    if isinstance(data, tuple) and hasattr(data, '_fields'):
+        return type(data)(*[_copy_data(item) for item in data])
+    if type(data) in (list, tuple):
+        return type(data)(_copy_data(item) for item in data)
+    if isinstance(data, dict) and type(data).__init__ is dict.__init__:
+        return type(data)((key, _copy_data(value)) for key, value in data.items())
+    raise TypeError("Cannot copy %s" % type(data))
+
 
 class MethodsTransformingMeta(type):
     """ A metaclass to transform all class methods in the way described below:
@@ -101,6 +122,8 @@ class Batch(metaclass=MethodsTransformingMeta):
         self._dataset = dataset
         self._pipeline = pipeline
         self._attrs = None
+        # a random state for named expressions R, set by a pipeline with `random_seed`
+        self.random_state = None
         self.create_attrs(**kwargs)
 
     def create_attrs(self, **kwargs):
@@ -157,6 +180,22 @@ class Batch(metaclass=MethodsTransformingMeta):
         self._pipeline = val
 
     def __copy__(self):
+        try:
+            data = _copy_data(self._data)
+            attrs = {attr: cp.copy(getattr(self, attr)) for attr in self._attrs or []}
+        except TypeError:
+            return self._dill_copy()
+
+        state = self.__dict__.copy()
+        state.update(attrs)
+        state.update(_data_named=None, _data=data, _local=None, _preloaded_lock=True)
+
+        new_batch = type(self).__new__(type(self))
+        new_batch.__setstate__(state)
+        new_batch.pipeline = self.pipeline
+        return new_batch
+
+    def _dill_copy(self):
         pipeline = self.pipeline
         self.pipeline = None
         dump_batch = dill.dumps(self)
@@ -166,6 +205,19 @@ class Batch(metaclass=MethodsTransformingMeta):
         restored_batch.pipeline = pipeline
         return restored_batch
 
+    def copy(self):
+        """ Return a copy of the batch.
+
+        Numpy arrays and pandas objects in the batch data as well as batch attributes are copied,
+        while the index, the dataset and the pipeline are shared with the original batch.
+        Batches with other data types are copied through serialization.
+
+        Returns
+        -------
+        Batch
+        """
+        return cp.copy(self)
+
     def deepcopy(self):
         """ Return a deep copy of the batch.
 
@@ -177,7 +229,11 @@ class Batch(metaclass=MethodsTransformingMeta):
         -------
         Batch
         """
-        return self.copy()
+        pipeline = self.pipeline
+        # the pipeline is put into the memo, so it is shared and not copied
+        new_batch = cp.deepcopy(self, memo={id(pipeline): pipeline})
+        new_batch.pipeline = pipeline
+        return new_batch
 
     @classmethod
     def from_data(cls, index, data):
@@ -408,7 +464,7 @@ class Batch(metaclass=MethodsTransformingMeta):
 
     def __setstate__(self, state):
         state['_preloaded_lock'] = threading.Lock() if state['_preloaded_lock'] else None
-        state['_local'] = threading.Lock() if state['_local'] else None
+        state['_local'] = threading.local() if state['_local'] else None
 
         for k, v in state.items():
             # this warrants that all hidden objects are reconstructed upon unpickling
@@ -723,17 +779,35 @@ class Batch(metaclass=MethodsTransformingMeta):
             self._assemble_component(result, component=component, **kwargs)
         return self
 
+    def _read_file(self, path, path_method=None, src=None):
+        """ Return file contents which might have been read in advance (see :meth:`~.Dataset.read_ahead`)
+
+        Parameters
+        ----------
+        path : str
+            a file path
+        path_method : str or None
+            a name of the method which has built the path from an item index and `src`
+        src
+            a source passed to `path_method`
+        """
+        reader = getattr(self._dataset, 'reader', None)
+        if reader is None:
+            return read_file(path)
+        if path_method is not None:
+            reader.register(path_method, src)
+        return reader.read(path)
+
     @inbatch_parallel('indices', post='_assemble', target='f', dst_default='components')
     def _load_blosc(self, ix, src=None, dst=None):
         """ Load data from a blosc packed file """
         file_name = self._get_file_name(ix, src)
-        with open(file_name, 'rb') as f:
-            data = dill.loads(blosc.decompress(f.read()))
-            components = tuple(dst or self.components)
-            try:
-                item = tuple(data[i] for i in components)
-            except Exception as e:
-                raise KeyError('Cannot find components in corresponfig file', e)
+        data = dill.loads(blosc.decompress(self._read_file(file_name, '_get_file_name', src)))
+        components = tuple(dst or self.components)
+        try:
+            item = tuple(data[i] for i in components)
+        except Exception as e:
+            raise KeyError('Cannot find components in corresponfig file', e)
         return item
 
     @inbatch_parallel('indices', target='f')
@@ -751,20 +825,23 @@ class Batch(metaclass=MethodsTransformingMeta):
             f.write(blosc.compress(dill.dumps(data)))
 
     def _load_table(self, src, fmt, dst=None, post=None, *args, **kwargs):
-        """ Load a data frame from table formats: csv, hdf5, feather """
-        if fmt == 'csv':
-            _data = pd.read_csv(src, *args, **kwargs)
-        elif fmt == 'feather':
-            _data = feather.read_dataframe(src, *args, **kwargs)
-        elif fmt == 'hdf5':
-            _data = pd.read_hdf(src, *args, **kwargs)
+        """ Load a data frame from table formats: csv, hdf5, feather
+
+        Only the rows for the batch items are read. A file is opened once per dataset
+        (see :meth:`~.Dataset.get_table_source`) or `src` might be a :class:`~.TableSource` itself.
+        """
+        if isinstance(src, TableSource):
+            source = src
+        else:
+            if len(args) > 0:
+                kwargs[TABLE_POSITIONAL_ARGS[fmt]] = args[0]
+            if hasattr(self._dataset, 'get_table_source'):
+                source = self._dataset.get_table_source(src, fmt, **kwargs)
+            else:
+                source = TableSource(src, fmt, **kwargs)
 
         # Put into this batch only part of it (defined by index)
-        if isinstance(_data, pd.DataFrame):
-            _data = _data.loc[self.indices]
-        elif isinstance(_data, dd.DataFrame):
-            # dask.DataFrame.loc supports advanced indexing only with lists
-            _data = _data.loc[list(self.indices)].compute()
+        _data = source.read(self.indices)
 
         if callable(post):
             _data = post(_data, src=src, fmt=fmt, dst=dst, **kwargs)
@@ -787,7 +864,7 @@ class Batch(metaclass=MethodsTransformingMeta):
         data_dict = {}
         for comp in components:
             comp_data = self.get(component=comp)
-            if isinstance(comp_data, pd.DataFrame):
+            if isinstance_lazy(comp_data, 'pandas', 'DataFrame'):
                 data_dict.update(comp_data.to_dict('series'))
             elif isinstance(comp_data, np.ndarray):
                 if comp_data.ndim > 1:
@@ -875,13 +952,19 @@ class Batch(metaclass=MethodsTransformingMeta):
         Load data from a CSV file columns into components `features` and `labels`::
 
             batch.load(fmt='csv', src='/path/to/file.csv', dst=('features', 'labels`), index_col=0)
+
+        Load data from an already opened table::
+
+            batch.load(src=TableSource('/path/to/file.feather'), dst=('features', 'labels'))
         """
         _ = args
 
         if dst is not None:
             self.add_components(np.setdiff1d(dst, self.components).tolist())
 
-        if fmt is None:
+        if isinstance(src, TableSource):
+            self._load_table(src=src, fmt=src.fmt, dst=dst, **kwargs)
+        elif fmt is None:
             self._load_from_source(src=src, dst=dst)
         elif fmt == 'blosc':
             self._load_blosc(src=src, dst=dst, **kwargs)
@@ -1,5 +1,6 @@
 """ Contains Batch classes for images """
 import os
+import io
 import warnings
 from numbers import Number
 
@@ -16,6 +17,7 @@ import PIL.ImageEnhance
 from .batch import Batch
 from .decorators import action, apply_parallel, inbatch_parallel
 from .dsindex import FilesIndex
+from .named_expr import P
 
 
 def get_scipy_transforms():
@@ -263,7 +265,8 @@ class ImagesBatch(BaseImagesBatch):
         fmt : str
             Format of an image.
         """
-        return PIL.Image.open(self._make_path(ix, src))
+        path = self._make_path(ix, src)
+        return PIL.Image.open(io.BytesIO(self._read_file(path, '_make_path', src)))
 
     @inbatch_parallel(init='indices')
     def _dump_image(self, ix, src='images', dst=None, fmt=None):
@@ -1169,3 +1172,542 @@ class ImagesBatch(BaseImagesBatch):
         if shape[-1] == 1:
             return PIL.Image.fromarray(np.uint8(distored_image.reshape(image.shape))[..., 0])
         return PIL.Image.fromarray(np.uint8(distored_image.reshape(image.shape)))
+
+
+def _gather(images, rows, cols, fill=0):
+    """ Take pixels at given rows and columns from each image, filling pixels outside images with `fill` """
+    height, width = images.shape[1:3]
+    items = np.arange(len(images)).reshape(-1, 1, 1)
+    valid = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+    result = images[items, np.clip(rows, 0, height - 1), np.clip(cols, 0, width - 1)]
+    if not valid.all():
+        result[~np.broadcast_to(valid, result.shape[:3])] = fill
+    return result
+
+
+def _affine(images, matrices, fill=0):
+    """ Apply PIL-like affine transforms with the nearest neighbour resampling
+
+    Parameters
+    ----------
+    images : np.ndarray
+        images of shape (batch_size, height, width, ...)
+    matrices : np.ndarray
+        inverse transforms of shape (batch_size, 6) in the same form as `data` in `PIL.Image.transform`
+    """
+    a, b, c, d, e, f = [coef.reshape(-1, 1, 1) for coef in np.asarray(matrices, dtype=np.float64).T]
+    x = np.arange(images.shape[2]).reshape(1, 1, -1) + .5
+    y = np.arange(images.shape[1]).reshape(1, -1, 1) + .5
+    cols = a * x + b * y + c
+    rows = d * x + e * y + f
+    # same as pixel coordinates rounding in PIL
+    cols = np.where(cols < 0, -1, cols).astype(np.intp)
+    rows = np.where(rows < 0, -1, rows).astype(np.intp)
+    return _gather(images, rows, cols, fill)
+
+
+class StackedImagesBatch(ImagesBatch):
+    """ Batch class for 2D images of the same shape stored as a single array.
+
+    Images are stored as `np.ndarray` of shape (batch_size, height, width) or (batch_size, height, width, channels),
+    so augmentations like :meth:`.flip`, :meth:`.rotate`, :meth:`.crop`, :meth:`.shift`, :meth:`.multiply`,
+    :meth:`.add`, :meth:`.clip`, :meth:`.invert`, :meth:`.posterize`, :meth:`.cutout` and noises
+    are executed as one numpy operation for the whole batch.
+
+    Per-item parameters given with `P` named expressions (e.g. ``angle=P(R('uniform', -30, 30))``)
+    are evaluated for all items at once and broadcast over the images.
+
+    If images have different shapes, they are stored as an object array and all actions
+    fall back to per-item versions from :class:`.ImagesBatch`. Actions without vectorized versions
+    are always executed per item.
+
+    Notes
+    -----
+    Since images are kept as arrays, PIL images produced by per-item actions are converted back to arrays.
+    Vectorized actions follow the numpy semantics of the per-item actions, e.g. :meth:`.multiply` returns float
+    images unless `preserve_type=True`.
+    """
+    # per-item actions which require PIL images
+    pil_actions = ('scale', 'crop', 'put_on_background', 'filter', 'transform', 'resize', 'shift', 'pad', 'rotate',
+                   'flip', 'invert', 'clip', 'enhance', 'pil_convert', 'posterize', 'cutout')
+
+    @property
+    def image_shape(self):
+        """: tuple - shape of the image"""
+        images = self._stacked('images')
+        if images is not None:
+            return images.shape[1:]
+        return super().image_shape
+
+    def _assemble_component(self, result, *args, component='images', **kwargs):
+        result = [np.asarray(item) if isinstance(item, PIL.Image.Image) else item for item in result]
+        super()._assemble_component(result, *args, component=component, **kwargs)
+
+    def _apply_once(self, item, *args, func=None, p=None, **kwargs):
+        if isinstance(item, np.ndarray) and item.dtype == np.uint8 and getattr(func, '__self__', None) is self \
+           and func.__name__.strip('_') in self.pil_actions:
+            item = self._to_pil_(item)
+        return super()._apply_once(item, *args, func=func, p=p, **kwargs)
+
+    def _stacked(self, src):
+        """ Return component data if it is a stacked array of images, otherwise None """
+        data = self.get(component=src) if isinstance(src, str) else None
+        if isinstance(data, np.ndarray) and data.dtype != object and data.ndim in (3, 4):
+            return data
+        return None
+
+    def _item_values(self, value, n_items):
+        """ Return parameter values for each item as an array of shape (n_items, ...) """
+        if isinstance(value, P):
+            return np.asarray(value.get(batch=self, parallel=True))
+        value = np.asarray(value)
+        return np.broadcast_to(value, (n_items, *value.shape))
+
+    @staticmethod
+    def _expand(value, images):
+        """ Reshape per-item (and per-channel) values to broadcast with images """
+        value = np.asarray(value)
+        if value.ndim == 1:
+            return value.reshape(-1, *[1] * (images.ndim - 1))
+        return value.reshape(len(value), 1, 1, *value.shape[1:])
+
+    @staticmethod
+    def _to_origin(value):
+        """ Convert an origin taken from an array of per-item values to the form of :meth:`._calc_origin` """
+        return value.tolist() if isinstance(value, np.ndarray) else value
+
+    def _get_random_state(self):
+        """ Return the random state of the batch or a new one, so that draws do not depend on other threads """
+        random_state = getattr(self, 'random_state', None)
+        return random_state if random_state is not None else np.random.RandomState()
+
+    def _get_mask(self, p):
+        """ Return a boolean mask of items to transform or None if all items should be transformed """
+        if p is None:
+            return None
+        if isinstance(p, P):
+            mask = np.asarray(p.get(batch=self, parallel=True)).astype(bool)
+        elif isinstance(p, float):
+            mask = self._get_random_state().binomial(1, p, size=len(self)).astype(bool)
+        else:
+            mask = np.broadcast_to(np.asarray(p).astype(bool), (len(self),))
+        return None if mask.all() else mask
+
+    def _apply_stacked(self, name, kernel, *args, src='images', dst='images', p=None, item_params=None,
+                       same_shape=True, **kwargs):
+        """ Apply a vectorized kernel to stacked images or fall back to a per-item action
+
+        Parameters
+        ----------
+        name : str
+            a name of the per-item action from :class:`.ImagesBatch`
+        kernel : callable or None
+            a function which takes stacked images and per-item parameters and returns transformed images.
+            If None, the per-item action is used.
+        item_params : dict
+            parameters which might take different values for each item
+        same_shape : bool
+            whether transformed images have the same shape as the original ones
+        args, kwargs
+            all parameters of the action (used in the per-item action)
+        """
+        item_params = item_params or {}
+        fallback = getattr(super(StackedImagesBatch, self), name)
+
+        if isinstance(src, list) or isinstance(dst, list):
+            src = src if isinstance(src, list) else [src]
+            dst = src if dst is None else dst if isinstance(dst, list) else [dst]
+            if len(src) != len(dst):
+                return fallback(*args, src=src, dst=dst, p=p, **item_params, **kwargs)
+            if isinstance(p, float):
+                # the same items are transformed in all components
+                p = P(self._get_random_state().binomial(1, p, size=len(self)))
+            for one_src, one_dst in zip(src, dst):
+                self._apply_stacked(name, kernel, *args, src=one_src, dst=one_dst, p=p, item_params=item_params,
+                                    same_shape=same_shape, **kwargs)
+            return self
+
+        dst = src if dst is None else dst
+        images = self._stacked(src)
+        mask = self._get_mask(p) if images is not None else None
+        if images is None or kernel is None or mask is not None and not same_shape:
+            p = P(mask) if mask is not None else p
+            return fallback(*args, src=src, dst=dst, p=p, **item_params, **kwargs)
+
+        values = {key: self._item_values(value, len(images)) for key, value in item_params.items()}
+        if mask is None:
+            result = kernel(images, **values)
+        elif mask.any():
+            transformed = kernel(images[mask], **{key: value[mask] for key, value in values.items()})
+            result = images.astype(np.result_type(images, transformed))
+            result[mask] = transformed
+        else:
+            result = images
+        setattr(self, dst, result)
+        return self
+
+    @action
+    def flip(self, mode='lr', src='images', dst='images', p=None):
+        """ Flips images.
+
+        Parameters
+        ----------
+        mode : {'lr', 'ud'}
+
+            - 'lr' - apply the left/right flip
+            - 'ud' - apply the upside/down flip
+        src : str
+            Component to get images from. Default is 'images'.
+        dst : str
+            Component to write images to. Default is 'images'.
+        p : float
+            Probability of applying the transform. Default is 1.
+        """
+        def _flip(images, mode):
+            result = images.copy()
+            lr = mode == 'lr'
+            result[lr] = images[lr][:, :, ::-1]
+            result[~lr] = images[~lr][:, ::-1]
+            return result
+        return self._apply_stacked('flip', _flip, src=src, dst=dst, p=p, item_params=dict(mode=mode))
+
+    @action
+    def rotate(self, *args, src='images', dst='images', p=None, **kwargs):
+        """ Rotates images.
+
+        Images are rotated at once when only `angle`, `center` and `fillcolor` are given
+        and the resampling is nearest (which is the default). Otherwise kwargs are passed to PIL.Image.rotate.
+
+        Parameters
+        ----------
+        angle: Number
+            In degrees counter clockwise.
+        resample: int
+            Interpolation order
+        expand: bool
+            Whether to expand the output to hold the whole image. Default is False.
+        center: (Number, Number)
+            Center of rotation. Default is the center of the image.
+        src : str
+            Component to get images from. Default is 'images'.
+        dst : str
+            Component to write images to. Default is 'images'.
+        p : float
+            Probability of applying the transform. Default is 1.
+        """
+        params = dict(zip(('angle', 'resample', 'expand', 'center'), args), **kwargs)
+        fillcolor = params.pop('fillcolor', None)
+        fillcolor = 0 if fillcolor is None else fillcolor
+        vectorized = (set(params) <= {'angle', 'resample', 'expand', 'center'} and 'angle' in params
+                      and not params.get('resample') and not params.get('expand')
+                      and not isinstance(fillcolor, P))
+        if not vectorized:
+            return self._apply_stacked('rotate', None, *args, src=src, dst=dst, p=p, **kwargs)
+
+        def _rotate(images, angle, center=None):
+            angle = -np.radians(np.asarray(angle, dtype=np.float64) % 360.)
+            if center is None:
+                center = np.broadcast_to((images.shape[2] / 2., images.shape[1] / 2.), (len(images), 2))
+            center_x, center_y = np.asarray(center, dtype=np.float64).T
+            cos, sin = np.round(np.cos(angle), 15), np.round(np.sin(angle), 15)
+            matrices = np.stack([cos, sin, cos * -center_x + sin * -center_y + center_x,
+                                 -sin, cos, -sin * -center_x + cos * -center_y + center_y], axis=1)
+            return _affine(images, matrices, fillcolor)
+
+        item_params = {key: params.pop(key) for key in ('angle', 'center') if params.get(key) is not None}
+        if 'fillcolor' in kwargs:
+            params['fillcolor'] = kwargs['fillcolor']
+        return self._apply_stacked('rotate', _rotate, src=src, dst=dst, p=p, item_params=item_params, **params)
+
+    @action
+    def crop(self, origin, shape, crop_boundaries=False, src='images', dst='images', p=None):
+        """ Crop images.
+
+        Extract image data from the window of the size given by `shape` and placed at `origin`.
+
+        Parameters
+        ----------
+        origin : sequence, str
+            Location of the cropping box. See :meth:`.ImagesBatch._calc_origin` for details.
+        shape : sequence
+            crop size in the form of (columns, rows). Should be the same for all items to crop images at once.
+        crop_boundaries : bool
+            If `True` then crop is got only from image's area. Shape of the crop might diverge with the passed one
+        src : str
+            Component to get images from. Default is 'images'.
+        dst : str
+            Component to write images to. Default is 'images'.
+        p : float
+            Probability of applying the transform. Default is 1.
+        """
+        def _crop(images, origin):
+            size = images.shape[2], images.shape[1]
+            origins = np.array([self._calc_origin(shape, self._to_origin(item_origin), size)
+                                for item_origin in origin])
+            rows = origins[:, 1].reshape(-1, 1, 1) + np.arange(shape[1]).reshape(1, -1, 1)
+            cols = origins[:, 0].reshape(-1, 1, 1) + np.arange(shape[0]).reshape(1, 1, -1)
+            return _gather(images, rows, cols)
+
+        kernel = None if crop_boundaries or isinstance(shape, P) else _crop
+        return self._apply_stacked('crop', kernel, src=src, dst=dst, p=p, item_params=dict(origin=origin),
+                                   same_shape=False, shape=shape, crop_boundaries=crop_boundaries)
+
+    @action
+    def shift(self, offset, mode='const', src='images', dst='images', p=None):
+        """ Shifts images.
+
+        Parameters
+        ----------
+        offset : (Number, Number)
+        mode : {'const', 'wrap'}
+            How to fill borders
+        src : str
+            Component to get images from. Default is 'images'.
+        dst : str
+            Component to write images to. Default is 'images'.
+        p : float
+            Probability of applying the transform. Default is 1.
+        """
+        def _shift(images, offset):
+            offset = np.asarray(offset)
+            if mode == 'const':
+                ones, zeros = np.ones(len(images)), np.zeros(len(images))
+                matrices = np.stack([ones, zeros, -offset[:, 0], zeros, ones, -offset[:, 1]], axis=1)
+                return _affine(images, matrices)
+            rows = (np.arange(images.shape[1]).reshape(1, -1) - offset[:, 1:2]) % images.shape[1]
+            cols = (np.arange(images.shape[2]).reshape(1, -1) - offset[:, 0:1]) % images.shape[2]
+            return _gather(images, rows[:, :, None], cols[:, None, :])
+
+        if mode not in ('const', 'wrap'):
+            raise ValueError("mode must be one of ['const', 'wrap']")
+        return self._apply_stacked('shift', _shift, src=src, dst=dst, p=p, item_params=dict(offset=offset),
+                                   mode=mode)
+
+    @action
+    def invert(self, channels='all', src='images', dst='images', p=None):
+        """ Invert given channels.
+
+        Integer images are inverted with respect to the maximum value of their type and float images are
+        inverted with respect to 1.
+
+        Parameters
+        ----------
+        channels : int, sequence
+            Indices of the channels to invert.
+        src : str
+            Component to get images from. Default is 'images'.
+        dst : str
+            Component to write images to. Default is 'images'.
+        p : float
+            Probability of applying the transform. Default is 1.
+        """
+        def _invert(images):
+            top = np.iinfo(images.dtype).max if np.issubdtype(images.dtype, np.integer) else 1.
+            if isinstance(channels, str) and channels == 'all':
+                return (top - images).astype(images.dtype)
+            result = images.copy()
+            channels_ = [channels] if isinstance(channels, Number) else list(channels)
+            result[..., channels_] = top - images[..., channels_]
+            return result
+        return self._apply_stacked('invert', _invert, src=src, dst=dst, p=p, channels=channels)
+
+    @action
+    def clip(self, low=0, high=255, src='images', dst='images', p=None):
+        """ Truncate image's pixels.
+
+        Parameters
+        ----------
+        low : int, float, sequence
+            Actual pixel's value is equal max(value, low). If sequence is given, then its length must coincide
+            with the number of channels in an image and each channel is thresholded separately
+        high : int, float, sequence
+            Actual pixel's value is equal min(value, high). If sequence is given, then its length must coincide
+            with the number of channels in an image and each channel is thresholded separately
+        src : str
+            Component to get images from. Default is 'images'.
+        dst : str
+            Component to write images to. Default is 'images'.
+        p : float
+            Probability of applying the transform. Default is 1.
+        """
+        def _clip(images, low, high):
+            return np.clip(images, self._expand(low, images), self._expand(high, images)).astype(images.dtype)
+        return self._apply_stacked('clip', _clip, src=src, dst=dst, p=p, item_params=dict(low=low, high=high))
+
+    @staticmethod
+    def _scale_values(images, result, clip, preserve_type):
+        dtype = images.dtype if preserve_type else np.float64
+        if clip:
+            result = np.clip(result, 0, 255 if dtype == np.uint8 else 1.)
+        return result.astype(dtype)
+
+    @action
+    def multiply(self, multiplier=1., clip=False, preserve_type=False, src='images', dst='images', p=None):
+        """ Multiply each pixel by the given multiplier.
+
+        Parameters
+        ----------
+        multiplier : float, sequence
+        clip : bool
+            whether to force image's pixels to be in [0, 255] or [0, 1.]
+        preserve_type : bool
+            Whether to preserve ``dtype`` of transformed images.
+            If ``False`` is given then the resulting type will be ``np.float``.
+        src : str
+            Component to get images from. Default is 'images'.
+        dst : str
+            Component to write images to. Default is 'images'.
+        p : float
+            Probability of applying the transform. Default is 1.
+        """
+        def _multiply(images, multiplier):
+            multiplier = self._expand(np.float32(multiplier), images)
+            return self._scale_values(images, multiplier * images, clip, preserve_type)
+        return self._apply_stacked('multiply', _multiply, src=src, dst=dst, p=p,
+                                   item_params=dict(multiplier=multiplier), clip=clip, preserve_type=preserve_type)
+
+    @action
+    def add(self, term=1., clip=False, preserve_type=False, src='images', dst='images', p=None):
+        """ Add term to each pixel.
+
+        Parameters
+        ----------
+        term : float, sequence
+        clip : bool
+            whether to force image's pixels to be in [0, 255] or [0, 1.]
+        preserve_type : bool
+            Whether to preserve ``dtype`` of transformed images.
+            If ``False`` is given then the resulting type will be ``np.float``.
+        src : str
+            Component to get images from. Default is 'images'.
+        dst : str
+            Component to write images to. Default is 'images'.
+        p : float
+            Probability of applying the transform. Default is 1.
+        """
+        def _add(images, term):
+            term = self._expand(np.float32(term), images)
+            return self._scale_values(images, term + images, clip, preserve_type)
+        return self._apply_stacked('add', _add, src=src, dst=dst, p=p,
+                                   item_params=dict(term=term), clip=clip, preserve_type=preserve_type)
+
+    @action
+    def additive_noise(self, noise, clip=False, preserve_type=False, src='images', dst='images', p=None):
+        """ Add additive noise to images.
+
+        Noise for all images is generated with one call.
+
+        Parameters
+        ----------
+        noise : callable
+            Distribution. Must have ``size`` parameter.
+        clip : bool
+            whether to force image's pixels to be in [0, 255] or [0, 1.]
+        preserve_type : bool
+            Whether to preserve ``dtype`` of transformed images.
+            If ``False`` is given then the resulting type will be ``np.float``.
+        src : str
+            Component to get images from. Default is 'images'.
+        dst : str
+            Component to write images to. Default is 'images'.
+        p : float
+            Probability of applying the transform. Default is 1.
+        """
+        def _additive_noise(images):
+            return self._scale_values(images, noise(size=images.shape) + images, clip, preserve_type)
+        return self._apply_stacked('additive_noise', _additive_noise, src=src, dst=dst, p=p,
+                                   noise=noise, clip=clip, preserve_type=preserve_type)
+
+    @action
+    def multiplicative_noise(self, noise, clip=False, preserve_type=False, src='images', dst='images', p=None):
+        """ Add multiplicative noise to images.
+
+        Noise for all images is generated with one call.
+
+        Parameters
+        ----------
+        noise : callable
+            Distribution. Must have ``size`` parameter.
+        clip : bool
+            whether to force image's pixels to be in [0, 255] or [0, 1.]
+        preserve_type : bool
+            Whether to preserve ``dtype`` of transformed images.
+            If ``False`` is given then the resulting type will be ``np.float``.
+        src : str
+            Component to get images from. Default is 'images'.
+        dst : str
+            Component to write images to. Default is 'images'.
+        p : float
+            Probability of applying the transform. Default is 1.
+        """
+        def _multiplicative_noise(images):
+            return self._scale_values(images, noise(size=images.shape) * images, clip, preserve_type)
+        return self._apply_stacked('multiplicative_noise', _multiplicative_noise, src=src, dst=dst, p=p,
+                                   noise=noise, clip=clip, preserve_type=preserve_type)
+
+    @action
+    def posterize(self, bits=4, src='images', dst='images', p=None):
+        """ Posterizes images.
+
+        More concretely, it quantizes pixels' values so that they have``2^bits`` colors
+
+        Parameters
+        ----------
+        bits : int
+            Number of bits used to store a color's component.
+        src : str
+            Component to get images from. Default is 'images'.
+        dst : str
+            Component to write images to. Default is 'images'.
+        p : float
+            Probability of applying the transform. Default is 1.
+        """
+        def _posterize(images, bits):
+            mask = ~(2 ** (8 - self._expand(bits, images).astype(np.uint16)) - 1)
+            return images & mask.astype(np.uint8)
+        images = self._stacked(src) if isinstance(src, str) else None
+        kernel = _posterize if images is not None and images.dtype == np.uint8 else None
+        return self._apply_stacked('posterize', kernel, src=src, dst=dst, p=p, item_params=dict(bits=bits))
+
+    @action
+    def cutout(self, origin, shape, color, src='images', dst='images', p=None):
+        """ Fills given areas with color
+
+        Parameters
+        ----------
+        origin : sequence, str
+            Location of the cropping box. See :meth:`.ImagesBatch._calc_origin` for details.
+        shape : sequence, int
+            Shape of a filled box. Can be one of:
+                - sequence - box size in the form of (columns, rows)
+                - int - shape has squared form
+
+        color : sequence, number
+            Color of a filled box. Can be one of:
+
+            - sequence - a color for each channel
+            - number - the same value for all channels
+        src : str
+            Component to get images from. Default is 'images'.
+        dst : str
+            Component to write images to. Default is 'images'.
+        p : float
+            Probability of applying the transform. Default is 1.
+        """
+        def _cutout(images, origin, shape, color):
+            shape = np.asarray(shape)
+            if shape.ndim == 1:
+                shape = np.stack([shape, shape], axis=1)
+            size = images.shape[2], images.shape[1]
+            origins = np.array([self._calc_origin(item_shape, self._to_origin(item_origin), size)
+                                for item_shape, item_origin in zip(shape, origin)])
+            rows = np.arange(images.shape[1]).reshape(1, -1)
+            cols = np.arange(images.shape[2]).reshape(1, -1)
+            in_rows = (rows >= origins[:, 1:2]) & (rows < origins[:, 1:2] + shape[:, 1:2])
+            in_cols = (cols >= origins[:, 0:1]) & (cols < origins[:, 0:1] + shape[:, 0:1])
+            box = in_rows[:, :, None] & in_cols[:, None, :]
+            if images.ndim == 4:
+                box = box[..., None]
+            return np.where(box, self._expand(color, images), images).astype(images.dtype)
+        return self._apply_stacked('cutout', _cutout, src=src, dst=dst, p=p,
+                                   item_params=dict(origin=origin, shape=shape, color=color))
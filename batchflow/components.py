@@ -1,12 +1,11 @@
 """ Contains classes to handle batch data components """
 import copy as cp
 import numpy as np
-try:
-    import pandas as pd
-except ImportError:
-    import _fake as pd
 
+from ._lazy import isinstance_lazy
 from .utils import is_iterable
+from .sources import ArrayStore, read_rows
+from .dsindex import ItemPositions
 
 
 class AdvancedDict(dict):
@@ -30,6 +29,7 @@ class BaseComponents:
     def __init__(self, components=None, data=None, indices=None, crop=False, copy=False, cast_to_array=True):
         self.components = components
         self._indices = indices
+        self._positions = None
         self.data = data
         self.cast_to_array = cast_to_array
         self._crop = crop
@@ -41,7 +41,7 @@ class BaseComponents:
     def crop(self, indices=None):
         """ Crops from data in accordance with indices """
         indices = indices if indices is not None else self._indices
-        if isinstance(self.data, pd.DataFrame):
+        if isinstance_lazy(self.data, 'pandas', 'DataFrame'):
             self.data = self.data.loc[indices]
         elif self.components is not None:
             new_data = {}
@@ -103,12 +103,12 @@ class BaseComponents:
         return type(self)(self.components, self, item, crop=False)
 
     def find_in_index(self, item):
-        """ Return a posiition of an item in the index """
-        if isinstance(self._indices, list):
-            return self._indices.index(item)
-        if isinstance(self._indices, np.ndarray):
-            return np.where(self._indices == item)[0][0]
-        raise TypeError("Unknown index type: %s" % type(self._indices))
+        """ Return a position of an item (or positions of an array of items) in the index """
+        if not isinstance(self._indices, (list, np.ndarray)):
+            raise TypeError("Unknown index type: %s" % type(self._indices))
+        if self._positions is None:
+            self._positions = ItemPositions(self._indices)
+        return self._positions.find(item)
 
     def get_pos(self, component, indices):
         """ Return positions of given indices """
@@ -117,7 +117,7 @@ class BaseComponents:
             # a cropped numpy array needs a position as an index
             if isinstance(self.data[component], np.ndarray):
                 if is_iterable(indices):
-                    items = [self.find_in_index(i) for i in indices]
+                    items = self.find_in_index(indices if isinstance(indices, np.ndarray) else list(indices))
                 else:
                     items = self.find_in_index(indices)
         return items
@@ -127,18 +127,20 @@ class BaseComponents:
 
         if self.data is None:
             return None
-        if isinstance(self.data, BaseComponents):
+        if isinstance(self.data, (BaseComponents, ArrayStore)):
             return self.data.get(component, indices)
 
         data = self.data.get(component, None)
         if data is None:
             return None
         if indices is not None:
-            if isinstance(data, (pd.DataFrame, pd.Series)):
+            if isinstance_lazy(data, 'pandas', 'DataFrame', 'Series'):
                 return data.loc[indices]
             if isinstance(data, dict):
                 return AdvancedDict(data)[indices]
             items = self.get_pos(component, indices) if cropped else indices
+            if isinstance(data, np.memmap):
+                return read_rows(data, items)
             return data[items]
         return data
 
@@ -147,7 +149,7 @@ class BaseComponents:
         data = self._get(component, indices)
 
         if self.cast_to_array:
-            if isinstance(data, pd.Series): # and np.all(data.index == self.indices):
+            if isinstance_lazy(data, 'pandas', 'Series'): # and np.all(data.index == self.indices):
                 data = data.values
             elif isinstance(data, AdvancedDict):
                 data = data.as_array(self.indices)
@@ -185,6 +187,8 @@ class BaseComponents:
         self.__dict__.update(d)
 
 def _get_crop(source, indices):
+    if isinstance(source, np.memmap):
+        return read_rows(source, indices)
     return source[indices] if source is not None else None
 
 def get_from_source(components, source, indices=None, crop=False, copy=False, cast_to_array=True):
@@ -199,7 +203,7 @@ def get_from_source(components, source, indices=None, crop=False, copy=False, ca
             data = [_get_crop(source[item], indices) for item in source]
             data = dict(zip(source.keys(), data))
         else:
-            if isinstance(source, pd.DataFrame):
+            if isinstance_lazy(source, 'pandas', 'DataFrame'):
                 data = source.loc
             data = _get_crop(data, indices)
 
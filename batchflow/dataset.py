@@ -1,5 +1,6 @@
 """ Dataset """
 import copy as cp
+import threading
 import numpy as np
 
 from .base import Baseset
@@ -8,6 +9,7 @@ from .dsindex import DatasetIndex
 from .named_expr import L
 from .pipeline import Pipeline
 from .components import create_item_class
+from .sources import TableSource, ReadAhead
 
 
 class Dataset(Baseset):
@@ -73,6 +75,9 @@ class Dataset(Baseset):
         self.preloaded = preloaded
         self._data_named = None
         self._attrs = None
+        self._table_sources = {}
+        self._table_sources_lock = threading.Lock()
+        self.reader = None
         kwargs['_copy'] = kwargs.get('_copy', copy)
         self.n_splits = None
 
@@ -142,7 +147,12 @@ class Dataset(Baseset):
         if copy:
             index = cp.copy(index)
         bcl = batch_class if batch_class is not None else dataset.batch_class
-        return cls(index, batch_class=bcl, preloaded=dataset.preloaded, **{**dataset.get_attrs(), **kwargs})
+        new_dataset = cls(index, batch_class=bcl, preloaded=dataset.preloaded, **{**dataset.get_attrs(), **kwargs})
+        # subsets read the same files
+        new_dataset._table_sources = dataset._table_sources              # pylint: disable=protected-access
+        new_dataset._table_sources_lock = dataset._table_sources_lock    # pylint: disable=protected-access
+        new_dataset.reader = dataset.reader
+        return new_dataset
 
     def __copy__(self):
         return self.from_dataset(self, self.index, copy=True)
@@ -186,6 +196,90 @@ class Dataset(Baseset):
                index1.indices.shape == index2.indices.shape and \
                np.all(index1.indices == index2.indices)
 
+    def get_table_source(self, path, fmt=None, **kwargs):
+        """ Return a table file opened for reading by rows
+
+        The file is opened only once and then shared by all batches of the dataset and its subsets.
+
+        Parameters
+        ----------
+        path : str
+            a path to a file
+
+        fmt : {'csv', 'hdf5', 'feather'} or None
+            a file format
+
+        kwargs
+            other parameters for :class:`~.TableSource`
+
+        Returns
+        -------
+        TableSource
+        """
+        key = path, fmt, repr(sorted(kwargs.items()))
+        source = self._table_sources.get(key)
+        if source is None:
+            with self._table_sources_lock:
+                source = self._table_sources.get(key)
+                if source is None:
+                    source = TableSource(path, fmt, **kwargs)
+                    self._table_sources[key] = source
+        return source
+
+    def read_ahead(self, n_batches=2, n_workers=None, max_items=None):
+        """ Read files of upcoming batches in background threads
+
+        Parameters
+        ----------
+        n_batches : int
+            a number of upcoming batches to read in advance. If 0 or None, reading ahead is turned off.
+        n_workers : int or None
+            a number of reading threads
+        max_items : int or None
+            a maximum number of files kept in memory
+
+        Returns
+        -------
+        Dataset
+
+        Notes
+        -----
+        File loaders (`load(fmt='blosc')` and `load(fmt='image')` in :class:`~.ImagesBatch`)
+        then decode data from files read in advance, so disk and network reads overlap with batch processing.
+        See :class:`~.sources.ReadAhead` for details.
+
+        Examples
+        --------
+        ::
+
+            dataset.read_ahead(n_batches=4)
+            pipeline = dataset.p.load(fmt='blosc').some_action()
+        """
+        if self.reader is not None:
+            self.reader.clear()
+        self.reader = ReadAhead(n_batches, n_workers, max_items) if n_batches else None
+        return self
+
+    def gen_batch(self, batch_size, shuffle=False, n_iters=None, n_epochs=None, drop_last=False,
+                  notifier=False, *args, **kwargs):
+        """ Generate batches """
+        iter_params = kwargs.pop('iter_params', None) or self.get_default_iter_params()
+        for batch in super().gen_batch(batch_size, shuffle, n_iters, n_epochs, drop_last, notifier, *args,
+                                       iter_params=iter_params, **kwargs):
+            if self.reader is not None:
+                self.reader.schedule(self, batch, batch_size, iter_params)
+            yield batch
+
+    def next_batch(self, batch_size, shuffle=False, n_iters=None, n_epochs=None, drop_last=False,
+                   iter_params=None, *args, **kwargs):
+        """ Return a batch """
+        batch = super().next_batch(batch_size, shuffle, n_iters, n_epochs, drop_last, iter_params, *args, **kwargs)
+        if self.reader is not None:
+            # pylint: disable=protected-access
+            iter_params = iter_params if iter_params is not None else self.index._iter_params
+            self.reader.schedule(self, batch, batch_size, iter_params)
+        return batch
+
     def create_subset(self, index):
         """ Create a dataset based on the given subset of indices
 
@@ -378,9 +472,12 @@ class Dataset(Baseset):
         return splits
 
     def __getstate__(self):
-        return self.__dict__
+        state = self.__dict__.copy()
+        state.pop('_table_sources_lock', None)
+        return state
 
     def __setstate__(self, state):
+        state['_table_sources_lock'] = threading.Lock()
         for k, v in state.items():
             # this warrants that all hidden objects are reconstructed upon unpickling
             setattr(self, k, v)
@@ -1,5 +1,4 @@
 """ Pipeline decorators """
-import os
 import traceback
 import threading
 import concurrent.futures as cf
@@ -7,21 +6,9 @@ import asyncio
 import functools
 import logging
 import inspect
-try:
-    from numba import jit
-except ImportError:
-    jit = None
 
 from .named_expr import P
-
-
-def _workers_count():
-    cpu_count = 0
-    try:
-        cpu_count = len(os.sched_getaffinity(0))
-    except AttributeError:
-        cpu_count = os.cpu_count()
-    return cpu_count * 4
+from .pools import default_pools
 
 
 def _make_action_wrapper_with_args(use_lock=None):    # pylint: disable=redefined-outer-name
@@ -250,12 +237,18 @@ def inbatch_parallel(init, post=None, target='threads', _use_self=None, **dec_kw
 
             return margs, mkwargs
 
+        def _get_executor(self, target, n_workers):
+            """ Return an executor from the pipeline pools or the global ones """
+            pipeline = getattr(self, 'pipeline', None) if self is not None else None
+            pools = getattr(pipeline, 'pools', None) or default_pools
+            return pools.executor(target, n_workers)
+
         def wrap_with_threads(self, args, kwargs):
             """ Run a method in parallel """
             init_fn, post_fn = _check_functions(self)
 
-            n_workers = kwargs.pop('n_workers', _workers_count())
-            with cf.ThreadPoolExecutor(max_workers=n_workers) as executor:
+            n_workers = kwargs.pop('n_workers', None)
+            with _get_executor(self, 'threads', n_workers) as executor:
                 futures = []
                 args, kwargs, params = _prepare_args(self, args, kwargs)
                 full_kwargs = {**dec_kwargs, **kwargs}
@@ -273,8 +266,8 @@ def inbatch_parallel(init, post=None, target='threads', _use_self=None, **dec_kw
             """ Run a method in parallel """
             init_fn, post_fn = _check_functions(self)
 
-            n_workers = kwargs.pop('n_workers', _workers_count())
-            with cf.ProcessPoolExecutor(max_workers=n_workers) as executor:
+            n_workers = kwargs.pop('n_workers', None)
+            with _get_executor(self, 'mpc', n_workers) as executor:
                 futures = []
                 mpc_func = method(self, *args, **kwargs)
                 args, kwargs, params = _prepare_args(self, args, kwargs)
@@ -333,7 +326,7 @@ def inbatch_parallel(init, post=None, target='threads', _use_self=None, **dec_kw
         def wrap_with_for(self, args, kwargs):
             """ Run a method sequentially (without parallelism) """
             init_fn, post_fn = _check_functions(self)
-            _ = kwargs.pop('n_workers', _workers_count())
+            _ = kwargs.pop('n_workers', None)
             futures = []
             args, kwargs, params = _prepare_args(self, args, kwargs)
             full_kwargs = {**dec_kwargs, **kwargs}
@@ -408,6 +401,10 @@ def mjit(*args, nopython=True, nogil=True, **kwargs):
         source = '\n'.join(source)
         globs = method.__globals__.copy()
         exec(source, globs)  # pylint: disable=exec-used
+        try:
+            from numba import jit # pylint: disable=import-outside-toplevel
+        except ImportError:
+            jit = None
         if jit is not None:
             func = jit(*args, nopython=nopython, nogil=nogil, **kwargs)(globs[method.__name__])
         else:
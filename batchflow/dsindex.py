@@ -1,5 +1,6 @@
 """ DatasetIndex """
 import os
+import copy
 import math
 import glob
 from collections.abc import Iterable
@@ -10,6 +11,90 @@ from .base import Baseset
 from .notifier import Notifier
 
 
+class ItemPositions:
+    """ Finds positions of items in a 1-d array with a binary search over its sorted copy.
+
+    Lookups of many items at once are vectorized, and only an array of positions is stored
+    along with the sorted items (which are not copied at all if the array is already sorted).
+    Items which cannot be sorted (e.g. of mixed types) fall back to a dict.
+
+    Parameters
+    ----------
+    items : 1-d array-like
+        Items to look up.
+    last : bool
+        Whether to return the last or the first position of a non-unique item.
+    """
+    def __init__(self, items, last=False):
+        items = np.asarray(items)
+        self.side = 'right' if last else 'left'
+        self.order, self.sorted, self.positions = None, None, None
+        try:
+            if len(items) > 1 and not np.all(items[:-1] <= items[1:]):
+                order = np.argsort(items, kind='stable')
+                self.order = order.astype(np.int32) if len(items) < 2**31 else order
+                self.sorted = items[self.order]
+            else:
+                self.sorted = items
+        except TypeError:
+            positions = np.arange(len(items))
+            if not last:
+                items, positions = items[::-1], positions[::-1]
+            self.positions = dict(zip(items, positions))
+
+    def __len__(self):
+        return len(self.sorted) if self.positions is None else len(self.positions)
+
+    def __contains__(self, item):
+        try:
+            self.find(item)
+        except KeyError:
+            return False
+        return True
+
+    def __getitem__(self, item):
+        return self.find(item)
+
+    def find(self, items):
+        """ Return positions of an item or an array of items.
+
+        Raises
+        ------
+        KeyError
+            If any of the items is not found.
+        """
+        if self.positions is not None:
+            if np.ndim(items) == 0:
+                return self.positions[items]
+            return np.asarray([self.positions[item] for item in items], dtype=np.intp)
+
+        items = np.asarray(items)
+        if items.size == 0:
+            return np.empty(items.shape, dtype=np.intp)
+        if len(self.sorted) == 0:
+            missing = np.ravel(items)[0]
+            raise KeyError(missing.item() if isinstance(missing, np.generic) else missing)
+        kinds = {self.sorted.dtype.kind, items.dtype.kind}
+        if len(kinds) > 1 and 'O' not in kinds and not kinds <= set('biuf'):
+            # e.g. strings are looked up in an array of numbers
+            found = np.zeros(items.shape, dtype=bool)
+        else:
+            try:
+                ix = np.searchsorted(self.sorted, items, side=self.side)
+            except TypeError:
+                ix = np.zeros(items.shape, dtype=np.intp)
+            if self.side == 'right':
+                ix = ix - 1
+            ix = np.clip(ix, 0, len(self.sorted) - 1)
+            found = self.sorted[ix] == items
+        if not np.all(found):
+            missing = np.ravel(items[~np.asarray(found)])[0]
+            raise KeyError(missing.item() if isinstance(missing, np.generic) else missing)
+        if self.order is not None:
+            ix = self.order[ix]
+        return ix.astype(np.intp) if isinstance(ix, np.ndarray) else np.intp(ix)
+
+
 class DatasetIndex(Baseset):
     """ Stores an index for a dataset.
     The index should be 1-d array-like, e.g. numpy array, pandas Series, etc.
@@ -28,8 +113,8 @@ class DatasetIndex(Baseset):
     >>> item_pos = index.get_pos(item_id)
     """
     def __init__(self, *args, **kwargs):
+        self._pos_cache = None
         super().__init__(*args, **kwargs)
-        self._pos = self.build_pos()
         self._random_state = None
 
     @classmethod
@@ -117,11 +202,18 @@ class DatasetIndex(Baseset):
 
         return _index
 
+    @property
+    def _pos(self):
+        """ ItemPositions : positions of items in the index (built on first use) """
+        if self._pos_cache is None:
+            self._pos_cache = self.build_pos()
+        return self._pos_cache
+
     def build_pos(self):
-        """ Create a dictionary with positions in the index. """
+        """ Create a lookup table of positions in the index. """
         if self.indices is None:
             return dict()
-        return dict(zip(self.indices, np.arange(len(self))))
+        return ItemPositions(self.indices, last=True)
 
     def get_pos(self, index):
         """ Return position of an item in the index.
@@ -155,6 +247,8 @@ class DatasetIndex(Baseset):
             pos = slice(start, stop, index.step)
         elif isinstance(index, str):
             pos = self._pos[index]
+        elif isinstance(index, Iterable) and isinstance(self._pos, ItemPositions):
+            pos = self._pos.find(index if isinstance(index, np.ndarray) else list(index))
         elif isinstance(index, Iterable):
             pos = np.asarray([self._pos[ix] for ix in index])
         else:
@@ -180,6 +274,21 @@ class DatasetIndex(Baseset):
         """ Return a new index object based on the subset of indices given. """
         return type(self)(index)
 
+    def _create_shared_subset(self, index):
+        """ Return a subset for items taken from this index without validating them again.
+
+        The subset shares the parent's attributes, while item positions are computed on first use.
+        Index classes with a custom :meth:`.create_subset` always get it called instead.
+        """
+        if type(self).create_subset not in _SHARED_SUBSETS:
+            return self.create_subset(index)
+        subset = copy.copy(self)
+        subset._index = index
+        subset._pos_cache = None
+        subset.train, subset.test, subset.validation = None, None, None
+        subset.reset('iter')
+        return subset
+
     def split(self, shares=0.8, shuffle=False):
         """ Split index into train, test and validation subsets.
 
@@ -237,13 +346,13 @@ class DatasetIndex(Baseset):
 
         if valid_share > 0:
             validation_pos = order[:valid_share]
-            self.validation = self.create_subset(self.subset_by_pos(validation_pos))
+            self.validation = self._create_shared_subset(self.subset_by_pos(validation_pos))
         if test_share > 0:
             test_pos = order[valid_share : valid_share + test_share]
-            self.test = self.create_subset(self.subset_by_pos(test_pos))
+            self.test = self._create_shared_subset(self.subset_by_pos(test_pos))
         if train_share > 0:
             train_pos = order[valid_share + test_share:]
-            self.train = self.create_subset(self.subset_by_pos(train_pos))
+            self.train = self._create_shared_subset(self.subset_by_pos(train_pos))
 
     def shuffle(self, shuffle, iter_params=None):
         """ Permute indices
@@ -558,7 +667,7 @@ class DatasetIndex(Baseset):
         else:
             batch = _index
         if not as_array:
-            batch = self.create_subset(batch)
+            batch = self._create_shared_subset(batch) if pos else self.create_subset(batch)
         return batch
 
 
@@ -708,3 +817,17 @@ class FilesIndex(DatasetIndex):
     def create_subset(self, index):
         """ Return a new FilesIndex based on the subset of indices given. """
         return type(self).from_index(index=index, paths=self._paths, dirs=self.dirs)
+
+    def _create_shared_subset(self, index):
+        """ Return a subset for items taken from this index without validating them again.
+
+        The subset keeps paths of its own items only, so it stays small when pickled.
+        """
+        if type(self).create_subset not in _SHARED_SUBSETS:
+            return self.create_subset(index)
+        subset = super()._create_shared_subset(index)
+        subset._paths = {item: self._paths[item] for item in subset.indices}
+        return subset
+
+
+_SHARED_SUBSETS = (DatasetIndex.create_subset, FilesIndex.create_subset)
@@ -1,5 +1,5 @@
 """ Contains model evaluation metrics """
-from .utils import binarize, sigmoid, get_components, infmean
+from .utils import binarize, sigmoid, get_components, label_items, match_instances, infmean, get_confusion_matrix
 from .base import Metrics
 from .classify import ClassificationMetrics
 from .segment import SegmentationMetricsByPixels, SegmentationMetricsByInstances
@@ -1,11 +1,11 @@
 """ Contains two class classification metrics """
+import threading
 from copy import copy
 from functools import partial
 
 import numpy as np
 
-from ...decorators import mjit
-from . import Metrics, binarize, sigmoid, infmean
+from . import Metrics, binarize, sigmoid, infmean, get_confusion_matrix
 
 METRICS_ALIASES = {'sensitivity' : 'true_positive_rate',
                    'recall' : 'true_positive_rate',
@@ -31,6 +31,75 @@ METRICS_ALIASES = {'sensitivity' : 'true_positive_rate',
                    'iou' : 'jaccard',
                    'jac' : 'jaccard'}
 
+class _ConfusionPart:
+    """ Confusion matrices accumulated in one thread """
+    def __init__(self, confusion, items):
+        self.n_updates = 1
+        if items:
+            self.size = len(confusion)
+            self.items = np.empty((max(self.size, 16), *confusion.shape[1:]), dtype=confusion.dtype)
+            self.items[:self.size] = confusion
+            self.total = None
+        else:
+            self.items = None
+            self.total = confusion.sum(axis=0)
+
+    def add(self, confusion):
+        """ Add a batch of confusion matrices """
+        if self.items is None:
+            self.total += confusion.sum(axis=0)
+        else:
+            if self.size + len(confusion) > len(self.items):
+                items = np.empty((max(2 * len(self.items), self.size + len(confusion)), *self.items.shape[1:]),
+                                 dtype=self.items.dtype)
+                items[:self.size] = self.items[:self.size]
+                self.items = items
+            self.items[self.size:self.size + len(confusion)] = confusion
+            self.size += len(confusion)
+        self.n_updates += 1
+
+
+class StreamingConfusion:
+    """ Running confusion matrices updated from several threads without locks.
+
+    Each thread adds matrices into its own part, and parts are merged only when the result is requested.
+
+    Parameters
+    ----------
+    items : bool
+        Whether to keep a confusion matrix for each item in a preallocated growable buffer
+        or only a running sum of all of them.
+    """
+    def __init__(self, items=False):
+        self.items = items
+        self._parts = {}
+        self._merged = None
+
+    def add(self, confusion):
+        """ Add confusion matrices of shape `(batch_items, ...)` """
+        thread = threading.get_ident()
+        part = self._parts.get(thread)
+        if part is None:
+            self._parts[thread] = _ConfusionPart(confusion, self.items)
+        else:
+            part.add(confusion)
+
+    def merge(self, confusion):
+        """ Return all confusion matrices added after a given one """
+        parts = list(self._parts.values())
+        key = tuple((id(part), part.n_updates) for part in parts)
+        if self._merged is None or self._merged[0] != key or self._merged[1] is not confusion:
+            if self.items:
+                merged = np.concatenate([confusion] + [part.items[:part.size] for part in parts])
+            else:
+                merged = (confusion.sum(axis=0) + sum(part.total for part in parts))[None]
+            self._merged = key, confusion, merged
+        return self._merged[2]
+
+    def __len__(self):
+        return len(self._parts)
+
+
 class ClassificationMetrics(Metrics):
     """ Metrics to assess classification models
 
@@ -48,6 +117,19 @@ class ClassificationMetrics(Metrics):
         a class axis (default is None)
     threshold : float
         A probability level for binarization (lower values become 0, equal or greater values become 1)
+    stream : bool or 'items'
+        How :meth:`.update` accumulates metrics for many batches (e.g. in `gather_metrics` with `mode='u'`):
+
+        - False - per-item confusion matrices are concatenated (default)
+        - True - only one running confusion matrix of a fixed size is kept, so metrics are calculated
+          for all the items combined
+        - 'items' - per-item confusion matrices are kept in a preallocated growable buffer
+
+        In streaming modes updates from different threads (e.g. when prefetching) go into separate
+        buffers which are merged only when metrics are evaluated.
+    chunk_size : int
+        The maximum number of labels to count at once when calculating confusion matrices
+        (default is all of them). Limits memory used for very large masks.
 
     Notes
     -----
@@ -111,10 +193,12 @@ class ClassificationMetrics(Metrics):
 
     """
     def __init__(self, targets, predictions, fmt='proba', num_classes=None, axis=None, threshold=.5,
-                 skip_bg=False, calc=True):
+                 skip_bg=False, calc=True, stream=False, chunk_size=None):
         super().__init__()
         self.targets = None
         self.predictions = None
+        self.stream = stream
+        self.chunk_size = chunk_size
         self._confusion_matrix = None
         self.skip_bg = skip_bg
         self.num_classes = None if axis is None else predictions.shape[axis]
@@ -158,9 +242,21 @@ class ClassificationMetrics(Metrics):
     def confusion_matrix(self):
         return self._confusion_matrix.sum(axis=0)
 
+    @property
+    def _confusion_matrix(self):
+        if self._stream:
+            return self._stream.merge(self._matrix)
+        return self._matrix
+
+    @_confusion_matrix.setter
+    def _confusion_matrix(self, value):
+        self._matrix = value
+        self._stream = StreamingConfusion(items=self.stream == 'items') if self.stream else None
+
     def copy(self):
         """ Return a duplicate containing only the confusion matrix """
         metrics = copy(self)
+        metrics._confusion_matrix = self._confusion_matrix   # pylint: disable=protected-access
         metrics.free()
         return metrics
 
@@ -193,7 +289,9 @@ class ClassificationMetrics(Metrics):
     def update(self, metrics):
         """ Update confusion matrix with data from another metrics"""
         # pylint: disable=protected-access
-        if self._no_zero_axis:
+        if self._stream is not None:
+            self._stream.add(metrics._confusion_matrix)
+        elif self._no_zero_axis:
             self._confusion_matrix = self._confusion_matrix + metrics._confusion_matrix
         else:
             self._confusion_matrix = np.concatenate((self._confusion_matrix, metrics._confusion_matrix), axis=0)
@@ -205,18 +303,7 @@ class ClassificationMetrics(Metrics):
         return metrics
 
     def _calc(self):
-        self._confusion_matrix = np.zeros((self.targets.shape[0], self.num_classes, self.num_classes), dtype=np.intp)
-        return self._calc_confusion_jit(self.targets, self.predictions, self.num_classes, self._confusion_matrix)
-
-    @mjit
-    def _calc_confusion_jit(self, targets, predictions, num_classes, confusion):
-        for i in range(targets.shape[0]):
-            targ = targets[i].flatten()
-            pred = predictions[i].flatten()
-            for t in range(num_classes):
-                coords = np.where(targ == t)
-                for c in pred[coords]:
-                    confusion[i, c, t] += 1
+        self._confusion_matrix = get_confusion_matrix(self.targets, self.predictions, self.num_classes, self.chunk_size)
 
     def _return(self, value):
         return value[0] if isinstance(value, np.ndarray) and value.shape == (1, ) else value
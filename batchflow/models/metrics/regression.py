@@ -1,4 +1,7 @@
 """ Contains regression metrics """
+import threading
+from copy import copy
+
 import numpy as np
 
 from . import Metrics
@@ -9,6 +12,168 @@ METRICS_ALIASES = {'mae': 'mean_absolute_error',
                    'r2': 'r2_score',
                    'acc': 'accuracy'}
 
+
+class QuantileSketch:
+    """ Mergeable sketch of quantiles of non-negative values with a relative accuracy guarantee.
+
+    Values are counted in logarithmic buckets `(gamma ** (i - 1), gamma ** i]` where
+    `gamma = (1 + relative_accuracy) / (1 - relative_accuracy)`, so any quantile is returned
+    with a relative error of at most `relative_accuracy`. Zeros are counted separately.
+
+    Parameters
+    ----------
+    size : int
+        The number of independent outputs to sketch.
+    relative_accuracy : float
+        A relative error of estimated quantiles (default is 0.01).
+    max_buckets : int
+        The maximum number of buckets per output. When exceeded, the lowest buckets are collapsed,
+        so only the accuracy of the smallest values degrades.
+    """
+    def __init__(self, size=1, relative_accuracy=.01, max_buckets=2048):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError('relative_accuracy should be in (0, 1)', relative_accuracy)
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self.gamma)
+        self.offset = 0
+        self.collapsed = False
+        self.counts = np.zeros((size, 0), dtype=np.int64)
+        self.zeros = np.zeros(size, dtype=np.int64)
+
+    @property
+    def count(self):
+        """ np.ndarray : the number of values for each output """
+        return self.zeros + self.counts.sum(axis=1)
+
+    def _reserve(self, low, high):
+        width = self.counts.shape[1]
+        if width > 0:
+            low, high = min(low, self.offset), max(high, self.offset + width - 1)
+        if width == 0 or low < self.offset or high >= self.offset + width:
+            counts = np.zeros((len(self.counts), high - low + 1), dtype=np.int64)
+            counts[:, self.offset - low:self.offset - low + width] = self.counts
+            self.counts, self.offset = counts, low
+
+    def _insert(self, keys, outputs, weights=None):
+        if self.collapsed:
+            keys = np.maximum(keys, self.offset)
+        self._reserve(keys.min(), keys.max())
+        width = self.counts.shape[1]
+        counts = np.bincount(outputs * width + keys - self.offset, weights=weights, minlength=self.counts.size)
+        self.counts += counts.reshape(self.counts.shape).astype(np.int64)
+
+        extra = width - self.max_buckets
+        if extra > 0:
+            self.counts[:, extra] += self.counts[:, :extra].sum(axis=1)
+            self.counts = self.counts[:, extra:].copy()
+            self.offset += extra
+            self.collapsed = True
+
+    def add(self, values):
+        """ Add values of shape `(n_values, size)` """
+        positive = values > 0
+        self.zeros += len(values) - positive.sum(axis=0)
+        outputs = np.nonzero(positive)[1]
+        if len(outputs) > 0:
+            keys = np.ceil(np.log(values[positive]) / self._log_gamma).astype(np.int64)
+            self._insert(keys, outputs)
+
+    def merge(self, other):
+        """ Add all values counted in another sketch """
+        if other.gamma != self.gamma:
+            raise ValueError('Cannot merge sketches with different accuracies')
+        self.zeros += other.zeros
+        outputs, keys = np.nonzero(other.counts)
+        if len(outputs) > 0:
+            self._insert(keys + other.offset, outputs, other.counts[outputs, keys])
+        self.collapsed = self.collapsed or other.collapsed
+
+    def _values(self):
+        keys = self.offset + np.arange(self.counts.shape[1])
+        return 2 * self.gamma ** keys / (self.gamma + 1)
+
+    def _value_at(self, rank):
+        cumulative = np.cumsum(self.counts, axis=1) + self.zeros[:, None]
+        index = np.minimum((cumulative <= rank[:, None]).sum(axis=1), max(self.counts.shape[1] - 1, 0))
+        values = self._values()[index] if self.counts.shape[1] > 0 else np.zeros(len(rank))
+        return np.where(rank < self.zeros, 0., values)
+
+    def quantile(self, q):
+        """ Estimate a `q`-th quantile for each output (interpolated linearly between closest ranks) """
+        count = self.count
+        position = q * np.maximum(count - 1, 0)
+        low, high = np.floor(position), np.ceil(position)
+        result = self._value_at(low) + (position - low) * (self._value_at(high) - self._value_at(low))
+        return np.where(count > 0, result, np.nan)
+
+    def count_less(self, value):
+        """ Estimate the number of values less than a given one for each output """
+        below = self.counts[:, self._values() < value].sum(axis=1)
+        return below + (self.zeros if value > 0 else 0)
+
+
+class _RegressionStats:
+    """ Exact running moments of targets and errors along with a sketch of absolute errors """
+    def __init__(self, size, relative_accuracy=.01, max_buckets=2048):
+        self.n_updates = 0
+        self.weight = np.zeros(size)
+        self.sum_abs = np.zeros(size)
+        self.sum_squares = np.zeros(size)
+        self.targets_mean = np.zeros(size)
+        self.targets_m2 = np.zeros(size)
+        self.errors_mean = np.zeros(size)
+        self.errors_m2 = np.zeros(size)
+        self.max_abs = np.full(size, -np.inf)
+        self.sketch = QuantileSketch(size, relative_accuracy, max_buckets)
+
+    @classmethod
+    def from_arrays(cls, targets, predictions, weights=None, **kwargs):
+        """ Summarize arrays of shape `(n_samples, ...)` """
+        targets = np.asarray(targets, dtype=np.float64).reshape(len(targets), -1)
+        errors = np.asarray(predictions, dtype=np.float64).reshape(targets.shape) - targets
+        weights = np.ones((len(targets), 1)) if weights is None else np.asarray(weights).reshape(-1, 1)
+        weights = np.broadcast_to(weights, targets.shape)
+
+        stats = cls(targets.shape[1], **kwargs)
+        stats.n_updates = 1
+        stats.weight = weights.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stats.targets_mean = np.nan_to_num((weights * targets).sum(axis=0) / stats.weight)
+            stats.errors_mean = np.nan_to_num((weights * errors).sum(axis=0) / stats.weight)
+        stats.targets_m2 = (weights * (targets - stats.targets_mean) ** 2).sum(axis=0)
+        stats.errors_m2 = (weights * (errors - stats.errors_mean) ** 2).sum(axis=0)
+
+        abs_errors = np.abs(errors)
+        stats.sum_abs = (weights * abs_errors).sum(axis=0)
+        stats.sum_squares = (weights * errors ** 2).sum(axis=0)
+        if len(abs_errors) > 0:
+            stats.max_abs = abs_errors.max(axis=0)
+        stats.sketch.add(abs_errors)
+        return stats
+
+    def merge(self, other):
+        """ Combine with statistics of other samples (means and variances are merged with Chan's formulas) """
+        weight = self.weight + other.weight
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(weight > 0, other.weight / weight, 0)
+        for name in ['targets', 'errors']:
+            mean, other_mean = getattr(self, name + '_mean'), getattr(other, name + '_mean')
+            delta = other_mean - mean
+            m2 = getattr(self, name + '_m2') + getattr(other, name + '_m2') + delta ** 2 * self.weight * ratio
+            setattr(self, name + '_m2', m2)
+            setattr(self, name + '_mean', mean + delta * ratio)
+
+        self.weight = weight
+        self.sum_abs = self.sum_abs + other.sum_abs
+        self.sum_squares = self.sum_squares + other.sum_squares
+        self.max_abs = np.maximum(self.max_abs, other.max_abs)
+        self.sketch.merge(other.sketch)
+        self.n_updates += 1
+        return self
+
+
 class RegressionMetrics(Metrics):
     """ Metrics to assess regression models.
 
@@ -39,6 +204,20 @@ class RegressionMetrics(Metrics):
     gap : float
         Max difference between target and prediction for sample to be considered as properly classified (default is 3).
 
+    stream : bool
+        Whether to keep only running statistics instead of targets and predictions (default is False).
+
+        Sums for mae, mse, rmse, r2 and explained variance are exact, max error is tracked exactly as well,
+        while median absolute error and accuracy are estimated with a :class:`.QuantileSketch`
+        of absolute errors. Memory does not depend on the number of samples seen then,
+        and :meth:`.update` merges statistics instead of concatenating arrays.
+
+    relative_accuracy : float
+        A relative accuracy of the median absolute error in streaming mode (default is 0.01).
+
+    max_buckets : int
+        The maximum number of sketch buckets per output in streaming mode (default is 2048).
+
     Notes
     -----
     - For all the metrics, except max error, accuracy and median absolute error, you can compute sample-wise weighting.
@@ -60,6 +239,11 @@ class RegressionMetrics(Metrics):
         metrics.evaluate('mae', agg='mean')
         metrics.evaluate(['accuracy', 'mse'], agg=None)
 
+    Accumulate metrics for a large validation set in a fixed memory::
+
+        pipeline.gather_metrics('regression', targets=B.targets, predictions=V('predictions'),
+                                stream=True, save_to=V('metrics', mode='u'))
+
     **Metrics**
     All metrics return:
 
@@ -68,7 +252,8 @@ class RegressionMetrics(Metrics):
     - a vector with (n_outputs, ) items if targets are multioutput and `agg` set to `None`
     """
 
-    def __init__(self, targets, predictions, weights=None, multi=False):
+    def __init__(self, targets, predictions, weights=None, multi=False, stream=False,
+                 relative_accuracy=.01, max_buckets=2048):
         super().__init__()
 
         # if-else block bellow processes the case when the inputs and targets are list
@@ -97,6 +282,15 @@ class RegressionMetrics(Metrics):
         else:
             self.weights = None
 
+        self.stream = stream
+        self._stats = None
+        self._parts = {}
+        self._merged = None
+        if stream:
+            self._stats = _RegressionStats.from_arrays(self.targets, self.predictions, self.weights,
+                                                       relative_accuracy=relative_accuracy, max_buckets=max_buckets)
+            self.free()
+
         self._agg_fn_dict.update(mean=lambda x: np.mean(x))
 
     def __getattr__(self, name):
@@ -105,16 +299,104 @@ class RegressionMetrics(Metrics):
         name = METRICS_ALIASES.get(name, name)
         return object.__getattribute__(self, name)
 
+    @property
+    def stats(self):
+        """ Running statistics of all samples seen in streaming mode """
+        if not self._parts:
+            return self._stats
+        parts = list(self._parts.values())
+        key = tuple((id(part), part.n_updates) for part in parts)
+        if self._merged is None or self._merged[0] != key:
+            merged = self._empty_stats().merge(self._stats)
+            for part in parts:
+                merged.merge(part)
+            self._merged = key, merged
+        return self._merged[1]
+
+    def _empty_stats(self):
+        sketch = self._stats.sketch
+        return _RegressionStats(len(self._stats.weight), sketch.relative_accuracy, sketch.max_buckets)
+
+    def free(self):
+        """ Free memory allocated for targets and predictions """
+        self.targets = None
+        self.predictions = None
+        self.weights = None
+
+    def __copy__(self):
+        state = self.__dict__.copy()
+        if self.stream:
+            state.update(_stats=self._empty_stats().merge(self.stats), _parts={}, _merged=None)
+        metrics = type(self).__new__(type(self))
+        metrics.__dict__.update(state)
+        return metrics
+
+    def copy(self):
+        """ Return a duplicate which is updated independently """
+        return copy(self)
+
+    def merge(self, stats):
+        """ Add running statistics of other samples in streaming mode
+
+        Parameters
+        ----------
+        stats
+            statistics of other samples, e.g. :attr:`.stats` of another streaming metrics
+        """
+        # each thread merges into its own part, so updates from prefetching threads do not race
+        thread = threading.get_ident()
+        part = self._parts.get(thread)
+        if part is None:
+            part = self._empty_stats()
+        part.merge(stats)
+        self._parts[thread] = part
+
+    def update(self, metrics):
+        """ Update with data from another metrics """
+        if self.stream:
+            if metrics.stream:
+                stats = metrics.stats
+            else:
+                sketch = self._stats.sketch
+                stats = _RegressionStats.from_arrays(metrics.targets, metrics.predictions, metrics.weights,
+                                                     relative_accuracy=sketch.relative_accuracy,
+                                                     max_buckets=sketch.max_buckets)
+            self.merge(stats)
+        elif metrics.stream:
+            raise ValueError('Streaming metrics cannot be added to non-streaming ones')
+        else:
+            if self.weights is not None or metrics.weights is not None:
+                weights = [np.ones(len(m.targets)) if m.weights is None else m.weights for m in [self, metrics]]
+                self.weights = np.concatenate(weights)
+            self.targets = np.concatenate((self.targets, metrics.targets), axis=0)
+            self.predictions = np.concatenate((self.predictions, metrics.predictions), axis=0)
+
+    def append(self, metrics):
+        """ Extend with data from another metrics """
+        self.update(metrics)
+
     def mean_absolute_error(self):
+        """ Mean absolute error, exact in streaming mode as well """
+        if self.stream:
+            return self.stats.sum_abs / self.stats.weight
         return np.average(np.abs(self.predictions - self.targets), axis=0, weights=self.weights)
 
     def mean_squared_error(self):
+        """ Mean squared error, exact in streaming mode as well """
+        if self.stream:
+            return self.stats.sum_squares / self.stats.weight
         return np.average((self.predictions - self.targets) ** 2, axis=0, weights=self.weights)
 
     def median_absolute_error(self):
+        """ Median absolute error, estimated with the sketch of absolute errors in streaming mode """
+        if self.stream:
+            return self.stats.sketch.quantile(.5)
         return np.median(np.abs(self.predictions - self.targets), axis=0)
 
     def max_error(self):
+        """ Maximum absolute error, exact in streaming mode as well """
+        if self.stream:
+            return self.stats.max_abs
         return np.max(np.abs(self.predictions - self.targets), axis=0)
 
     def root_mean_squared_error(self):
@@ -122,6 +404,9 @@ class RegressionMetrics(Metrics):
 
     def r2_score(self):
         # pylint: disable=missing-docstring
+        if self.stream:
+            return 1 - self.stats.sum_squares / self.stats.targets_m2
+
         if self.weights is not None:
             weight = self.weights[:, np.newaxis]
         else:
@@ -134,6 +419,9 @@ class RegressionMetrics(Metrics):
 
     def explained_variance_ratio(self):
         # pylint: disable=missing-docstring
+        if self.stream:
+            return 1 - self.stats.errors_m2 / self.stats.targets_m2
+
         diff_avg = np.average(self.predictions - self.targets, axis=0, weights=self.weights)
         numerator = np.average((self.predictions - self.targets - diff_avg) ** 2, axis=0, weights=self.weights)
 
@@ -145,10 +433,14 @@ class RegressionMetrics(Metrics):
         """ Accuracy metric in the regression task can be interpreted as the ratio of samples
          for which `abs(target-predictoin) < gap`.
 
+         In streaming mode the ratio is estimated from the sketch of absolute errors.
+
          Parameters
          ----------
          gap : int, default 3
             The maximum difference between pred and true values to classify sample as correct.
          """
+        if self.stream:
+            sketch = self.stats.sketch
+            return sketch.count_less(gap) / sketch.count
         return (np.abs(self.predictions - self.targets) < gap).sum(axis=0) / self.targets.shape[0]
-    
\ No newline at end of file
@@ -1,7 +1,7 @@
 """ Contains metrics for segmentation """
 import numpy as np
 
-from . import ClassificationMetrics, get_components
+from . import ClassificationMetrics, get_components, match_instances
 
 
 class SegmentationMetricsByPixels(ClassificationMetrics):
@@ -60,20 +60,22 @@ class SegmentationMetricsByInstances(ClassificationMetrics):
 
     """
     def __init__(self, targets, predictions, fmt='proba', num_classes=None, axis=None,
-                 skip_bg=True, threshold=.5, iot=.5, calc=True):
-        super().__init__(targets, predictions, fmt, num_classes, axis, threshold, skip_bg, calc=False)
+                 skip_bg=True, threshold=.5, iot=.5, calc=True, stream=False):
+        super().__init__(targets, predictions, fmt, num_classes, axis, threshold, skip_bg, calc=False, stream=stream)
 
         self.iot = iot
-        self.target_instances = self._get_instances(self.targets)
-        self.predicted_instances = self._get_instances(self.predictions)
         if calc:
             self._calc()
 
-    def free(self):
-        """ Free memory allocated for intermediate data """
-        super().free()
-        self.target_instances = None
-        self.predicted_instances = None
+    @property
+    def target_instances(self):
+        """ nested list with coordinates of target instances (see :meth:`._get_instances`) """
+        return self._get_instances(self.targets)
+
+    @property
+    def predicted_instances(self):
+        """ nested list with coordinates of predicted instances (see :meth:`._get_instances`) """
+        return self._get_instances(self.predictions)
 
     def _get_instances(self, inputs):
         """ Find instances of each class within inputs
@@ -106,22 +108,12 @@ class SegmentationMetricsByInstances(ClassificationMetrics):
         self._confusion_matrix = np.zeros((self.targets.shape[0], self.num_classes - 1, 2, 2), dtype=np.intp)
 
         for k in range(1, self.num_classes):
-            for i, item_instances in enumerate(self.target_instances[k-1]):
-                for coords in item_instances:
-                    targ = len(coords[0])
-                    pred = np.sum(self.predictions[i][coords] == k)
-                    if np.sum(pred) / targ >= self.iot:
-                        self._confusion_matrix[i, k-1, 1, 1] += 1
-                    else:
-                        self._confusion_matrix[i, k-1, 0, 1] += 1
-
-        for k in range(1, self.num_classes):
-            for i, item_instances in enumerate(self.predicted_instances[k-1]):
-                for coords in item_instances:
-                    pred = len(coords[0])
-                    targ = np.sum(self.targets[i][coords] == k)
-                    if targ == 0 or pred / targ < self.iot:
-                        self._confusion_matrix[i, k-1, 1, 0] += 1
+            targets = self.targets != 0 if self.num_classes == 2 else self.targets == k
+            predictions = self.predictions != 0 if self.num_classes == 2 else self.predictions == k
+            true_positive, false_negative, false_positive = match_instances(targets, predictions, self.iot)
+            self._confusion_matrix[:, k-1, 1, 1] = true_positive
+            self._confusion_matrix[:, k-1, 0, 1] = false_negative
+            self._confusion_matrix[:, k-1, 1, 0] = false_positive
 
     def true_positive(self, label=None, *args, **kwargs):
         _ = args, kwargs
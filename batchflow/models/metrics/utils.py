@@ -3,7 +3,7 @@ import numpy as np
 import numpy.ma as ma
 
 from numba import njit
-from scipy.ndimage import measurements
+from scipy.ndimage import measurements, generate_binary_structure
 
 
 @njit(nogil=True)
@@ -37,14 +37,144 @@ def get_components(inputs, batch=True):
     num_items = len(inputs) if batch else 1
     for i in range(num_items):
         connected_array, num_components = measurements.label(inputs[i], output=None)
-        comps = []
-        for j in range(num_components):
-            c = np.where(connected_array == (j + 1))
-            comps.append(c)
+        # group pixel positions by component label instead of scanning the array for each component
+        order = np.argsort(connected_array, axis=None, kind='stable')
+        sizes = np.bincount(connected_array.ravel(), minlength=num_components + 1)
+        bounds = np.cumsum(sizes)
+        comps = [np.unravel_index(order[bounds[j]:bounds[j + 1]], connected_array.shape)
+                 for j in range(num_components)]
         coords.append(comps)
     return coords if batch else coords[0]
 
 
+def label_items(inputs):
+    """ Label connected components of each item in a batch with one call.
+
+    Components do not cross items and are numbered item by item.
+
+    Parameters
+    ----------
+    inputs : np.ndarray
+        Boolean masks of shape `(batch_items, ...)`.
+
+    Returns
+    -------
+    labels : np.ndarray
+        Component labels of the same shape as inputs (0 is background).
+    items : np.ndarray
+        An item index for each label (including background).
+    """
+    structure = np.zeros((3,) * inputs.ndim, dtype=bool)
+    structure[1] = generate_binary_structure(inputs.ndim - 1, 1)
+    labels, num_components = measurements.label(inputs, structure=structure)
+
+    # labels are given in raster order, so each item gets a consecutive range of them
+    last_labels = np.maximum.accumulate(labels.reshape(len(labels), -1).max(axis=1, initial=0))
+    items = np.searchsorted(last_labels, np.arange(num_components + 1))
+    return labels, items
+
+
+def match_instances(targets, predictions, iot=.5):
+    """ Match connected components (instances) of target and predicted masks.
+
+    Overlaps of all instances are counted at once with `np.bincount` over instance labels,
+    so coordinates of instances are never gathered.
+
+    Parameters
+    ----------
+    targets : np.ndarray
+        Boolean masks of shape `(batch_items, ...)`.
+    predictions : np.ndarray
+        Boolean masks of the same shape.
+    iot : float
+        A target instance is detected when a share of its pixels covered by predictions is at least `iot`.
+        A predicted instance is false when it does not overlap targets or its size divided by
+        the overlap is less than `iot`.
+
+    Returns
+    -------
+    true_positive, false_negative, false_positive : np.ndarray
+        The number of detected and missed target instances and false predicted instances in each item.
+    """
+    targets, predictions = np.asarray(targets, dtype=bool), np.asarray(predictions, dtype=bool)
+    num_items = len(targets)
+
+    target_labels, target_items = label_items(targets)
+    sizes = np.bincount(target_labels.ravel(), minlength=len(target_items))[1:]
+    covered = np.bincount(target_labels[predictions], minlength=len(target_items))[1:]
+    detected = covered / sizes >= iot
+    true_positive = np.bincount(target_items[1:][detected], minlength=num_items)
+    false_negative = np.bincount(target_items[1:][~detected], minlength=num_items)
+
+    predicted_labels, predicted_items = label_items(predictions)
+    sizes = np.bincount(predicted_labels.ravel(), minlength=len(predicted_items))[1:]
+    overlap = np.bincount(predicted_labels[targets], minlength=len(predicted_items))[1:]
+    false = (overlap == 0) | (sizes / np.maximum(overlap, 1) < iot)
+    false_positive = np.bincount(predicted_items[1:][false], minlength=num_items)
+
+    return true_positive, false_negative, false_positive
+
+
+def get_confusion_matrix(targets, predictions, num_classes, chunk_size=None):
+    """ Count confusion matrices for each item with `np.bincount`.
+
+    Parameters
+    ----------
+    targets : np.ndarray
+        Labels of shape `(batch_items, ...)`.
+    predictions : np.ndarray
+        Labels of the same shape.
+    num_classes : int
+        The number of classes. Labels outside of `[0, num_classes)` are ignored.
+    chunk_size : int
+        The maximum number of labels to count at once (default is all of them)
+        which limits the size of intermediate arrays for very large masks.
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape `(batch_items, num_classes, num_classes)` where `[i, p, t]` is the number of
+        labels `t` predicted as `p` in the `i`-th item.
+    """
+    n_items = len(targets)
+    targets = np.asarray(targets).reshape(n_items, -1)
+    predictions = np.asarray(predictions).reshape(n_items, -1)
+    item_size = max(targets.shape[1], 1)
+    chunk_size = chunk_size or max(targets.size, 1)
+
+    if item_size > chunk_size:
+        # very large items are counted by parts
+        confusion = np.zeros((n_items, num_classes, num_classes), dtype=np.intp)
+        for i in range(n_items):
+            for start in range(0, item_size, chunk_size):
+                part = slice(start, start + chunk_size)
+                confusion[i] += _bincount_pairs(targets[i:i+1, part], predictions[i:i+1, part], num_classes)[0]
+        return confusion
+
+    items_per_chunk = chunk_size // item_size
+    if items_per_chunk >= n_items:
+        return _bincount_pairs(targets, predictions, num_classes)
+    confusion = np.empty((n_items, num_classes, num_classes), dtype=np.intp)
+    for start in range(0, n_items, items_per_chunk):
+        chunk = slice(start, start + items_per_chunk)
+        confusion[chunk] = _bincount_pairs(targets[chunk], predictions[chunk], num_classes)
+    return confusion
+
+
+def _bincount_pairs(targets, predictions, num_classes):
+    """ Count confusion matrices for a 2d block of items with one `np.bincount` call """
+    n_items = len(targets)
+    index = predictions.astype(np.intp) * num_classes + targets.astype(np.intp)
+    index += np.arange(n_items, dtype=np.intp).reshape(-1, 1) * num_classes ** 2
+
+    if index.size > 0 and (min(targets.min(), predictions.min()) < 0 or
+                           max(targets.max(), predictions.max()) >= num_classes):
+        valid = (targets >= 0) & (targets < num_classes) & (predictions >= 0) & (predictions < num_classes)
+        index = index[valid]
+    counts = np.bincount(index.ravel(), minlength=n_items * num_classes ** 2)
+    return counts.reshape(n_items, num_classes, num_classes)
+
+
 def infmean(arr, axis):
     """ Compute the arithmetic mean along given axis ignoring infs,
     when there is at least one finite number along averaging axis.
@@ -15,6 +15,7 @@ import torch
 import torch.nn as nn
 
 from .utils import unpack_fn_from_config, get_shape
+from .staging import StagingArea
 from .layers import ConvBlock
 from .losses import CrossEntropyLoss, binary as binary_losses, multiclass as multiclass_losses
 from ..base import BaseModel
@@ -203,6 +204,13 @@ class TorchModel(BaseModel):
     sync_frequency : int
         How often to apply accumulated gradients to the weights. Default value is to apply them after each batch.
 
+    staging : bool
+        Whether to copy inputs to a GPU asynchronously: each input is converted to float32 while it is copied
+        into a pinned host buffer, and then transferred with a non-blocking copy on a side CUDA stream.
+        Combined with pipeline `prefetch`, transfer of the next batch overlaps with the current train step,
+        as inputs are prepared before the train lock is acquired. See :class:`.StagingArea`.
+        On a CPU float32 inputs are passed to the model without copying either way. Default is False.
+
     microbatch : int, bool or None
         Also known as virtual batch. If int, then size of chunks to split every batch into.
         Allows to process given data sequentially, accumulating gradients from microbatches and applying them
@@ -301,6 +309,7 @@ class TorchModel(BaseModel):
 
         self.sync_counter = 1
         self.microbatch = None
+        self.staging = None
 
         self.iter_info = {}
         self.profilers = []
@@ -328,6 +337,7 @@ class TorchModel(BaseModel):
         self._get_devices()
         self._get_placeholder_shapes()
         self.full_config = self.build_config()
+        self._create_staging()
 
         # If the inputs are set in config with their shapes we can build right away
         if self.input_shapes:
@@ -367,6 +377,7 @@ class TorchModel(BaseModel):
         config['profile'] = False
         config['microbatch'] = None
         config['sync_frequency'] = 1
+        config['staging'] = False
 
         config['train_steps'] = None
         config['loss'] = None
@@ -870,15 +881,30 @@ class TorchModel(BaseModel):
         writer.close()
 
 
+    def _create_staging(self):
+        """ Create a staging area for inputs once, so that threads which feed the model share it """
+        if self.device and self.full_config.get('staging'):
+            self.staging = StagingArea(self.device)
+        else:
+            self.staging = None
+
     def _fill_value(self, value):
-        if value.dtype not in [np.float32, 'float32']:
-            value = value.astype(np.float32)
+        if self.staging is not None:
+            return self.staging.to_device(value)
 
-        value = torch.from_numpy(value)
+        if isinstance(value, torch.Tensor):
+            value = value.to(torch.float32)
+        else:
+            value = torch.from_numpy(np.asarray(value).astype(np.float32, copy=False))
         if self.device:
             value = value.to(self.device)
         return value
 
+    def _wait_staged(self, tensors):
+        """ Wait for asynchronous copies of inputs to the device """
+        if self.staging is not None:
+            self.staging.wait(tensors)
+
     def _fill_param(self, inputs):
         if isinstance(inputs, (tuple, list)):
             inputs = [self._fill_value(item) for item in inputs]
@@ -1014,6 +1040,7 @@ class TorchModel(BaseModel):
 
         if use_lock:
             self.train_lock.acquire()
+        self._wait_staged([inputs, targets])
 
         outputs = []
         for i in range(steps):
@@ -1155,6 +1182,7 @@ class TorchModel(BaseModel):
             if targets is not None:
                 targets = self._fill_input(targets)[0]
         inputs = inputs[0] if isinstance(inputs, (tuple, list)) and len(inputs) == 1 else inputs
+        self._wait_staged([inputs, targets])
 
         self.model.eval()
 
@@ -1337,6 +1365,7 @@ class TorchModel(BaseModel):
 
         for item in self.preserve:
             setattr(self, item, checkpoint.get(item))
+        self._create_staging()
 
         if self.device:
             self.model.to(self.device)
@@ -0,0 +1,129 @@
+""" Staging of model inputs: pinned host buffers and asynchronous host-to-device copies. """
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import torch
+
+
+class _NullStream:
+    """ Stand-in for a CUDA stream when there is no GPU: all copies are synchronous """
+    def wait_stream(self, stream):
+        pass
+
+
+class _Slot:
+    """ Host buffer with an event marking the end of the last copy from it """
+    def __init__(self, tensor, event):
+        self.tensor = tensor
+        self.event = event
+        self.busy = False
+        self.used = False
+
+
+class StagingArea:
+    """ Moves model inputs to a device asynchronously.
+
+    On a GPU each input is converted to float32 while it is copied into a page-locked (pinned) host buffer,
+    then it is transferred with a non-blocking copy on a side CUDA stream. So the copy of the next batch overlaps
+    with the computations of the current one, if inputs are staged from another thread
+    (e.g. in a pipeline with `prefetch`). Before the inputs are used, the compute stream waits for the copies
+    (see :meth:`.wait`).
+
+    Buffers of each shape form a ring of `slots` buffers, and a buffer is overwritten only after
+    the previous copy from it has finished. Buffers for at most `max_shapes` most recent shapes are kept.
+
+    On a CPU a float32 array is wrapped into a tensor without copying, other arrays are converted once,
+    and a no-op stream is used instead of a CUDA one.
+
+    Parameters
+    ----------
+    device : torch.device
+        device to move inputs to
+    slots : int
+        number of buffers for inputs of the same shape
+    max_shapes : int
+        number of different shapes to keep buffers for
+    """
+    def __init__(self, device, slots=2, max_shapes=8):
+        self.device = torch.device(device)
+        self.cuda = self.device.type == 'cuda' and torch.cuda.is_available()
+        self.stream = torch.cuda.Stream(self.device) if self.cuda else _NullStream()
+        self.slots = slots
+        self.max_shapes = max_shapes
+
+        self._buffers = OrderedDict()
+        self._next = {}
+        self._lock = threading.Condition()
+
+    @staticmethod
+    def _as_tensor(value):
+        """ Wrap an array into a tensor without copying if possible """
+        if isinstance(value, torch.Tensor):
+            return value
+        value = np.asarray(value)
+        if value.dtype.kind not in 'biuf' or value.dtype == np.uint16 or value.dtype == np.uint32:
+            value = value.astype(np.float32)
+        return torch.from_numpy(value)
+
+    def _acquire(self, shape):
+        """ Reserve the next buffer for a given shape, waiting for the previous copy from it """
+        with self._lock:
+            if shape not in self._buffers:
+                if len(self._buffers) >= self.max_shapes:
+                    _, old = self._buffers.popitem(last=False)
+                    for slot in old:
+                        if slot.used:
+                            slot.event.synchronize()
+                self._buffers[shape] = [_Slot(torch.empty(shape, dtype=torch.float32, pin_memory=True),
+                                              torch.cuda.Event()) for _ in range(self.slots)]
+                self._next[shape] = 0
+            self._buffers.move_to_end(shape)
+
+            slots = self._buffers[shape]
+            slot = slots[self._next[shape]]
+            self._next[shape] = (self._next[shape] + 1) % len(slots)
+            while slot.busy:
+                self._lock.wait()
+            slot.busy = True
+        if slot.used:
+            slot.event.synchronize()
+        return slot
+
+    def _release(self, slot):
+        with self._lock:
+            slot.busy = False
+            slot.used = True
+            self._lock.notify_all()
+
+    def to_device(self, value):
+        """ Convert an array or a tensor to float32 and start copying it to the device """
+        tensor = self._as_tensor(value)
+        if not self.cuda or tensor.is_cuda:
+            # a float32 tensor on the same device is returned as is
+            return tensor.to(self.device, dtype=torch.float32, non_blocking=True)
+
+        slot = self._acquire(tuple(tensor.shape))
+        try:
+            slot.tensor.copy_(tensor)
+            with torch.cuda.stream(self.stream):
+                result = slot.tensor.to(self.device, non_blocking=True)
+                slot.event.record(self.stream)
+        finally:
+            self._release(slot)
+        return result
+
+    def wait(self, tensors):
+        """ Make the current stream wait for copies of staged tensors (a tensor or a nested sequence of them) """
+        current = torch.cuda.current_stream(self.device) if self.cuda else _NullStream()
+        current.wait_stream(self.stream)
+        if not self.cuda:
+            return
+        stack = [tensors]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, (tuple, list)):
+                stack.extend(item)
+            elif isinstance(item, torch.Tensor) and item.is_cuda:
+                # memory allocated on the side stream must not be reused before the current stream is done with it
+                item.record_stream(current)
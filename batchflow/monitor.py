@@ -6,7 +6,6 @@ from contextlib import contextmanager
 
 import psutil
 import numpy as np
-import matplotlib.pyplot as plt
 
 try:
     import nvidia_smi
@@ -108,6 +107,7 @@ class ResourceMonitor:
 
     def visualize(self):
         """ Simple plots of collected data-points. """
+        import matplotlib.pyplot as plt # pylint: disable=import-outside-toplevel
         plt.figure(figsize=(8, 6))
         plt.plot(np.array(self.ticks) - self.ticks[0], self.data)
         plt.title(self.__class__.__name__)
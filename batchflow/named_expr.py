@@ -37,6 +37,55 @@ def eval_expr(expr, **kwargs):
     return expr
 
 
+def compile_expr(expr, copy=False):
+    """ Prepare a nested structure for repeated evaluation
+
+    Parameters
+    ----------
+    expr
+        a named expression or a nested structure with them
+    copy : bool
+        whether lists and dicts are rebuilt on each evaluation, as :func:`eval_expr` does,
+        even if they do not contain named expressions
+
+    Returns
+    -------
+    None if `expr` contains no named expressions (and no lists and dicts with `copy`), so it can be used as is.
+    Otherwise a function which takes the same keyword arguments as :func:`eval_expr`
+    and evaluates only those parts of `expr` which contain named expressions.
+    """
+    if isinstance(expr, NamedExpression):
+        return partial(eval_expr, expr)
+
+    if isinstance(expr, (list, tuple)):
+        getters = [(i, getter) for i, getter in enumerate(compile_expr(val, copy) for val in expr)
+                   if getter is not None]
+        if len(getters) == 0 and not (copy and isinstance(expr, list)):
+            return None
+        container = type(expr)
+        def _eval_sequence(**kwargs):
+            values = list(expr)
+            for i, getter in getters:
+                values[i] = getter(**kwargs)
+            return container(values)
+        return _eval_sequence
+
+    if isinstance(expr, dict):
+        items = [(key, val, compile_expr(key), compile_expr(val, copy)) for key, val in expr.items()]
+        if not copy and all(key_getter is None and val_getter is None for _, _, key_getter, val_getter in items):
+            return None
+        container = type(expr)
+        def _eval_dict(**kwargs):
+            values = container()
+            for key, val, key_getter, val_getter in items:
+                key = key if key_getter is None else key_getter(**kwargs)
+                values[key] = val if val_getter is None else val_getter(**kwargs)
+            return values
+        return _eval_dict
+
+    return None
+
+
 def swap(op):
     """ Swap args """
     def _op_(a, b):
@@ -585,6 +634,14 @@ class D(NamedExpression):
         setattr(dataset, name, value)
 
 
+# random state methods which do not take `size`
+_NO_SIZE = ('bytes', 'permutation', 'shuffle')
+# random state methods whose array params describe one value, so they are not broadcast against `size`
+_VECTOR_PARAMS = ('choice', 'dirichlet', 'multinomial', 'multivariate_normal')
+# params which make values drawn in one call depend on each other
+_JOINT_KWARGS = {'choice': {'replace': False}}
+
+
 class R(NamedExpression):
     """ A random value
 
@@ -592,6 +649,9 @@ class R(NamedExpression):
     -----
     If `size` is needed, it should be specified as a named, not a positional argument.
 
+    Without `state` or `seed`, values are drawn with the random state of the batch, if it has one
+    (see `random_seed` in :meth:`~.Pipeline.gen_batch`), so they are reproducible with any prefetch.
+
     Examples
     --------
     ::
@@ -606,29 +666,57 @@ class R(NamedExpression):
             self.random_state = state
         else:
             self.random_state = np.random.RandomState(seed)
+        self.seeded = state is not None or seed is not None
         self.args = args
         self.kwargs = kwargs
         self.size = size
 
-    def get(self, **kwargs):
-        """ Return a value of a random variable """
+    def _get_method(self, **kwargs):
+        """ Return a method of a random state to call, its evaluated args and params of the expression """
         name, kwargs = self._get(**kwargs)
         args = self.args
 
         if not isinstance(name, str):
             args = (name,) + args
             name = 'choice'
-        if isinstance(name, str) and hasattr(self.random_state, name):
-            name = getattr(self.random_state, name)
+
+        random_state = None if self.seeded else getattr(kwargs.get('batch'), 'random_state', None)
+        if random_state is None:
+            random_state = self.random_state
+        if isinstance(name, str) and hasattr(random_state, name):
+            method = getattr(random_state, name)
         else:
             raise TypeError('An expression should be an int, an iterable or a numpy distribution name')
 
-        args = eval_expr(args, **kwargs)
+        return method, eval_expr(args, **kwargs), kwargs
+
+    def get(self, **kwargs):
+        """ Return a value of a random variable """
+        method, args, kwargs = self._get_method(**kwargs)
         if self.size is not None:
             self.kwargs['size'] = self.size
         kwargs = eval_expr(self.kwargs, **kwargs)
 
-        return name(*args, **kwargs)
+        return method(*args, **kwargs)
+
+    def can_sample(self):
+        """ Whether :meth:`.sample` gives the same distribution as separate evaluations """
+        if isinstance(self.name, NamedExpression) or isinstance(self.name, str) and self.name in _NO_SIZE:
+            return False
+        name = self.name if isinstance(self.name, str) else 'choice'
+        for param, value in _JOINT_KWARGS.get(name, {}).items():
+            if param in self.kwargs and self.kwargs[param] == value:
+                return False
+        return self.size is None and compile_expr(self.args) is None and compile_expr(self.kwargs) is None
+
+    def sample(self, size, **kwargs):
+        """ Return `size` values of a random variable drawn in one call """
+        method, args, kwargs = self._get_method(**kwargs)
+        params = [*args, *self.kwargs.values()]
+        if method.__name__ not in _VECTOR_PARAMS and params:
+            # each value has the shape of broadcast params, as with separate evaluations
+            size = (size, *np.broadcast(*params).shape)
+        return method(*args, **self.kwargs, size=size)
 
     def assign(self, *args, **kwargs):
         """ Assign a value """
@@ -714,7 +802,9 @@ class P(W):
         if parallel:
             name, kwargs = self._get(**kwargs)
             batch = kwargs['batch']
-            if isinstance(name, R):
+            if isinstance(name, R) and name.can_sample():
+                val = name.sample(len(batch), **kwargs)
+            elif isinstance(name, R):
                 val = np.array([name.get(**kwargs) for _ in batch])
             elif isinstance(name, NamedExpression):
                 val = name.get(**kwargs)
@@ -3,12 +3,8 @@ import math
 from time import time, gmtime, strftime
 
 from tqdm import tqdm
-from tqdm.notebook import tqdm as tqdm_notebook
-from tqdm.auto import tqdm as tqdm_auto
 
 import numpy as np
-from IPython import display
-import matplotlib.pyplot as plt
 
 from .monitor import ResourceMonitor, MONITOR_ALIASES
 from .named_expr import NamedExpression, eval_expr
@@ -138,12 +134,14 @@ class Notifier:
         # Create bar; set the number of total iterations, if possible
         self.bar = None
 
+        # notebook bars and plotting libraries are imported only when needed
+        # pylint: disable=import-outside-toplevel
         if callable(bar):
             bar_func = bar
         elif bar in ['n', 'nb', 'notebook', 'j', 'jpn', 'jupyter']:
-            bar_func = tqdm_notebook
+            from tqdm.notebook import tqdm as bar_func
         elif bar in ['a', 'auto']:
-            bar_func = tqdm_auto
+            from tqdm.auto import tqdm as bar_func
         elif bar in [True, 't', 'tqdm']:
             bar_func = tqdm
         else:
@@ -151,7 +149,7 @@ class Notifier:
 
         # Set default values for bars
         if 'ncols' not in kwargs:
-            if bar_func == tqdm_notebook:
+            if bar in ['n', 'nb', 'notebook', 'j', 'jpn', 'jupyter']:
                 kwargs['ncols'] = min(700 + 100 * len(monitors or []), 1000)
             elif bar_func == tqdm:
                 kwargs['ncols'] = min(80 + 10 * len(monitors or []), 120)
@@ -240,6 +238,10 @@ class Notifier:
         layout = (1, num_graphs) if self.layout.startswith('h') else (num_graphs, 1)
         figsize = self.figsize or ((20, 5) if self.layout.startswith('h') else (20, 5*num_graphs))
 
+        # pylint: disable=import-outside-toplevel
+        from IPython import display
+        import matplotlib.pyplot as plt
+
         if clear_display:
             display.clear_output(wait=True)
         fig, ax = plt.subplots(*layout, figsize=figsize)
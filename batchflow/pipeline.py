@@ -1,43 +1,44 @@
 """ Contains pipeline class """
 import sys
 import time
+import threading
+from collections import deque
 from functools import partial
 import traceback
-import threading
 import concurrent.futures as cf
 import asyncio
 import logging
 import warnings
 from cProfile import Profile
-from pstats import Stats
 import queue as q
 import numpy as np
-import pandas as pd
 
 from .base import Baseset
 from .config import Config
 from .batch import Batch
 from .decorators import deprecated
 from .exceptions import SkipBatchException, EmptyBatchSequence
-from .named_expr import NamedExpression, V, eval_expr
+from .named_expr import NamedExpression, V, eval_expr, compile_expr
 from .once_pipeline import OncePipeline
 from .model_dir import ModelDirectory
 from .variables import VariableDirectory
-from .models.metrics import (ClassificationMetrics, SegmentationMetricsByPixels,
-                             SegmentationMetricsByInstances, RegressionMetrics, Loss)
+from .pools import PoolDirectory, SharedMemoryExecutor
+from .profiler import ProfileStore
+from .rebatch import RebatchBuffer
 
 from ._const import *       # pylint:disable=wildcard-import
 from .utils import save_data_to
 from .notifier import Notifier
 
 
+# names of classes from `models.metrics` which is imported only when metrics are gathered
 METRICS = dict(
-    classification=ClassificationMetrics,
-    segmentation=SegmentationMetricsByPixels,
-    mask=SegmentationMetricsByPixels,
-    instance=SegmentationMetricsByInstances,
-    regression=RegressionMetrics,
-    loss=Loss,
+    classification='ClassificationMetrics',
+    segmentation='SegmentationMetricsByPixels',
+    mask='SegmentationMetricsByPixels',
+    instance='SegmentationMetricsByInstances',
+    regression='RegressionMetrics',
+    loss='Loss',
 )
 
 
@@ -55,6 +56,59 @@ def hashable(x):
     return True
 
 
+# guards creation of executors for joined pipelines
+_JOIN_LOCK = threading.Lock()
+
+
+def _seed_sequence(seed, key):
+    """ A child of a seed sequence (or an int seed) with a given key, which does not depend on other children """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return np.random.SeedSequence(seed.entropy, spawn_key=(*seed.spawn_key, key))
+
+
+def _new_event_loop():
+    """ Give a worker thread its own event loop for async actions """
+    asyncio.set_event_loop(asyncio.new_event_loop())
+
+
+class _Lookahead:
+    """ Batches of a merged pipeline requested in the background ahead of time
+
+    `pipeline.next_batch` is called from a single thread, so batches come in the same order
+    as with sequential calls.
+
+    Parameters
+    ----------
+    pipeline : Pipeline
+        a pipeline to get batches from
+    size : int
+        the number of batches requested ahead
+    """
+    def __init__(self, pipeline, size):
+        self.pipeline = pipeline
+        self.size = size
+        self.executor = None
+        self.futures = deque()
+        self.lock = threading.Lock()
+
+    def request(self):
+        """ Return a future of the next batch """
+        with self.lock:
+            if self.executor is None:
+                self.executor = cf.ThreadPoolExecutor(max_workers=1, initializer=_new_event_loop)
+            while len(self.futures) <= self.size:
+                self.futures.append(self.executor.submit(self.pipeline.next_batch))
+            return self.futures.popleft()
+
+    def stop(self):
+        """ Wait for the requested batches and stop the thread, the batches are kept for next requests """
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
+                self.executor = None
+
+
 class Pipeline:
     """ Pipeline """
     def __init__(self, dataset=None, config=None, pipeline=None, actions=None, proba=None, repeat=None):
@@ -93,6 +147,7 @@ class Pipeline:
             self.after.pipeline = self
 
         self._dataset = None
+        self.pools = PoolDirectory()
         self.config = Config(self.config)
         self._stop_flag = False
         self._executor = None
@@ -104,13 +159,15 @@ class Pipeline:
         self._rest_batch = None
         self._iter_params = None
         self._not_init_vars = True
+        self._plans = {}
+        self._join_executor = None
+        self._lookaheads = {}
 
         self.notifier = None
         self._profile = None
         self._profiler = None
-        self.profile_info = None
+        self._profile_store = None
         self.elapsed_time = 0.0
-        self._profile_info_lock = threading.Lock()
 
     def __enter__(self):
         """ Create a context and return an empty pipeline non-bound to any dataset """
@@ -119,6 +176,10 @@ class Pipeline:
     def __exit__(self, exc_type, exc_value, trback):
         pass
 
+    def __getstate__(self):
+        # compiled plans refer to the pipeline class and are rebuilt on demand
+        return {**self.__dict__, '_plans': {}, '_join_executor': None, '_lookaheads': {}}
+
     @classmethod
     def from_pipeline(cls, pipeline, actions=None, proba=None, repeat=None):
         """ Create a pipeline from another pipeline """
@@ -283,6 +344,7 @@ class Pipeline:
     def append_pipeline(self, pipeline, proba=None, repeat=None):
         """ Add a nested pipeline to the log of future actions """
         self._actions.append({'name': PIPELINE_ID, 'pipeline': pipeline, 'proba': proba, 'repeat': repeat})
+        self._plans = {}
 
     @property
     def index(self):
@@ -311,6 +373,7 @@ class Pipeline:
         if clear:
             self.config = {}
         self.config.update(config)
+        self._plans = {}
         return self
 
     def update_config(self, config):
@@ -657,12 +720,17 @@ class Pipeline:
             raise AttributeError("Method '%s' has not been found in the %s class" % (name, type(batch).__name__))
         return action_method, action_spec
 
-    def _exec_one_action(self, batch, action, args, kwargs):
+    def _exec_one_action(self, batch, action, args, kwargs, checked=None):
         if self._needs_exec(batch, action):
             repeat = self._eval_expr(action['repeat'], batch=batch) or 1
             for _ in range(repeat):
                 batch.pipeline = self
-                action_method, _ = self._get_action_method(batch, action['name'])
+                if checked is not None and type(batch) in checked:
+                    action_method = getattr(batch, action['name'])
+                else:
+                    action_method, _ = self._get_action_method(batch, action['name'])
+                    if checked is not None:
+                        checked.add(type(batch))
                 batch = action_method(*args, **kwargs)
                 batch.pipeline = self
         return batch
@@ -674,40 +742,17 @@ class Pipeline:
                 batch = self._exec_all_actions(batch, action['pipeline']._actions)  # pylint: disable=protected-access
         return batch
 
+    @property
+    def profile_info(self):
+        """ pd.DataFrame or None : profiling results collected so far """
+        if self._profile_store is None:
+            return None
+        return self._profile_store.info
+
     def _add_profile_info(self, batch, action, exec_time, **kwargs):
         name = self.get_action_name(action, add_index=True)
-        iter_no = self._iter_params['_n_iters']
-
-        start_time = time.time()
-        stats = Stats(self._profiler)
-        self._profiler.clear()
-
-        indices, values = [], []
-        for key, value in stats.stats.items():
-            for k, v in value[4].items():
-                # action name, method_name, file_name, line_no, callee
-                indices.append((name, '{}::{}::{}::{}'.format(key[2], *k)))
-                row_dict = {
-                    'iter': iter_no, 'total_time': exec_time, 'pipeline_time': stats.total_tt, # base stats
-                    'ncalls': v[0], 'tottime': v[2], 'cumtime': v[3], # detailed stats
-                    'batch_id': id(batch), **kwargs
-                }
-                values.append(row_dict)
-
-
-        multiindex = pd.MultiIndex.from_tuples(indices, names=['action', 'id'])
-        df = pd.DataFrame(values, index=multiindex,
-                          columns=['iter', 'total_time', 'pipeline_time',
-                                   'ncalls', 'tottime', 'cumtime',
-                                   'batch_id', *list(kwargs.keys())])
-        df['total_time'] += time.time() - start_time
-
-        if self.profile_info is None:
-            with self._profile_info_lock:
-                self.profile_info = df
-        else:
-            with self._profile_info_lock:
-                self.profile_info = self.profile_info.append(df)
+        self._profile_store.add(name, self._iter_params['_n_iters'], id(batch), exec_time,
+                                profiler=self._profiler, **kwargs)
 
     def show_profile_info(self, per_iter=False, detailed=False,
                           groupby=None, columns=None, sortby=None, limit=10):
@@ -728,9 +773,12 @@ class Pipeline:
             then it must be a full identificator of a column.
         limit : int
             Limits the length of resulting dataframe.
-        parse : bool
-            Allows to re-create underlying dataframe from scratches.
         """
+        if self._profile_store is None:
+            raise ValueError("No profile info is collected, run the pipeline with `profile`")
+        if detailed and not self._profile_store.detailed:
+            raise ValueError("Detailed profile info requires `profile=True` or `profile='detailed'`")
+
         if per_iter is False and detailed is False:
             columns = columns or ['total_time', 'pipeline_time']
             sortby = sortby or ('total_time', 'sum')
@@ -763,59 +811,92 @@ class Pipeline:
         return result
 
 
-    def _exec_all_actions(self, batch, actions=None):
-        join_batches = None
-        actions = actions or self._actions
+    def _compile_actions(self, actions):
+        """ Make a plan to execute actions: action handlers are resolved once, and only arguments
+        which contain named expressions are evaluated for each batch.
 
+        Each step of the plan is a tuple (action, kind, handler, args, args_getter, kwargs, kwargs_getter),
+        where kind is one of 'skip', 'join', 'pipeline', 'method' (a pipeline method) or 'batch' (a batch action).
+        Lists and dicts in arguments are rebuilt for each batch, so an action cannot change them for other batches.
+        """
+        plan = []
         for action in actions:
-            if self._profile:
-                start_time = time.time()
-                self._profiler.enable()
+            name = action['name']
+            handler = None
+            if action.get('#dont_run', False) or name == REBATCH_ID:
+                kind = 'skip'
+            elif name in [JOIN_ID, MERGE_ID]:
+                kind = 'join'
+            elif name == PIPELINE_ID:
+                kind = 'pipeline'
+            elif name in ACTIONS:
+                kind = 'method'
+                handler = getattr(type(self), ACTIONS[name])
+            else:
+                kind = 'batch'
+                # batch classes which the action method has already been checked in
+                handler = set()
+            args, kwargs = action.get('args'), action.get('kwargs')
+            plan.append((action, kind, handler, args, compile_expr(args, copy=True),
+                         kwargs, compile_expr(kwargs, copy=True)))
+        return plan
+
+    def _get_plan(self, actions):
+        """ Return a compiled plan for a list of actions, recompiling it if actions were added """
+        entry = self._plans.get(id(actions))
+        if entry is None or entry[0] is not actions or entry[1] != len(actions):
+            entry = self._plans[id(actions)] = (actions, len(actions), self._compile_actions(actions))
+        return entry[2]
 
-            _action = action.copy()
-            if 'args' in action:
-                _action['args'] = self._eval_expr(action['args'], batch=batch)
-            if 'kwargs' in action:
-                _action['kwargs'] = self._eval_expr(action['kwargs'], batch=batch)
+    def _exec_all_actions(self, batch, actions=None):
+        join_batches = None
+        plan = self._get_plan(actions or self._actions)
 
-            if self._profile:
+        profile = self._profile and self._profile_store.sample(self._iter_params['_n_iters'])
+
+        for action, kind, handler, args, args_getter, kwargs, kwargs_getter in plan:
+            if profile:
+                start_time = time.time()
+                if self._profiler is not None:
+                    self._profiler.enable()
+
+            _action = action
+            if args_getter is not None or kwargs_getter is not None:
+                _action = action.copy()
+                if args_getter is not None:
+                    _action['args'] = args = args_getter(batch=batch, pipeline=self)
+                if kwargs_getter is not None:
+                    _action['kwargs'] = kwargs = kwargs_getter(batch=batch, pipeline=self)
+
+            if profile:
                 eval_expr_time = time.time() - start_time
 
-            if _action.get('#dont_run', False):
+            if kind == 'skip':
                 pass
-            elif _action['name'] in [JOIN_ID, MERGE_ID]:
-                join_batches = []
-                for pipe in _action['pipelines']:   # pylint: disable=not-an-iterable
-                    if _action['mode'] == 'i':
-                        jbatch = pipe.create_batch(batch.index)
-                    elif _action['mode'] == 'n':
-                        jbatch = pipe.next_batch()
-                    join_batches.append(jbatch)
-
-                if _action['name'] == MERGE_ID:
-                    if _action['fn'] is None:
-                        batch, _ = batch.merge([batch] + join_batches, components=_action['components'])
+            elif kind == 'join':
+                join_batches = self._get_join_batches(batch, action)
+
+                if action['name'] == MERGE_ID:
+                    if action['fn'] is None:
+                        batch, _ = batch.merge([batch] + join_batches, components=action['components'])
                     else:
-                        batch, _ = _action['fn']([batch] + join_batches)
+                        batch, _ = action['fn']([batch] + join_batches)
                     join_batches = None
-            elif _action['name'] == REBATCH_ID:
-                pass
-            elif _action['name'] == PIPELINE_ID:
-                batch = self._exec_nested_pipeline(batch, _action)
-            elif _action['name'] in ACTIONS:
-                action_fn = getattr(self, ACTIONS[_action['name']])
-                action_fn(batch, _action)
+            elif kind == 'pipeline':
+                batch = self._exec_nested_pipeline(batch, action)
+            elif kind == 'method':
+                # pipeline methods get a copy of the action, so they cannot change the stored one
+                handler(self, batch, action.copy() if _action is action else _action)
             else:
-                if join_batches is None:
-                    _action_args = _action['args']
-                else:
-                    _action_args = tuple([tuple(join_batches), *_action['args']])
+                if join_batches is not None:
+                    args = tuple([tuple(join_batches), *args])
                     join_batches = None
 
-                batch = self._exec_one_action(batch, _action, _action_args, _action['kwargs'])
+                batch = self._exec_one_action(batch, action, args, kwargs, checked=handler)
 
-            if self._profile:
-                self._profiler.disable()
+            if profile:
+                if self._profiler is not None:
+                    self._profiler.disable()
                 exec_time = time.time() - start_time
                 self._add_profile_info(batch, action, start_time=start_time, exec_time=exec_time,
                                        eval_expr_time=eval_expr_time)
@@ -823,6 +904,36 @@ class Pipeline:
 
         return batch
 
+    def _get_join_batches(self, batch, action):
+        """ Get batches of joined or merged pipelines in the order of pipelines in the action """
+        pipelines = action['pipelines']
+        prefetch = action.get('prefetch') or 0
+        if action['mode'] == 'n' and prefetch > 0:
+            futures = [self._get_lookahead(pipe, prefetch).request() for pipe in pipelines]
+            return [future.result() for future in futures]
+
+        def fetch(pipe):
+            if action['mode'] == 'i':
+                return pipe.create_batch(batch.index)
+            return pipe.next_batch()
+        if len(pipelines) < 2 or not action.get('parallel', False):
+            return [fetch(pipe) for pipe in pipelines]
+
+        if self._join_executor is None:
+            with _JOIN_LOCK:
+                if self._join_executor is None:
+                    self._join_executor = cf.ThreadPoolExecutor(thread_name_prefix='batchflow_join',
+                                                                initializer=_new_event_loop)
+        futures = [self._join_executor.submit(fetch, pipe) for pipe in pipelines]
+        return [future.result() for future in futures]
+
+    def _get_lookahead(self, pipeline, size):
+        with _JOIN_LOCK:
+            lookahead = self._lookaheads.get(id(pipeline))
+            if lookahead is None or lookahead.pipeline is not pipeline:
+                lookahead = self._lookaheads[id(pipeline)] = _Lookahead(pipeline, size)
+        return lookahead
+
     def _needs_exec(self, batch, action):
         if action['proba'] is None:
             return True
@@ -1188,6 +1299,13 @@ class Pipeline:
 
         - 'a' collects the history of batch metrics.
 
+        With 'u' mode classification and segmentation metrics keep confusion matrices for all items seen.
+        Pass `stream=True` to keep only one running confusion matrix of a fixed size instead
+        (or `stream='items'` to store per-item matrices in a preallocated buffer),
+        see :class:`~.ClassificationMetrics`.
+        Regression metrics with `stream=True` keep running sums and a sketch of absolute errors
+        instead of all targets and predictions, see :class:`~.RegressionMetrics`.
+
         Examples
         --------
 
@@ -1219,28 +1337,77 @@ class Pipeline:
                 raise ValueError('Metrics name is ambiguous', metrics_class)
             if len(available_metrics) == 0:
                 raise ValueError('Metrics not found', metrics_class)
-            metrics_class = METRICS[available_metrics[0]]
+            from .models import metrics # pylint: disable=import-outside-toplevel
+            metrics_class = getattr(metrics, METRICS[available_metrics[0]])
         elif not isinstance(metrics_class, type):
             raise TypeError('Metrics can be a string or a class', metrics_class)
 
         metrics = metrics_class(*action['args'], **action['kwargs'])
         self._save_output(batch, None, metrics, action['save_to'])
 
-    def join(self, *pipelines):
-        """ Join one or several pipelines """
-        return self._add_action(JOIN_ID, _args=dict(pipelines=pipelines, mode='i'))
+    def join(self, *pipelines, parallel=True):
+        """ Join one or several pipelines
+
+        Batches with the same index are created by each of `pipelines` and passed
+        as the first argument to the next action.
+
+        Parameters
+        ----------
+        pipelines : Pipeline
+            pipelines to join
+        parallel : bool
+            whether to create batches of several pipelines concurrently in threads.
+            Batches are passed in the order of `pipelines` anyway.
+        """
+        return self._add_action(JOIN_ID, _args=dict(pipelines=pipelines, mode='i', parallel=parallel))
+
+    def merge(self, *pipelines, fn=None, components=None, batch_class=None, parallel=True, prefetch=0):
+        """ Merge pipelines
+
+        The next batch of each of `pipelines` is merged with the current batch.
 
-    def merge(self, *pipelines, fn=None, components=None, batch_class=None):
-        """ Merge pipelines """
+        Parameters
+        ----------
+        pipelines : Pipeline
+            pipelines to merge, each should have a lazy run
+        fn : callable or None
+            a function which takes a list of batches and returns a merged batch and the rest,
+            :meth:`Batch.merge` by default
+        parallel : bool
+            whether to get batches of several pipelines concurrently in threads
+        prefetch : int
+            the number of batches of each pipeline to request ahead in a background thread.
+            Batches of a pipeline are still taken in the order in which it yields them,
+            and those requested ahead are kept when this pipeline is reset.
+        """
         return self._add_action(MERGE_ID, _args=dict(pipelines=pipelines, mode='n', fn=fn,
-                                                     components=components, batch_class=batch_class))
+                                                     components=components, batch_class=batch_class,
+                                                     parallel=parallel, prefetch=prefetch))
 
-    def rebatch(self, batch_size, fn=None, components=None, batch_class=None):
-        """ Set the output batch size """
+    def rebatch(self, batch_size, fn=None, components=None, batch_class=None, prefetch=None):
+        """ Set the output batch size
+
+        Batches of the pipeline are merged into batches of `batch_size` items, which then go through
+        the actions added after `rebatch`.
+
+        Parameters
+        ----------
+        batch_size : int
+            the output batch size
+        fn : callable or None
+            a function which takes a list of batches and returns a batch of `batch_size` items and the rest,
+            :meth:`Batch.merge` by default
+        prefetch : int or None
+            the number of batches to prefetch before `rebatch`. If None, the same as `prefetch`
+            of the pipeline run, which is applied to actions after `rebatch`.
+            Merging runs in a separate thread, so it also overlaps with actions on both sides
+            when the pipeline runs with `prefetch`.
+        """
         # pylint:disable=protected-access
         new_p = type(self)(self.dataset)
         return new_p._add_action(REBATCH_ID, _args=dict(batch_size=batch_size, pipeline=self, fn=fn,
-                                                        components=components, batch_class=batch_class))
+                                                        components=components, batch_class=batch_class,
+                                                        prefetch=prefetch))
 
     def _put_batches_into_queue(self, gen_batch, notifier):
         while not self._stop_flag:
@@ -1275,6 +1442,10 @@ class Pipeline:
             finally:
                 if not skip_batch:
                     self._batch_queue.put(batch, block=True)
+                else:
+                    # free a prefetch slot since the skipped batch will not be consumed
+                    self._prefetch_count.get(block=True)
+                    self._prefetch_count.task_done()
                     skip_batch = False
                 self._prefetch_queue.task_done()
 
@@ -1296,7 +1467,7 @@ class Pipeline:
         what : list of str, str or bool or None
             what to reset to start from scratch:
 
-            - 'iter' - restart the batch iterator
+            - 'iter' - restart the batch iterator and shut down worker pools used by parallel actions
             - 'variables' - re-initialize all pipeline variables
             - 'models' - reset all models
 
@@ -1333,9 +1504,14 @@ class Pipeline:
 
             self._stop_executor(self._executor)
             self._stop_executor(self._service_executor)
+            self._stop_executor(self._join_executor)
+            for lookahead in self._lookaheads.values():
+                lookahead.stop()
+            self.pools.shutdown()
 
             self._executor = None
             self._service_executor = None
+            self._join_executor = None
             self._prefetch_count = None
             self._prefetch_queue = None
             self._batch_queue = None
@@ -1360,8 +1536,38 @@ class Pipeline:
             pipeline = self.from_pipeline(_action['pipeline'])
 
         kwargs.setdefault('iter_params', None)
+        if _action.get('prefetch') is not None:
+            kwargs['prefetch'] = _action['prefetch']
 
         self._rest_batch = None
+        try:
+            yield from self._merge_rebatched(pipeline, _action, *args, **kwargs)
+        finally:
+            # stop prefetching of the inner pipeline if the iteration is interrupted
+            pipeline.reset('iter')
+
+    def _merge_rebatched(self, pipeline, _action, *args, **kwargs):
+        """ Merge batches of the inner pipeline of rebatch as soon as they amount to the batch size """
+        try:
+            self._rest_batch = pipeline.next_batch(*args, **kwargs)
+        except StopIteration:
+            return
+
+        if _action['fn'] is None and RebatchBuffer.supports(self._rest_batch):
+            # items are copied into output batches right away instead of merging lists of batches
+            buffer = RebatchBuffer(_action['batch_size'], _action['components'], _action['batch_class'])
+            new_batch, self._rest_batch = self._rest_batch, None
+            while True:
+                yield from buffer.put(new_batch)
+                try:
+                    new_batch = pipeline.next_batch(*args, **kwargs)
+                except StopIteration:
+                    break
+            batch = buffer.flush()
+            if batch is not None:
+                yield batch
+            return
+
         while True:
             if self._rest_batch is None:
                 cur_len = 0
@@ -1392,7 +1598,7 @@ class Pipeline:
             yield batch
 
 
-    def gen_batch(self, *args, iter_params=None, reset='iter', profile=False, **kwargs):
+    def gen_batch(self, *args, iter_params=None, reset='iter', profile=False, profile_every=1, **kwargs):
         """ Generate batches
 
         Parameters
@@ -1437,7 +1643,9 @@ class Pipeline:
 
         target : 'threads' or 'mpc'
             batch parallelization engine used for prefetching (default='threads').
-            'mpc' rarely works well due to complicated and slow python's inter-process communications.
+            'mpc' runs the pipeline in long-lived worker processes which return batch data through
+            shared memory (see :class:`~.pools.SharedMemoryExecutor`). Note that pipeline variables
+            and models updated in worker processes are not sent back.
 
         reset : list of str, str or bool
             what to reset to start from scratch:
@@ -1446,6 +1654,20 @@ class Pipeline:
             - 'variables' - re-initialize all pipeline variables
             - 'models' - reset all models
 
+        profile : bool or str
+            whether to collect execution times of actions (see :meth:`.show_profile_info`):
+
+            - True or 'detailed' - wall-clock times along with :class:`cProfile.Profile` stats
+            - 'time' - wall-clock times only which is much cheaper
+
+        profile_every : int
+            profile only every `profile_every`-th iteration (default=1).
+
+        random_seed : int, :class:`numpy.random.SeedSequence` or None
+            if given, each batch gets its own random state which depends only on the seed and the batch number.
+            Named expressions `R` without their own `seed` or `state` draw values from it,
+            so results are reproducible regardless of `prefetch`.
+
         Yields
         ------
         an instance of the batch class returned by the last action
@@ -1467,10 +1689,16 @@ class Pipeline:
         args_value = self._eval_expr(args)
         kwargs_value = self._eval_expr(kwargs)
         self.reset(reset)
+        self._plans = {}
+        self._get_plan(self._actions)
         self._iter_params = iter_params or self._iter_params or Baseset.get_default_iter_params()
-        self._profile = profile
+        self._profile = bool(profile)
         if profile:
-            self._profiler = Profile()
+            detailed = profile != 'time'
+            if self._profile_store is None or self._profile_store.detailed != detailed:
+                self._profile_store = ProfileStore(detailed=detailed)
+            self._profile_store.every = profile_every
+            self._profiler = Profile() if detailed else None
 
         return self._gen_batch(*args_value, iter_params=self._iter_params, **kwargs_value)
 
@@ -1482,12 +1710,17 @@ class Pipeline:
         prefetch = kwargs.pop('prefetch', 0)
         on_iter = kwargs.pop('on_iter', None)
         notifier = kwargs.pop('notifier', kwargs.pop('bar', None))
+        random_seed = kwargs.pop('random_seed', None)
 
-        if len(self._actions) > 0 and self._actions[0]['name'] == REBATCH_ID:
-            batch_generator = self.gen_rebatch(*args, **kwargs, prefetch=prefetch)
-            prefetch = 0
+        rebatch = len(self._actions) > 0 and self._actions[0]['name'] == REBATCH_ID
+        if rebatch:
+            inner_seed = _seed_sequence(random_seed, 1) if random_seed is not None else None
+            batch_generator = self.gen_rebatch(*args, **kwargs, prefetch=prefetch, target=target,
+                                               random_seed=inner_seed)
         else:
             batch_generator = self._dataset.gen_batch(*args, **kwargs)
+        if random_seed is not None:
+            batch_generator = self._seed_batches(batch_generator, _seed_sequence(random_seed, 0))
 
         if self._not_init_vars:
             self._init_all_variables()
@@ -1516,7 +1749,12 @@ class Pipeline:
             if target in ['threads', 't']:
                 self._executor = cf.ThreadPoolExecutor(max_workers=prefetch + 1)
             elif target in ['mpc', 'm']:
-                self._executor = cf.ProcessPoolExecutor(max_workers=prefetch + 1)
+                # workers of the shared memory executor create batches from indices of the dataset,
+                # while rebatched batches are made of parts of other batches
+                if SharedMemoryExecutor.available() and not rebatch:
+                    self._executor = SharedMemoryExecutor(self, max_workers=prefetch + 1)
+                else:
+                    self._executor = cf.ProcessPoolExecutor(max_workers=prefetch + 1)
             else:
                 raise ValueError("target should be one of ['threads', 'mpc']")
 
@@ -1528,17 +1766,23 @@ class Pipeline:
             self._service_executor.submit(self._put_batches_into_queue, batch_generator, notifier)
             self._service_executor.submit(self._run_batches_from_queue)
 
-            while not self._stop_flag:
-                batch_res = self._batch_queue.get(block=True)
-                self._batch_queue.task_done()
-                if batch_res is not None:
-                    yield batch_res
-                    self._prefetch_count.get(block=True)
-                    self._prefetch_count.task_done()
-                    if callable(on_iter):
-                        on_iter(batch_res)
-                else:
-                    self._stop_flag = True
+            executor = self._executor
+            try:
+                while not self._stop_flag:
+                    batch_res = self._batch_queue.get(block=True)
+                    self._batch_queue.task_done()
+                    if batch_res is not None:
+                        yield batch_res
+                        self._prefetch_count.get(block=True)
+                        self._prefetch_count.task_done()
+                        if callable(on_iter):
+                            on_iter(batch_res)
+                    else:
+                        self._stop_flag = True
+            finally:
+                if isinstance(executor, SharedMemoryExecutor):
+                    # do not keep worker processes after the iteration ends
+                    executor.shutdown()
         else:
             is_empty = True
             for batch in batch_generator:
@@ -1564,8 +1808,17 @@ class Pipeline:
         self.elapsed_time += time.time() - start_time
 
 
+    @staticmethod
+    def _seed_batches(batch_generator, seed_sequence):
+        """ Give each batch a random state which depends only on the seed and the batch number """
+        for i, batch in enumerate(batch_generator):
+            batch.random_state = np.random.RandomState(np.random.MT19937(_seed_sequence(seed_sequence, i)))
+            yield batch
+
     def create_batch(self, batch_index, *args, **kwargs):
         """ Create a new batch by given indices and execute all lazy actions """
+        if self._dataset is None:
+            self._dataset = self._eval_expr(self.dataset)
         batch = self._dataset.create_batch(batch_index, *args, **kwargs)
         batch_res = self.execute_for(batch)
         return batch_res
@@ -0,0 +1,567 @@
+""" Contains worker pools shared by parallel actions """
+import os
+import sys
+import signal
+import pickle
+import asyncio
+import threading
+import traceback
+import weakref
+import queue as q
+import multiprocessing as mp
+import concurrent.futures as cf
+
+import dill
+import numpy as np
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except ImportError:
+    shared_memory = None
+
+
+POOL_THREAD_PREFIX = 'batchflow_pool'
+
+
+def _workers_count():
+    cpu_count = 0
+    try:
+        cpu_count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpu_count = os.cpu_count()
+    return cpu_count * 4
+
+
+class BoundedExecutor:
+    """ A view of a shared executor which runs no more than `n_workers` tasks at a time
+
+    Parameters
+    ----------
+    executor : concurrent.futures.Executor
+        a shared executor to submit tasks to
+    n_workers : int or None
+        a maximum number of tasks running simultaneously (if None, only the executor size matters)
+    shutdown : bool
+        whether to shut the executor down on exit (used for temporary executors)
+
+    Notes
+    -----
+    As a context manager it waits for all submitted tasks to complete on exit,
+    just like :class:`concurrent.futures.ThreadPoolExecutor` does.
+    """
+    def __init__(self, executor, n_workers=None, shutdown=False):
+        self.executor = executor
+        self._semaphore = threading.BoundedSemaphore(n_workers) if n_workers else None
+        self._shutdown = shutdown
+        self._futures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, trback):
+        if self._shutdown:
+            self.executor.shutdown(wait=True)
+        else:
+            cf.wait(self._futures, return_when=cf.ALL_COMPLETED)
+
+    def _release(self, _):
+        self._semaphore.release()
+
+    def submit(self, fn, *args, **kwargs):
+        """ Submit a task when there is a free slot """
+        if self._semaphore is not None:
+            self._semaphore.acquire()
+        try:
+            future = self.executor.submit(fn, *args, **kwargs)
+        except Exception:
+            if self._semaphore is not None:
+                self._semaphore.release()
+            raise
+        if self._semaphore is not None:
+            future.add_done_callback(self._release)
+        self._futures.append(future)
+        return future
+
+
+class PoolDirectory:
+    """ Storage for warm worker pools reused by actions decorated with
+    :func:`~.inbatch_parallel` and :func:`~.apply_parallel`
+
+    Parameters
+    ----------
+    max_workers : int or None
+        a size of each pool. If None, the number of cores times 4 for thread pools
+        and the number of cores for process pools.
+
+    Notes
+    -----
+    Each pipeline has its own directory available as `pipeline.pools`, which is shut down on `pipeline.reset('iter')`.
+    Batches without a pipeline use the global directory :data:`~.pools.default_pools`.
+
+    Pools are created lazily on the first request and live until :meth:`.shutdown`.
+    `n_workers` passed to an action does not create a new pool, it only limits the number of tasks
+    the action runs simultaneously within the shared pool.
+
+    Examples
+    --------
+    ::
+
+        pipeline.pools.max_workers = 8
+        pipeline.some_parallel_action(n_workers=2)
+    """
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+        self.pools = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {'max_workers': self.max_workers}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __copy__(self):
+        return type(self)(max_workers=self.max_workers)
+
+    def __deepcopy__(self, memo):
+        _ = memo
+        return self.__copy__()
+
+    def _pool_size(self, target):
+        if self.max_workers is not None:
+            return self.max_workers
+        if target == 'mpc':
+            return _workers_count() // 4
+        return _workers_count()
+
+    def _create(self, target):
+        if target == 'threads':
+            return cf.ThreadPoolExecutor(max_workers=self._pool_size(target), thread_name_prefix=POOL_THREAD_PREFIX)
+        if target == 'mpc':
+            return cf.ProcessPoolExecutor(max_workers=self._pool_size(target))
+        raise ValueError("target should be one of ['threads', 'mpc']")
+
+    def get(self, target):
+        """ Return a shared pool for a given target, creating it if needed
+
+        Parameters
+        ----------
+        target : {'threads', 'mpc'}
+            a pool type
+
+        Returns
+        -------
+        concurrent.futures.Executor
+        """
+        pool = self.pools.get(target)
+        if pool is None or getattr(pool, '_broken', False) or getattr(pool, '_shutdown', False):
+            with self._lock:
+                pool = self.pools.get(target)
+                if pool is None or getattr(pool, '_broken', False) or getattr(pool, '_shutdown', False):
+                    pool = self._create(target)
+                    self.pools[target] = pool
+        return pool
+
+    @staticmethod
+    def in_worker():
+        """ Check whether the current thread belongs to a shared thread pool """
+        return threading.current_thread().name.startswith(POOL_THREAD_PREFIX)
+
+    def executor(self, target, n_workers=None):
+        """ Return an executor to submit an action's tasks to
+
+        Parameters
+        ----------
+        target : {'threads', 'mpc'}
+            a pool type
+        n_workers : int or None
+            a maximum number of tasks running simultaneously
+
+        Returns
+        -------
+        BoundedExecutor
+
+        Notes
+        -----
+        Calls made from within a shared thread pool worker get a temporary executor,
+        since waiting for tasks queued to the same pool might never finish.
+        """
+        if self.in_worker():
+            if target == 'threads':
+                executor = cf.ThreadPoolExecutor(max_workers=n_workers or _workers_count())
+            else:
+                executor = cf.ProcessPoolExecutor(max_workers=n_workers)
+            return BoundedExecutor(executor, shutdown=True)
+
+        if n_workers is not None and n_workers >= self._pool_size(target):
+            n_workers = None
+        return BoundedExecutor(self.get(target), n_workers)
+
+    def shutdown(self, wait=True):
+        """ Shut down all pools """
+        with self._lock:
+            pools, self.pools = self.pools, {}
+        for pool in pools.values():
+            pool.shutdown(wait=wait)
+
+
+default_pools = PoolDirectory()
+
+
+# alignment of arrays in shared memory segments
+SHM_ALIGNMENT = 64
+
+
+class _AttachedSegment:
+    """ A shared memory segment which might still be used by arrays when it is closed """
+    def __init__(self, name):
+        self.segment = shared_memory.SharedMemory(name=name)
+        self.name = self.segment.name
+
+    @property
+    def buf(self):
+        """ memoryview - the contents of the segment """
+        return self.segment.buf
+
+    def close(self):
+        """ Close access to the segment from this process """
+        try:
+            self.segment.close()
+        except BufferError:
+            # the memory is unmapped as soon as the last array using it is deleted
+            pass
+
+
+class _Ring:
+    """ Shared memory segments a prefetch worker writes batch data into
+
+    Each slot is a separate segment which is reused after the main process has released it.
+    """
+    def __init__(self, n_slots, released):
+        self.segments = [None] * n_slots
+        self.free = list(range(n_slots))
+        self.released = released
+
+    def _acquire(self):
+        while True:
+            try:
+                self.free.append(self.released.get_nowait())
+            except q.Empty:
+                break
+        return self.free.pop() if self.free else None
+
+    def write(self, buffers):
+        """ Copy out-of-band pickle buffers into a free slot
+
+        Returns
+        -------
+        tuple or None
+            slot number, segment name and (offset, size) of each buffer,
+            or None if all slots are still in use
+        """
+        slot = self._acquire()
+        if slot is None:
+            return None
+
+        raws = [buffer.raw() for buffer in buffers]
+        spans = []
+        size = 0
+        for raw in raws:
+            spans.append((size, raw.nbytes))
+            size += -(-raw.nbytes // SHM_ALIGNMENT) * SHM_ALIGNMENT
+
+        segment = self.segments[slot]
+        if segment is None or segment.size < size:
+            if segment is not None:
+                segment.close()
+                segment.unlink()
+            segment = shared_memory.SharedMemory(create=True, size=max(size, 1))
+            self.segments[slot] = segment
+
+        for raw, (offset, nbytes) in zip(raws, spans):
+            segment.buf[offset:offset + nbytes] = raw
+        return slot, segment.name, spans
+
+    def close(self):
+        """ Remove all segments """
+        for segment in self.segments:
+            if segment is not None:
+                segment.close()
+                segment.unlink()
+        self.segments = []
+
+
+def _dump_exception(exc):
+    try:
+        return dill.dumps(exc)
+    except Exception:   # pylint: disable=broad-except
+        return dill.dumps(RuntimeError(''.join(traceback.format_exception(type(exc), exc, exc.__traceback__))))
+
+
+def _pickle_batch(batch):
+    """ Pickle a batch without its pipeline and dataset, with its arrays as out-of-band buffers (protocol 5)
+
+    Returns
+    -------
+    payload : bytes
+    buffers : list of pickle.PickleBuffer
+        out-of-band buffers, empty if the batch can be serialized only with dill
+    """
+    # pylint: disable=protected-access
+    _ = batch.data
+    batch.pipeline = None
+    batch._dataset = None
+    batch._preloaded = None
+
+    buffers = []
+    try:
+        payload = pickle.dumps(batch, protocol=5, buffer_callback=buffers.append)
+    except Exception:   # pylint: disable=broad-except
+        return dill.dumps(batch), []
+    return payload, buffers
+
+
+def _unpickle_batch(payload, buffers):
+    """ Restore a batch pickled with :func:`_pickle_batch` from its payload and buffers """
+    if len(buffers) > 0:
+        return pickle.loads(payload, buffers=buffers)
+    return dill.loads(payload)
+
+
+def _dump_batch(batch, ring):
+    """ Pickle a batch with its arrays passed through shared memory """
+    payload, buffers = _pickle_batch(batch)
+    if not buffers:
+        return payload, None
+    location = ring.write(buffers)
+    if location is None:
+        return pickle.dumps(batch, protocol=5), None
+    return payload, location
+
+
+def _shm_worker(pipeline, worker_id, tasks, results, released, n_slots):
+    """ Run a pipeline for batches taken from the task queue """
+    # pylint: disable=protected-access
+    if isinstance(pipeline, bytes):
+        pipeline = dill.loads(pipeline)
+    pipeline.pools = PoolDirectory(pipeline.pools.max_workers)
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    # remove shared memory segments when the worker is terminated
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    ring = _Ring(n_slots, released)
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            task_id, task = task
+            try:
+                indices, attrs, random_state = dill.loads(task)
+                # only item ids are sent, the index of the batch is rebuilt from the worker's dataset
+                index = pipeline._dataset.index.create_subset(indices)
+                batch = pipeline._dataset.create_batch(index, **attrs)
+                batch.random_state = random_state
+                batch_res = pipeline.execute_for(batch)
+                payload, location = _dump_batch(batch_res, ring)
+            except Exception as e:    # pylint: disable=broad-except
+                results.put((task_id, worker_id, False, _dump_exception(e), None))
+            else:
+                results.put((task_id, worker_id, True, payload, location))
+    finally:
+        ring.close()
+
+
+class SharedMemoryExecutor(cf.Executor):
+    """ Process-based executor for pipeline prefetching which passes batch data through shared memory
+
+    Parameters
+    ----------
+    pipeline : Pipeline
+        a pipeline to run
+    max_workers : int
+        a number of worker processes
+    n_slots : int
+        a number of shared memory segments each worker writes batches into
+
+    Notes
+    -----
+    Worker processes are started once and keep their own copy of the pipeline
+    (inherited with `fork` or sent once otherwise), so only batch indices are sent to the workers.
+
+    Workers pickle output batches with out-of-band buffers which are copied into shared memory segments.
+    Only small descriptors are sent back, and arrays in the main process are views of the shared memory.
+    A segment is reused as soon as all arrays of the batch it contains are garbage collected.
+    If all worker segments are still in use, a batch is sent through a queue as a usual pickle.
+
+    Pipeline variables and models updated in workers are not sent back to the main process.
+
+    Only `pipeline.execute_for` can be submitted.
+    """
+    def __init__(self, pipeline, max_workers=None, n_slots=2):
+        if shared_memory is None:
+            raise ImportError("SharedMemoryExecutor requires python 3.8 or newer")
+        self.pipeline = pipeline
+        self.max_workers = max_workers or _workers_count() // 4
+
+        if 'fork' in mp.get_all_start_methods():
+            context, state = mp.get_context('fork'), pipeline
+        else:
+            context, state = mp.get_context('spawn'), dill.dumps(pipeline)
+        resource_tracker.ensure_running()
+
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._released = [context.Queue() for _ in range(self.max_workers)]
+        self._processes = [context.Process(target=_shm_worker, daemon=True,
+                                           args=(state, i, self._tasks, self._results, self._released[i], n_slots))
+                           for i in range(self.max_workers)]
+        for process in self._processes:
+            process.start()
+
+        self._lock = threading.Lock()
+        self._futures = {}
+        self._task_id = 0
+        self._segments = {}
+        self._live = {}
+        self._shutdown = False
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+    @staticmethod
+    def available():
+        """ Check whether shared memory is supported """
+        return shared_memory is not None
+
+    def submit(self, fn, *args, **kwargs):
+        """ Send a batch to a worker
+
+        Parameters
+        ----------
+        fn : callable
+            should be `pipeline.execute_for`
+        args
+            a batch to process (other arguments are ignored)
+
+        Returns
+        -------
+        concurrent.futures.Future
+            a future for an output batch
+        """
+        _ = kwargs
+        if fn != self.pipeline.execute_for:
+            raise ValueError("SharedMemoryExecutor can only run pipeline.execute_for")
+        batch = args[0]
+        future = cf.Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new tasks after shutdown")
+            task_id = self._task_id
+            self._task_id += 1
+            self._futures[task_id] = future
+        self._tasks.put((task_id, dill.dumps((batch.indices, batch.get_attrs(), batch.random_state))))
+        return future
+
+    def _attach(self, worker_id, slot, name):
+        with self._lock:
+            key = worker_id, slot
+            segment = self._segments.get(key)
+            if segment is None or segment.name != name:
+                if segment is not None:
+                    # a worker has replaced a released segment with a larger one
+                    segment.close()
+                segment = _AttachedSegment(name=name)
+                self._segments[key] = segment
+            self._live[key] = self._live.get(key, 0) + 1
+            return segment
+
+    def _release(self, worker_id, slot):
+        with self._lock:
+            key = worker_id, slot
+            self._live[key] -= 1
+            if self._shutdown:
+                return
+        self._released[worker_id].put(slot)
+
+    def _load(self, worker_id, payload, location):
+        # pylint: disable=protected-access
+        if location is None:
+            batch = _unpickle_batch(payload, [])
+        else:
+            slot, name, spans = location
+            segment = self._attach(worker_id, slot, name)
+            data = np.frombuffer(segment.buf, dtype=np.uint8)
+            batch = _unpickle_batch(payload, [data[offset:offset + nbytes] for offset, nbytes in spans])
+            # arrays of the batch are views of `data`, so the slot is released when all of them are deleted
+            weakref.finalize(data, self._release, worker_id, slot)
+        batch._dataset = self.pipeline._dataset
+        batch.pipeline = self.pipeline
+        return batch
+
+    def _fail_all(self, exc=None):
+        with self._lock:
+            futures, self._futures = self._futures, {}
+        for future in futures.values():
+            if exc is None:
+                future.cancel()
+            elif future.set_running_or_notify_cancel():
+                future.set_exception(exc)
+
+    def _collect(self):
+        while True:
+            try:
+                message = self._results.get(timeout=1)
+            except q.Empty:
+                if not self._shutdown and not all(process.is_alive() for process in self._processes):
+                    self._fail_all(cf.process.BrokenProcessPool("A prefetch worker process terminated abruptly"))
+                continue
+            if message is None:
+                break
+
+            task_id, worker_id, success, payload, location = message
+            with self._lock:
+                future = self._futures.pop(task_id, None)
+            try:
+                if success:
+                    result = self._load(worker_id, payload, location)
+                else:
+                    result = dill.loads(payload)
+            except Exception as e:    # pylint: disable=broad-except
+                success, result = False, e
+            if future is None or not future.set_running_or_notify_cancel():
+                continue
+            if success:
+                future.set_result(result)
+            else:
+                future.set_exception(result)
+
+    def shutdown(self, wait=True):
+        """ Stop worker processes """
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+
+        while True:
+            try:
+                self._tasks.get_nowait()
+            except q.Empty:
+                break
+        for _ in self._processes:
+            self._tasks.put(None)
+        if wait:
+            for process in self._processes:
+                process.join(timeout=10)
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+
+        self._results.put(None)
+        if threading.current_thread() is not self._collector:
+            self._collector.join()
+        self._fail_all()
+
+        # segments with batches still in use are closed when the executor is deleted
+        with self._lock:
+            for key in [key for key, count in self._live.items() if count == 0]:
+                self._segments.pop(key).close()
+                self._live.pop(key)
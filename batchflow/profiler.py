@@ -0,0 +1,145 @@
+""" Contains a storage for pipeline profiling results """
+import threading
+
+import numpy as np
+
+
+BASE_COLUMNS = dict(iter=np.int64, total_time=np.float64, pipeline_time=np.float64,
+                    start_time=np.float64, eval_expr_time=np.float64, batch_id=np.int64)
+DETAILED_COLUMNS = dict(ncalls=np.int64, tottime=np.float64, cumtime=np.float64)
+
+
+class _Columns:
+    """ Growable set of preallocated numpy arrays of the same length """
+    def __init__(self, dtypes, capacity):
+        self.size = 0
+        self.data = {name: np.empty(capacity, dtype=dtype) for name, dtype in dtypes.items()}
+
+    def _reserve(self, n):
+        capacity = len(next(iter(self.data.values())))
+        if self.size + n > capacity:
+            capacity = max(2 * capacity, self.size + n)
+            for name, array in self.data.items():
+                new_array = np.empty(capacity, dtype=array.dtype)
+                new_array[:self.size] = array[:self.size]
+                self.data[name] = new_array
+
+    def append(self, **values):
+        """ Add one row """
+        self._reserve(1)
+        for name, value in values.items():
+            self.data[name][self.size] = value
+        self.size += 1
+        return self.size - 1
+
+    def extend(self, **values):
+        """ Add several rows given as sequences of the same length """
+        n = len(next(iter(values.values())))
+        self._reserve(n)
+        for name, value in values.items():
+            self.data[name][self.size:self.size + n] = value
+        self.size += n
+
+    def __getitem__(self, name):
+        return self.data[name][:self.size]
+
+
+class ProfileStore:
+    """ Collects per-action timings of a pipeline into preallocated columnar arrays.
+
+    A dataframe is only built when :attr:`.info` is requested.
+
+    Parameters
+    ----------
+    detailed : bool
+        Whether to collect :class:`cProfile.Profile` stats for every action or wall-clock times only.
+    every : int
+        Profile only every `every`-th iteration.
+    capacity : int
+        Initial number of rows to allocate (arrays grow when needed).
+    """
+    def __init__(self, detailed=True, every=1, capacity=1024):
+        self.detailed = detailed
+        self.every = every or 1
+        self._lock = threading.Lock()
+        self._names = {}
+        self._ids = {}
+        self._base = _Columns({'action': np.int32, **BASE_COLUMNS}, capacity)
+        self._calls = _Columns({'row': np.int64, 'id': np.int32, **DETAILED_COLUMNS}, capacity * 8 if detailed else 0)
+        self._info = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_lock')
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._base.size
+
+    def sample(self, iteration):
+        """ Check whether the given iteration should be profiled """
+        return iteration % self.every == 0
+
+    @staticmethod
+    def _code(codes, key):
+        code = codes.get(key)
+        if code is None:
+            code = codes[key] = len(codes)
+        return code
+
+    def add(self, name, iteration, batch_id, exec_time, start_time, eval_expr_time, profiler=None):
+        """ Store timings of one action execution along with stats from a `profiler` (if given) """
+        if profiler is not None:
+            profiler.create_stats()
+            stats = profiler.stats
+            profiler.clear()
+        else:
+            stats = {}
+
+        with self._lock:
+            row = self._base.append(action=self._code(self._names, name), iter=iteration, batch_id=batch_id,
+                                    total_time=exec_time, start_time=start_time, eval_expr_time=eval_expr_time,
+                                    pipeline_time=sum(value[2] for value in stats.values()) if stats else exec_time)
+            if stats:
+                ids, ncalls, tottime, cumtime = [], [], [], []
+                for key, value in stats.items():
+                    for caller, caller_stats in value[4].items():
+                        # method_name, file_name, line_no, callee
+                        ids.append(self._code(self._ids, '{}::{}::{}::{}'.format(key[2], *caller)))
+                        ncalls.append(caller_stats[0])
+                        tottime.append(caller_stats[2])
+                        cumtime.append(caller_stats[3])
+                if ids:
+                    self._calls.extend(row=np.full(len(ids), row), id=ids,
+                                       ncalls=ncalls, tottime=tottime, cumtime=cumtime)
+            self._info = None
+
+    @property
+    def info(self):
+        """ pd.DataFrame : collected timings indexed by action name and function id """
+        with self._lock:
+            if self._info is None:
+                self._info = self._to_frame()
+            return self._info
+
+    def _to_frame(self):
+        import pandas as pd # pylint: disable=import-outside-toplevel
+        names = np.array(list(self._names), dtype=object)
+        if self.detailed:
+            rows = self._calls['row']
+            ids = np.array(list(self._ids), dtype=object)[self._calls['id']]
+        else:
+            rows = np.arange(len(self))
+            ids = np.full(len(self), '', dtype=object)
+
+        actions = names[self._base['action'][rows]] if len(rows) > 0 else np.array([], dtype=object)
+        index = pd.MultiIndex.from_arrays([actions, ids], names=['action', 'id'])
+        columns = {name: self._base[name][rows] for name in ['iter', 'total_time', 'pipeline_time']}
+        if self.detailed:
+            columns.update({name: self._calls[name] for name in DETAILED_COLUMNS})
+        columns.update({name: self._base[name][rows] for name in ['batch_id', 'start_time', 'eval_expr_time']})
+        return pd.DataFrame(columns, index=index)
@@ -0,0 +1,113 @@
+""" Accumulation of batch items for rebatch """
+import numpy as np
+
+from .batch import Batch
+from .dsindex import DatasetIndex
+
+
+class RebatchBuffer:
+    """ Collects items of incoming batches into batches of a fixed size.
+
+    Each component is written straight into a preallocated array of `batch_size` items,
+    and a full array is passed to the output batch without copying, so each item is copied only once.
+    This is equivalent to :meth:`Batch.merge` with `batch_size` for batches whose components are numpy arrays.
+
+    Parameters
+    ----------
+    batch_size : int
+        the size of output batches
+    components : str, tuple or None
+        components to collect, if None, all components of the first batch
+    batch_class : type or None
+        the class of output batches, if None, the class of the first batch
+
+    Examples
+    --------
+    ::
+
+        buffer = RebatchBuffer(batch_size=32)
+        for batch in batches:
+            for full_batch in buffer.put(batch):
+                ...
+        last_batch = buffer.flush()
+    """
+    def __init__(self, batch_size, components=None, batch_class=None):
+        self.batch_size = batch_size
+        self.components = (components, ) if isinstance(components, str) else components
+        self.batch_class = batch_class
+        self._buffers = None
+        self._shapes = None
+        self._size = 0
+
+    @staticmethod
+    def supports(batch):
+        """ Whether batches of this class are merged by concatenating components """
+        cls = type(batch)
+        return (cls.merge.__func__ is Batch.merge.__func__ and
+                cls.merge_component.__func__ is Batch.merge_component.__func__ and
+                bool(batch.components))
+
+    def _start(self, batch):
+        if self.components is None:
+            self.components = tuple(batch.components)
+        self.batch_class = self.batch_class or type(batch)
+        self._buffers = [None] * len(self.components)
+        self._shapes = [None] * len(self.components)
+
+    def _write(self, i, data, start, stop):
+        """ Copy `data[start:stop]` into the buffer of the i-th component """
+        buffer = self._buffers[i]
+        if buffer is None:
+            buffer = np.empty((self.batch_size, *data.shape[1:]), dtype=data.dtype)
+        elif np.result_type(buffer, data) != buffer.dtype:
+            # the same type as np.concatenate would give
+            new_buffer = np.empty_like(buffer, dtype=np.result_type(buffer, data))
+            new_buffer[:self._size] = buffer[:self._size]
+            buffer = new_buffer
+        buffer[self._size:self._size + stop - start] = data[start:stop]
+        self._buffers[i] = buffer
+
+    def _make_batch(self, size):
+        data = [None if buffer is None else buffer[:size] for buffer in self._buffers]
+        batch = self.batch_class.from_data(DatasetIndex(size), tuple(data))
+        batch.components = self.components
+        _ = batch.data
+        self._buffers = [None] * len(self.components)
+        self._size = 0
+        return batch
+
+    def put(self, batch):
+        """ Add items of a batch and return a list of batches which became full """
+        if self._buffers is None:
+            self._start(batch)
+
+        values = [batch.get(component=component) for component in self.components]
+        for i, (component, value, buffer) in enumerate(zip(self.components, values, self._buffers)):
+            if value is not None and not isinstance(value, np.ndarray):
+                raise TypeError("Unknown data type", type(value))
+            if self._size > 0 and (value is None) != (buffer is None):
+                raise ValueError('Component {} is None in some batches'.format(component))
+            if value is not None:
+                # items are not broadcast, as with np.concatenate
+                if self._shapes[i] is not None and value.shape[1:] != self._shapes[i]:
+                    raise ValueError('Items of component {} have different shapes: {} and {}'
+                                     .format(component, self._shapes[i], value.shape[1:]))
+                self._shapes[i] = value.shape[1:]
+
+        full, start, length = [], 0, len(batch)
+        while start < length:
+            stop = min(length, start + self.batch_size - self._size)
+            for i, value in enumerate(values):
+                if value is not None:
+                    self._write(i, value, start, stop)
+            self._size += stop - start
+            start = stop
+            if self._size == self.batch_size:
+                full.append(self._make_batch(self.batch_size))
+        return full
+
+    def flush(self):
+        """ Return a batch of the remaining items or None if there are no items """
+        if self._size == 0:
+            return None
+        return self._make_batch(self._size)
@@ -3,6 +3,8 @@ from .domain import KV, Domain, Option, ConfigAlias
 from .distributor import Distributor
 from .logger import BaseLogger, FileLogger, PrintLogger, TelegramLogger
 from .workers import Worker, PipelineWorker
+from .data_server import DataServer
+from .scheduler import Scheduler, SuccessiveHalving, MedianStopping, EarlyStopping
 from .named_expr import ResearchNamedExpression, REU, RP, RI, RC, RR, RD, REP, RID
 from .research import Research
 from .results import Results
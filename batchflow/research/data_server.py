@@ -0,0 +1,315 @@
+""" Data server which runs root pipelines once and shares their batches between jobs of all workers. """
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+import multiprocess as mp
+from multiprocess.connection import Listener, Client, arbitrary_address
+try:
+    from multiprocess import shared_memory, resource_tracker
+except ImportError:
+    shared_memory = None
+
+from .. import Pipeline
+from ..pools import _pickle_batch, _unpickle_batch
+
+
+def _dump_batch(batch):
+    """ Serialize a batch into a shared memory block (see :func:`~.pools._pickle_batch`)
+
+    Returns
+    -------
+    block : SharedMemory
+    layout : list of (offset, size) of the pickled payload and out-of-band buffers
+    """
+    payload, buffers = _pickle_batch(batch)
+    chunks = [memoryview(payload), *[buffer.raw() for buffer in buffers]]
+
+    layout, offset = [], 0
+    for chunk in chunks:
+        layout.append((offset, chunk.nbytes))
+        offset += chunk.nbytes
+    block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for (offset, size), chunk in zip(layout, chunks):
+        block.buf[offset:offset + size] = chunk.cast('B')
+    return block, layout
+
+def _load_batch(name, layout):
+    """ Copy a batch from a shared memory block """
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        chunks = [bytearray(block.buf[offset:offset + size]) for offset, size in layout]
+    finally:
+        block.close()
+    return _unpickle_batch(chunks[0], chunks[1:])
+
+
+class _Stream:
+    """ One pass of a root pipeline shared by several subscribers """
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        _, kwargs = pipeline._lazy_run or ((), {}) # pylint: disable=protected-access
+        self.endless = kwargs.get('n_epochs', 1) is None and kwargs.get('n_iters') is None
+        self.batches = OrderedDict()
+        self.positions = {}
+        self.produced = 0
+        self.stop = None
+        self.error = None
+        self.started = False
+        self.closed = False
+
+    def open(self):
+        """ Whether new subscribers can join the stream """
+        return not self.started or 0 in self.batches or self.endless
+
+    def first(self):
+        """ Index of the first batch for a new subscriber """
+        return min(self.batches, default=self.produced)
+
+    def evict(self):
+        """ Free batches which were read by all subscribers """
+        lowest = min(self.positions.values(), default=self.produced)
+        for index in [index for index in self.batches if index < lowest]:
+            block, _ = self.batches.pop(index)
+            block.close()
+            block.unlink()
+        if not self.positions and not self.open():
+            self.free()
+
+    def free(self):
+        """ Free all batches and stop producing new ones """
+        self.closed = True
+        for block, _ in self.batches.values():
+            block.close()
+            block.unlink()
+        self.batches.clear()
+
+
+class DataServer:
+    """ Process which runs root pipelines of research units and publishes batches to jobs via shared memory.
+
+    Each job reads batches of a root pipeline in order, so jobs executed at the same time by different workers
+    share each batch and only run their branch pipelines. A root pipeline with `n_epochs=None` and `n_iters=None`
+    is run once and a new job starts reading it from the oldest batch kept in memory. A finite root pipeline
+    is read from the beginning by each job: the job joins the current pass over it if its first batch
+    was not freed yet, otherwise a new pass is started.
+
+    A batch is freed when all subscribers of the stream have read it. A subscriber cannot get more than
+    `buffer` batches ahead of the slowest one, so jobs sharing a stream proceed roughly at the same pace.
+
+    Parameters
+    ----------
+    executable_units : OrderedDict
+        units of the research, only pipelines with roots are served
+    buffer : int
+        maximum number of batches of one stream kept in shared memory
+    """
+    def __init__(self, executable_units, buffer=10):
+        if shared_memory is None:
+            raise ImportError('Data server requires Python 3.8 or later')
+        self.units = OrderedDict((name, unit) for name, unit in executable_units.items()
+                                 if unit.root_pipeline is not None)
+        self.buffer = buffer
+        self.address = arbitrary_address('AF_UNIX')
+        self.authkey = os.urandom(16)
+
+        self.process = None
+        self._streams = None
+        self._lock = None
+        self._subscribers = None
+
+    def start(self):
+        """ Start the server process and wait until it accepts connections """
+        # the server and all workers share one resource tracker, so blocks attached by jobs
+        # are not unlinked when jobs exit
+        resource_tracker.ensure_running()
+        ready = mp.Event()
+        self.process = mp.Process(target=self._serve, args=(ready,), daemon=True)
+        self.process.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        """ Stop the server process and free shared memory """
+        if self.process is not None and self.process.is_alive():
+            try:
+                connection = Client(self.address, authkey=self.authkey)
+                connection.send(('shutdown', ))
+                connection.close()
+            except OSError:
+                pass
+            self.process.join(5)
+            if self.process.is_alive():
+                self.process.terminate()
+        self.process = None
+
+    def client(self):
+        """ Client to use in a job """
+        return DataClient(self.address, self.authkey)
+
+    def _serve(self, ready):
+        self._streams = {name: [] for name in self.units}
+        self._lock = threading.Condition()
+        self._subscribers = 0
+        listener = Listener(self.address, authkey=self.authkey)
+        ready.set()
+        try:
+            while True:
+                connection = listener.accept()
+                message = connection.recv()
+                if message[0] == 'shutdown':
+                    connection.close()
+                    break
+                connection.send(('ok', ))
+                threading.Thread(target=self._handle, args=(connection, ), daemon=True).start()
+        finally:
+            listener.close()
+            with self._lock:
+                for streams in self._streams.values():
+                    for stream in streams:
+                        stream.free()
+
+    def _new_pipeline(self, name):
+        unit = self.units[name]
+        if unit.dataset is not None:
+            pipeline = unit.root_pipeline << unit.dataset
+        else:
+            pipeline = unit.root_pipeline + Pipeline()
+        pipeline.reset('iter')
+        return pipeline
+
+    def _handle(self, connection):
+        """ Serve requests of one job """
+        subscriptions = {}
+        try:
+            while True:
+                try:
+                    message = connection.recv()
+                except EOFError:
+                    break
+                if message[0] == 'subscribe':
+                    stream, key = subscriptions[message[1]] = self._subscribe(message[1])
+                    connection.send(('ok', stream.positions[key]))
+                elif message[0] == 'unsubscribe':
+                    self._unsubscribe(*subscriptions.pop(message[1]))
+                    connection.send(('ok', ))
+                elif message[0] == 'get':
+                    connection.send(self._get(*subscriptions[message[1]], message[2]))
+        finally:
+            for subscription in subscriptions.values():
+                self._unsubscribe(*subscription)
+            connection.close()
+
+    def _subscribe(self, name):
+        with self._lock:
+            self._subscribers += 1
+            key = self._subscribers
+            streams = self._streams[name]
+            streams[:] = [stream for stream in streams if stream.positions or stream.open()]
+            if len(streams) == 0 or not streams[-1].open():
+                streams.append(_Stream(self._new_pipeline(name)))
+                threading.Thread(target=self._produce, args=(streams[-1], ), daemon=True).start()
+            stream = streams[-1]
+            stream.positions[key] = stream.first()
+            return stream, key
+
+    def _unsubscribe(self, stream, key):
+        with self._lock:
+            stream.positions.pop(key, None)
+            stream.evict()
+            self._lock.notify_all()
+
+    def _get(self, stream, key, index):
+        """ Wait for batch `index` of the stream """
+        with self._lock:
+            stream.positions[key] = index
+            stream.evict()
+            self._lock.notify_all()
+            while True:
+                if index in stream.batches:
+                    block, layout = stream.batches[index]
+                    return ('batch', block.name, layout)
+                if stream.error is not None:
+                    return ('error', stream.error)
+                if stream.stop is not None and index >= stream.stop:
+                    return ('stop', )
+                self._lock.wait(1)
+
+    def _produce(self, stream):
+        """ Run the root pipeline of the stream ahead of subscribers, keeping at most `buffer` batches """
+        while True:
+            with self._lock:
+                while not stream.closed and (len(stream.positions) == 0 or
+                                             stream.produced - min(stream.positions.values()) >= self.buffer):
+                    self._lock.wait(1)
+                if stream.closed:
+                    return
+                stream.started = True
+
+            batch = None
+            try:
+                batch = _dump_batch(stream.pipeline.next_batch())
+            except StopIteration:
+                stream.stop = stream.produced
+            except Exception as e: #pylint:disable=broad-except
+                stream.error = repr(e)
+
+            with self._lock:
+                if batch is not None:
+                    if stream.closed:
+                        batch[0].close()
+                        batch[0].unlink()
+                        return
+                    stream.batches[stream.produced] = batch
+                    stream.produced += 1
+                self._lock.notify_all()
+                if batch is None:
+                    return
+
+
+class DataClient:
+    """ Connection of a job to :class:`.DataServer`. """
+    def __init__(self, address, authkey):
+        self.address = address
+        self.authkey = authkey
+        self.connection = None
+        self.positions = {}
+
+    def _request(self, *message, last_update_time=None):
+        if self.connection is None:
+            self.connection = Client(self.address, authkey=self.authkey)
+            self.connection.send(('connect', ))
+            self.connection.recv()
+        self.connection.send(message)
+        while not self.connection.poll(1):
+            # waiting for other jobs is not a reason to kill the job on timeout
+            if last_update_time is not None:
+                last_update_time.value = time.time()
+        return self.connection.recv()
+
+    def reset(self, name):
+        """ Start reading a root pipeline from the beginning """
+        if name in self.positions:
+            self._request('unsubscribe', name)
+            del self.positions[name]
+
+    def next_batch(self, name, last_update_time=None):
+        """ Next batch of the root pipeline of the unit `name` """
+        if name not in self.positions:
+            self.positions[name] = self._request('subscribe', name)[1]
+        answer = self._request('get', name, self.positions[name], last_update_time=last_update_time)
+        if answer[0] == 'stop':
+            raise StopIteration
+        if answer[0] == 'error':
+            raise RuntimeError('Root pipeline of {} failed in data server: {}'.format(name, answer[1]))
+        self.positions[name] += 1
+        return _load_batch(*answer[1:])
+
+    def close(self):
+        """ Close the connection """
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+        self.positions = {}
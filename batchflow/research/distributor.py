@@ -28,13 +28,16 @@ class _DummyBar:
 
 class Distributor:
     """ Distributor of jobs between workers. """
-    def __init__(self, n_iters, workers, devices, worker_class=None, timeout=5, trials=2, logger=None):
+    def __init__(self, n_iters, workers, devices, worker_class=None, timeout=5, trials=2, logger=None, reuse=False):
         """
         Parameters
         ----------
         workers : int or list of Worker configs
 
         worker_class : Worker subclass or None
+
+        reuse : bool
+            whether workers should execute all jobs in long-lived subprocesses
         """
         self.n_iters = n_iters
         self.workers = workers
@@ -43,6 +46,7 @@ class Distributor:
         self.timeout = timeout
         self.trials = trials
         self.logger = logger
+        self.reuse = reuse
 
         self.logfile = None
         self.errorfile = None
@@ -82,7 +86,8 @@ class Distributor:
                 worker_name=i,
                 timeout=self.timeout,
                 trials=self.trials,
-                logger=self.logger
+                logger=self.logger,
+                reuse=self.reuse
                 )
                        for i in range(self.workers)]
         else:
@@ -93,7 +98,8 @@ class Distributor:
                     timeout=self.timeout,
                     trials=self.trials,
                     logger=self.logger,
-                    worker_config=worker_config
+                    worker_config=worker_config,
+                    reuse=self.reuse
                     )
                 for i, worker_config in enumerate(self.workers)
             ]
@@ -6,6 +6,7 @@ from copy import copy, deepcopy
 import dill
 from ..named_expr import eval_expr
 from .. import Config, Pipeline, V, L
+from .results import dump_chunk
 
 class PipelineStopIteration(StopIteration):
     """ Special pipeline StopIteration exception """
@@ -207,18 +208,26 @@ class Executable:
         else:
             raise TypeError("Executable should be pipeline, not a function")
 
-    def reset_root_iter(self):
+    def reset_root_iter(self, data_client=None):
         """ Reset pipeline iterator """
         if self.root_pipeline is not None:
-            self.root_pipeline.reset("iter")
+            if data_client is not None:
+                data_client.reset(self.name)
+            else:
+                self.root_pipeline.reset("iter")
         else:
             raise TypeError("Executable must have root")
 
-    def next_batch_root(self):
-        """ Next batch from root pipeline """
+    def next_batch_root(self, data_client=None):
+        """ Next batch from root pipeline (or from the data server if `data_client` is given) """
         if self.root_pipeline is not None:
             try:
-                batch = self.root_pipeline.next_batch()
+                if data_client is not None:
+                    batch = data_client.next_batch(self.name, self.last_update_time)
+                    dataset = self.dataset if self.dataset is not None else self.root_pipeline.dataset
+                    batch._dataset = dataset # pylint: disable=protected-access
+                else:
+                    batch = self.root_pipeline.next_batch()
             except StopIteration:
                 raise PipelineStopIteration('{} was stopped'.format(self.name))
         else:
@@ -274,12 +283,7 @@ class Executable:
     def dump_result(self, task_id, iteration, filename):
         """ Dump pipeline results """
         if len(self.variables) > 0:
-            if not os.path.exists(os.path.join(self.research_path, self.experiment_path, task_id)):
-                os.makedirs(os.path.join(self.research_path, self.experiment_path, task_id))
-            self.result['sample_index'] = [task_id] * len(self.result['iteration'])
-            path = os.path.join(self.research_path, self.experiment_path, task_id, filename + '_' + str(iteration))
-            with open(path, 'wb') as file:
-                dill.dump(self.result, file)
+            dump_chunk(self.research_path, self.experiment_path, task_id, filename, iteration, self.result)
         self._clear_result()
 
     def create_folder(self):
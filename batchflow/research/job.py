@@ -6,10 +6,12 @@ import random
 
 from ..named_expr import eval_expr
 from .. import inbatch_parallel
+from .scheduler import EarlyStopping
 
 class Job:
     """ Contains one job. """
-    def __init__(self, executable_units, n_iters, configs, branches, research_path):
+    def __init__(self, executable_units, n_iters, configs, branches, research_path, scheduler=None,
+                 data_client=None):
         """
         Parameters
         ----------
@@ -22,6 +24,8 @@ class Job:
         self.configs = configs
         self.branches = branches
         self.research_path = research_path
+        self.scheduler = scheduler
+        self.data_client = data_client
         self.worker_config = {}
         self.ids = [str(random.getrandbits(32)) for _ in self.configs]
 
@@ -80,16 +84,16 @@ class Job:
         unit = self.experiments[0][name]
         run = [action['run'] for action in actions if action is not None][0]
         if run:
-            unit.reset_root_iter()
+            unit.reset_root_iter(self.data_client)
             while True:
                 try:
-                    batch = unit.next_batch_root()
+                    batch = unit.next_batch_root(self.data_client)
                     exceptions = self._parallel_run(iteration, name, batch, actions)
                 except StopIteration:
                     break
         else:
             try:
-                batch = unit.next_batch_root()
+                batch = unit.next_batch_root(self.data_client)
             except StopIteration as e:
                 exceptions = [e] * len(self.experiments)
             else:
@@ -98,6 +102,36 @@ class Job:
         self.last_update_time.value = time.time()
         return exceptions
 
+    def close(self):
+        """ Close the connection to the data server """
+        if self.data_client is not None:
+            self.data_client.close()
+
+    def schedule(self, iteration, name, actions, exceptions):
+        """ Stop experiments which are not promoted by the scheduler after unit `name` is executed
+
+        Returns
+        -------
+        list of (experiment index, decision) for experiments at a rung
+        """
+        decisions = []
+        if self.scheduler is None or self.scheduler.unit != name:
+            return decisions
+        for i, (experiment, action) in enumerate(zip(self.experiments, actions)):
+            if action is None or exceptions[i] is not None or self.exceptions[i] is not None:
+                continue
+            unit = experiment[name]
+            values = unit.result.get(self.scheduler.variable)
+            if not values:
+                continue
+            decision = self.scheduler(self.research_path, unit.experiment_path, self.ids[i], iteration + 1, values[-1])
+            if decision is not None:
+                decisions.append((i, decision))
+            if decision == 'stop':
+                exceptions[i] = EarlyStopping('{} was stopped by scheduler at iteration {}'.format(name, iteration + 1))
+                self.stopped[i] = True
+        return decisions
+
     def update_exceptions(self, exceptions):
         """ Update exceptions with new from current iteration """
         for i, exception in enumerate(exceptions):
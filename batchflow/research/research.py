@@ -18,6 +18,7 @@ from .distributor import Distributor
 from .workers import PipelineWorker
 from .domain import Domain, Option, ConfigAlias
 from .job import Job
+from .data_server import DataServer
 from .logger import BaseLogger, FileLogger, PrintLogger, TelegramLogger
 from .utils import get_metrics
 from .executable import Executable
@@ -38,6 +39,8 @@ class Research:
         self.domain = None
         self.n_iters = None
         self.timeout = 5
+        self.reuse_workers = False
+        self.data_server = False
         self.n_configs = None
         self.n_reps = None
         self.n_configs = None
@@ -49,6 +52,7 @@ class Research:
         # update parameters for domain. None or dict with keys (function, each)
         self._update_domain = None
         self.n_updates = 0
+        self.scheduler = None
 
     def add_pipeline(self, root, branch=None, dataset=None, variables=None,
                      name=None, execute=1, dump='last', run=False, logging=False, **kwargs):
@@ -253,6 +257,32 @@ class Research:
         self.n_updates = n_updates
         return self
 
+    def add_scheduler(self, scheduler):
+        """ Add a scheduler which stops unpromising experiments early.
+
+        Parameters
+        ----------
+        scheduler : Scheduler
+            e.g. :class:`.SuccessiveHalving` or :class:`.MedianStopping`.
+            Its decisions are saved into results as a unit `'scheduler'`, e.g.
+            `research.load_results(names='scheduler')`.
+
+        Examples
+        --------
+        ::
+
+            research = (Research()
+                .add_pipeline(train_ppl, variables='loss', name='train')
+                .add_scheduler(SuccessiveHalving('train', 'loss', mode='min', min_iters=100, eta=3))
+                .init_domain(domain))
+        """
+        if scheduler.unit not in self.executables:
+            raise ValueError('Unit {} is not added to research'.format(scheduler.unit))
+        if scheduler.variable not in self.executables[scheduler.unit].variables:
+            raise ValueError('Unit {} has no variable {}'.format(scheduler.unit, scheduler.variable))
+        self.scheduler = scheduler
+        return self
+
     def update_config(self, function, parameters=None, cache=0):
         """ Add function to update config from domain.
 
@@ -314,7 +344,8 @@ class Research:
         return Results(self.name, *args, **kwargs)
 
     def run(self, n_iters=None, workers=1, branches=1, name=None,
-            bar=False, devices=None, worker_class=None, timeout=5, trials=2):
+            bar=False, devices=None, worker_class=None, timeout=5, trials=2, reuse_workers=False,
+            data_server=False):
         """ Run research.
 
         Parameters
@@ -353,6 +384,17 @@ class Research:
             each job will be killed if it doesn't answer more then that time in minutes
         trials : int
             trials to execute job
+        reuse_workers : bool
+            If False, each job (and each its trial) is executed in a new subprocess.
+
+            If True, each worker executes all its jobs in one long-lived subprocess, so modules, pipelines
+            and datasets are loaded only once. The subprocess is restarted only after a job times out or crashes.
+            Useful when there are a lot of short jobs.
+        data_server : bool or int
+            If True, root pipelines are executed once in a separate process and their batches are published
+            to jobs of all workers through shared memory, so workers run only branch pipelines.
+            If int, the maximum number of batches of a root pipeline kept in memory (10 by default).
+            See :class:`~.DataServer`. Requires Python 3.8 or later.
 
         **How does it work**
 
@@ -375,6 +417,8 @@ class Research:
             self.worker_class = worker_class or PipelineWorker
             self.timeout = timeout
             self.trials = trials
+            self.reuse_workers = reuse_workers
+            self.data_server = data_server
 
         self.name = name or self.name
         self.bar = bar
@@ -395,12 +439,24 @@ class Research:
 
         print("Research {} is starting...".format(self.name))
 
+        server = None
+        data_server = getattr(self, 'data_server', False)
+        if data_server:
+            buffer = 10 if data_server is True else data_server
+            server = DataServer(self.executables, buffer=buffer).start()
+
         jobs_queue = DynamicQueue(self.branches, self.domain, self.n_iters, self.executables,
-                                  self.name, self._update_config, self._update_domain, self.n_updates)
+                                  self.name, self._update_config, self._update_domain, self.n_updates,
+                                  scheduler=getattr(self, 'scheduler', None),
+                                  data_client=server.client() if server is not None else None)
         self.logger.eval_kwargs(path=self.name)
         distr = Distributor(self.n_iters, self.workers, self.devices, self.worker_class, self.timeout,
-                            self.trials, self.logger)
-        distr.run(jobs_queue, bar=self.bar)
+                            self.trials, self.logger, reuse=self.reuse_workers)
+        try:
+            distr.run(jobs_queue, bar=self.bar)
+        finally:
+            if server is not None:
+                server.stop()
 
         return self
 
@@ -499,12 +555,15 @@ class Research:
 
 class DynamicQueue:
     """ Queue of tasks that can be changed depending on previous results. """
-    def __init__(self, branches, domain, n_iters, executables, research_path, update_config, update_domain, n_updates):
+    def __init__(self, branches, domain, n_iters, executables, research_path, update_config, update_domain, n_updates,
+                 scheduler=None, data_client=None):
         self.branches = branches
         self.domain = domain
         self.n_iters = n_iters
         self.executables = executables
         self.research_path = research_path
+        self.scheduler = scheduler
+        self.data_client = data_client
 
         if update_config is not None and update_config['cache'] > 0:
             update_config['function'] = lru_cache(maxsize=update_config['cache'])(update_config['function'])
@@ -589,7 +648,8 @@ class DynamicQueue:
                 break
         for i, config in enumerate(configs):
             self.put((self.generated_jobs + i,
-                      Job(self.executables, self.n_iters, config, self.branches, self.research_path)))
+                      Job(self.executables, self.n_iters, config, self.branches, self.research_path,
+                          self.scheduler, self.data_client)))
 
         n_tasks = len(configs)
         self.generated_jobs += n_tasks
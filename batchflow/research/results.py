@@ -5,8 +5,109 @@ from collections import OrderedDict
 import glob
 import json
 import dill
+import numpy as np
 import pandas as pd
 
+
+CATALOG = 'catalog.jsonl'
+
+
+def _object_column(values):
+    column = np.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        column[i] = value
+    return column
+
+
+def _to_column(values):
+    """ Convert a list of values into a numeric array if possible or into an array of objects otherwise """
+    try:
+        column = np.asarray(values)
+    except ValueError:
+        column = None
+    if column is None or column.dtype.kind not in 'biuf' or len(column) != len(values):
+        column = _object_column(values)
+    return column
+
+
+def _stack(arrays):
+    """ Concatenate arrays into a dataframe column (rows of multidimensional arrays become objects) """
+    if all(array.ndim == 1 for array in arrays):
+        return np.concatenate(arrays)
+    return _object_column([row for array in arrays for row in array])
+
+
+def dump_chunk(research_path, experiment_path, sample_index, name, iteration, result):
+    """ Append a chunk of results of one unit to its data file and register the chunk in a catalog
+
+    Results of each unit in each experiment are stored in one file, `<unit>.chunks`, chunk after chunk.
+    Each variable of a chunk is a separate segment: numeric values are written as raw arrays,
+    all the others are pickled with `dill`. A line with positions of all segments is appended to
+    `catalog.jsonl` in the experiment config folder, so results can be filtered by units, variables,
+    iterations and configs without opening data files, and only selected segments (or even rows) are read then.
+
+    Parameters
+    ----------
+    research_path : str
+        path to the research folder
+    experiment_path : str
+        path to the experiment folder relative to `research_path`
+    sample_index : str
+        experiment id
+    name : str
+        unit name
+    iteration : int
+        the number of iterations done
+    result : dict
+        lists of values for each variable along with `'iteration'` list
+    """
+    path = os.path.join(experiment_path, sample_index, name + '.chunks')
+    os.makedirs(os.path.dirname(os.path.join(research_path, path)), exist_ok=True)
+
+    iterations = np.asarray(result['iteration'], dtype=np.int64)
+    columns = {}
+    # each experiment is executed by one process, so its data files have only one writer
+    with open(os.path.join(research_path, path), 'ab') as file:
+        offset = file.seek(0, os.SEEK_END)
+        for variable, values in result.items():
+            if variable == 'sample_index':
+                continue
+            column = iterations if variable == 'iteration' else _to_column(values)
+            if column.dtype == object:
+                payload = dill.dumps(list(column))
+                columns[variable] = ['dill', offset, len(payload)]
+            else:
+                column = np.ascontiguousarray(column)
+                payload = column.tobytes()
+                columns[variable] = ['raw', offset, len(payload), column.dtype.str, list(column.shape)]
+            file.write(payload)
+            offset += len(payload)
+
+    record = dict(sample_index=sample_index, name=name, iteration=iteration,
+                  start=int(iterations.min()) if len(iterations) > 0 else None,
+                  stop=int(iterations.max()) if len(iterations) > 0 else None, path=path, columns=columns)
+    # one short write to a file opened for appending is not interleaved with others, so workers do not need a lock
+    with open(os.path.join(research_path, experiment_path, CATALOG), 'a') as file:
+        file.write(json.dumps(record) + '\n')
+
+
+def _read_segment(file, meta, rows=None):
+    """ Read values of a chunk segment (only given rows of raw arrays are read from disk) """
+    if meta[0] == 'dill':
+        file.seek(meta[1])
+        values = _object_column(dill.loads(file.read(meta[2])))
+        return values if rows is None else values[rows]
+
+    _, offset, nbytes, dtype, shape = meta
+    first, last = (0, shape[0]) if rows is None else (rows[0], rows[-1] + 1)
+    row_size = nbytes // shape[0] if shape[0] > 0 else 0
+    buffer = bytearray((last - first) * row_size)
+    file.seek(offset + first * row_size)
+    file.readinto(buffer)
+    values = np.frombuffer(buffer, dtype=dtype).reshape((last - first, *shape[1:]))
+    return values if rows is None else values[rows - first]
+
+
 class Results:
     """ Class for dealing with results of research
 
@@ -37,6 +138,12 @@ class Results:
     kwargs : dict
         kwargs will be interpreted as config paramter
 
+    Notes
+    -----
+    Results are read from chunks registered in catalogs of experiment configs (see :func:`.dump_chunk`),
+    so only data of selected configs, units, variables and iterations is read from disk.
+    Results of older researches dumped as pickled dicts are loaded as well.
+
     Returns
     -------
     pandas.DataFrame or dict
@@ -97,9 +204,9 @@ class Results:
         iterations = [item for item in iterations if item is not None]
         for name, end in files.items():
             if len(iterations) == 0:
-                intersection = pd.np.arange(start, end)
+                intersection = np.arange(start, end)
             else:
-                intersection = pd.np.intersect1d(iterations, pd.np.arange(start, end))
+                intersection = np.intersect1d(iterations, np.arange(start, end))
             if len(intersection) > 0:
                 result.append((name, intersection))
             start = end
@@ -108,15 +215,82 @@ class Results:
     def _slice_file(self, dumped_file, iterations_to_load, variables):
         iterations = dumped_file['iteration']
         if len(iterations) > 0:
-            elements_to_load = pd.np.array([pd.np.isin(it, iterations_to_load) for it in iterations])
+            elements_to_load = np.isin(np.asarray(iterations), iterations_to_load)
             res = OrderedDict()
             for variable in ['iteration', 'sample_index', *variables]:
                 if variable in dumped_file:
-                    res[variable] = pd.np.array(dumped_file[variable])[elements_to_load]
+                    res[variable] = np.array(dumped_file[variable])[elements_to_load]
         else:
             res = None
         return res
 
+    def _read_catalog(self, path):
+        """ Read records of a results catalog of one experiment config (None if results were dumped as dicts) """
+        path = os.path.join(path, CATALOG)
+        if not os.path.exists(path):
+            return None
+        records = OrderedDict()
+        with open(path, 'r') as file:
+            for line in file:
+                record = json.loads(line)
+                # a chunk dumped again (e.g. when a job is restarted) replaces the previous one
+                records[record['sample_index'], record['name'], record['iteration']] = record
+        return list(records.values())
+
+    def _load_chunks(self, records, unit, iterations, variables, sample_index=None):
+        """ Load results of one unit for each experiment from the catalog records """
+        iterations = np.array([item for item in iterations if item is not None])
+        low, high = (iterations.min(), iterations.max()) if len(iterations) > 0 else (None, None)
+
+        samples = OrderedDict()
+        for record in records:
+            if record['name'] != unit or (sample_index is not None and record['sample_index'] != sample_index):
+                continue
+            if record['start'] is None or (low is not None and (record['stop'] < low or record['start'] > high)):
+                continue
+            samples.setdefault(record['sample_index'], []).append(record)
+
+        results = []
+        for index, sample_records in samples.items():
+            res = OrderedDict((key, []) for key in [*variables, 'iteration', 'sample_index'])
+            with open(os.path.join(self.path, sample_records[0]['path']), 'rb') as file:
+                for record in sorted(sample_records, key=lambda record: record['start']):
+                    chunk_iterations = _read_segment(file, record['columns']['iteration'])
+                    rows = None
+                    if low is not None:
+                        rows = np.flatnonzero(np.isin(chunk_iterations, iterations))
+                        if len(rows) == 0:
+                            continue
+                        chunk_iterations = chunk_iterations[rows]
+                    res['iteration'].append(chunk_iterations)
+                    res['sample_index'].append(np.full(len(chunk_iterations), index, dtype=object))
+                    for variable in variables:
+                        meta = record['columns'].get(variable)
+                        if meta is None:
+                            res[variable].append(np.full(len(chunk_iterations), np.nan))
+                        else:
+                            res[variable].append(_read_segment(file, meta, rows))
+            if len(res['iteration']) > 0:
+                results.append(res)
+        return results
+
+    def _load_dumped(self, path, unit, iterations, variables, sample_index=None):
+        """ Load results of one unit for each experiment from files with pickled dicts """
+        results = []
+        sample_folders = glob.glob(os.path.join(glob.escape(path), sample_index or '*'))
+        for sample_folder in sample_folders:
+            files = glob.glob(glob.escape(os.path.join(sample_folder, unit)) + '_[0-9]*')
+            files = self._sort_files(files, iterations)
+            if len(files) != 0:
+                res = []
+                for filename, iterations_to_load in files.items():
+                    with open(filename, 'rb') as file:
+                        res.append(self._slice_file(dill.load(file), iterations_to_load, variables))
+                res = self._concat(res, variables)
+                self._fix_length(res)
+                results.append(OrderedDict((key, [_to_column(values)]) for key, values in res.items()))
+        return results
+
     def _concat(self, results, variables):
         res = {key: [] for key in [*variables, 'iteration', 'sample_index']}
         for chunk in results:
@@ -130,7 +304,7 @@ class Results:
         max_len = max([len(value) for value in chunk.values()])
         for value in chunk.values():
             if len(value) < max_len:
-                value.extend([pd.np.nan] * (max_len - len(value)))
+                value.extend([np.nan] * (max_len - len(value)))
 
     def _filter_configs(self, config=None, alias=None, repetition=None):
         result = None
@@ -190,6 +364,8 @@ class Results:
                          for unit in self.description['executables'].values()
                          for variable in unit['variables']
                         ]
+            if 'scheduler' in self._get_list(names):
+                variables += ['value', 'decision']
 
         names = self._get_list(names)
         variables = self._get_list(variables)
@@ -201,34 +377,44 @@ class Results:
             _repetition = config_alias.pop_config('repetition')
             _update = config_alias.pop_config('update')
             path = os.path.join(self.path, 'results', alias_str)
+            catalog = self._read_catalog(path)
 
             for unit in names:
-                sample_folders = glob.glob(os.path.join(glob.escape(path), sample_index or '*'))
-                for sample_folder in sample_folders:
-                    files = glob.glob(glob.escape(os.path.join(sample_folder, unit)) + '_[0-9]*')
-                    files = self._sort_files(files, iterations)
-                    if len(files) != 0:
-                        res = []
-                        for filename, iterations_to_load in files.items():
-                            with open(filename, 'rb') as file:
-                                res.append(self._slice_file(dill.load(file), iterations_to_load, variables))
-                        res = self._concat(res, variables)
-                        self._fix_length(res)
-
-                        config_alias.pop_config('_dummy')
-                        if concat_config:
-                            res['config'] = config_alias.alias(as_string=True)
-                        if use_alias:
-                            if not concat_config or not drop_columns:
-                                res.update(config_alias.alias(as_string=False))
-                        else:
-                            res.update(config_alias.config())
-                        res.update({'repetition': _repetition.config()['repetition']})
-                        res.update({'update': _update.config()['update']})
-                        all_results.append(
-                            pd.DataFrame({
-                                'name': unit,
-                                **res
-                            })
-                            )
-        return pd.concat(all_results, sort=False).reset_index(drop=True) if len(all_results) > 0 else pd.DataFrame(None)
+                if catalog is not None:
+                    unit_results = self._load_chunks(catalog, unit, iterations, variables, sample_index)
+                else:
+                    unit_results = self._load_dumped(path, unit, iterations, variables, sample_index)
+                for res in unit_results:
+                    scalars = OrderedDict()
+                    config_alias.pop_config('_dummy')
+                    if concat_config:
+                        scalars['config'] = config_alias.alias(as_string=True)
+                    if use_alias:
+                        if not concat_config or not drop_columns:
+                            scalars.update(config_alias.alias(as_string=False))
+                    else:
+                        scalars.update(config_alias.config())
+                    scalars.update({'repetition': _repetition.config()['repetition']})
+                    scalars.update({'update': _update.config()['update']})
+                    all_results.append((unit, res, scalars))
+        return self._to_frame(all_results)
+
+    def _to_frame(self, results):
+        """ Build one dataframe from columns of all experiments (grouped by column names) """
+        groups = OrderedDict()
+        for unit, res, scalars in results:
+            groups.setdefault((tuple(res), tuple(scalars)), []).append((unit, res, scalars))
+
+        frames = []
+        for (keys, scalar_keys), group in groups.items():
+            lengths = [sum(len(array) for array in res['iteration']) for _, res, _ in group]
+            data = OrderedDict(name=np.repeat(_object_column([unit for unit, _, _ in group]), lengths))
+            for key in keys:
+                data[key] = _stack([array for _, res, _ in group for array in res[key]])
+            for key in scalar_keys:
+                values = [scalars[key] for _, _, scalars in group]
+                column = _to_column(values)
+                column = column if column.ndim == 1 else _object_column(values)
+                data[key] = np.repeat(column, lengths)
+            frames.append(pd.DataFrame(data))
+        return pd.concat(frames, sort=False).reset_index(drop=True) if len(frames) > 0 else pd.DataFrame(None)
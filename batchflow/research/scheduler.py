@@ -0,0 +1,174 @@
+""" Schedulers which stop unpromising experiments early. """
+
+import os
+import json
+import numpy as np
+
+from .results import dump_chunk
+
+
+class EarlyStopping(StopIteration):
+    """ Experiment was stopped by a scheduler """
+
+
+class Scheduler:
+    """ Base class for schedulers which decide whether an experiment continues at rung iterations.
+
+    A value of a tracked variable of a unit is taken from :attr:`.Executable.result` right after the unit
+    is executed at a rung. Values from all experiments are appended to `scheduler.jsonl` in the research folder,
+    so decisions are made asynchronously by the processes that execute jobs, regardless of workers and branches.
+    Each decision is also dumped into experiment results as a unit named `'scheduler'`
+    with variables `'value'` and `'decision'` (see :class:`.Results`).
+
+    Parameters
+    ----------
+    unit : str
+        name of the unit (pipeline or function) to track
+    variable : str
+        name of the pipeline variable or the function output to track
+    mode : 'min' or 'max'
+        whether smaller or greater values are better
+    """
+    name = 'scheduler'
+    variables = ['value', 'decision']
+
+    def __init__(self, unit, variable, mode='min'):
+        if mode not in ['min', 'max']:
+            raise ValueError("mode should be 'min' or 'max'", mode)
+        self.unit = unit
+        self.variable = variable
+        self.mode = mode
+
+    def rung(self, iteration, sample_index):
+        """ Return a key of a rung (experiments are compared only with others at the same rung)
+        or None if no decision should be made at that iteration. """
+        raise NotImplementedError
+
+    def promote(self, value, values):
+        """ Whether an experiment with a given value continues when values of other experiments are known """
+        raise NotImplementedError
+
+    def _better(self, value, values):
+        """ The number of values better than a given one """
+        values = np.asarray(values, dtype=np.float64)
+        return np.sum(values < value) if self.mode == 'min' else np.sum(values > value)
+
+    def __call__(self, research_path, experiment_path, sample_index, iteration, value):
+        """ Make a decision for an experiment after `iteration` iterations
+
+        Returns
+        -------
+        'promote', 'stop' or None if iteration is not a rung
+        """
+        rung = self.rung(iteration, sample_index)
+        if rung is None:
+            return None
+        value = float(value)
+
+        path = os.path.join(research_path, 'scheduler.jsonl')
+        values = []
+        if os.path.exists(path):
+            with open(path, 'r') as file:
+                for line in file:
+                    record = json.loads(line)
+                    if record['rung'] == rung:
+                        values.append(record['value'])
+
+        decision = 'promote' if self.promote(value, values) else 'stop'
+        record = dict(rung=rung, value=value, decision=decision, sample_index=sample_index, iteration=iteration)
+        with open(path, 'a') as file:
+            file.write(json.dumps(record) + '\n')
+
+        dump_chunk(research_path, experiment_path, sample_index, self.name, iteration,
+                   {'value': [value], 'decision': [decision], 'iteration': [iteration - 1]})
+        return decision
+
+
+class SuccessiveHalving(Scheduler):
+    """ Asynchronous successive halving (or Hyperband with several brackets).
+
+    Rungs are at `min_iters * eta ** k` iterations. At each rung an experiment continues only if its value
+    is among the best `1 / eta` of all values at that rung known so far. Experiments reaching a rung
+    while there are less than `min_samples` values are promoted.
+
+    With `brackets > 1` experiments are distributed between brackets, rungs of the bracket `s`
+    starting at `min_iters * eta ** s`, so that more aggressive and more conservative schedules are combined.
+
+    Parameters
+    ----------
+    unit : str
+        name of the unit to track
+    variable : str
+        name of the variable to track
+    mode : 'min' or 'max'
+        whether smaller or greater values are better
+    min_iters : int
+        the first rung
+    eta : int
+        reduction factor
+    max_iters : int or None
+        no decisions are made at this iteration or later
+    brackets : int
+        the number of brackets
+    min_samples : int or None
+        the number of values at a rung needed to stop experiments, `eta` by default
+    """
+    def __init__(self, unit, variable, mode='min', min_iters=1, eta=3, max_iters=None, brackets=1, min_samples=None):
+        super().__init__(unit, variable, mode)
+        self.min_iters = min_iters
+        self.eta = eta
+        self.max_iters = max_iters
+        self.brackets = brackets
+        self.min_samples = min_samples or eta
+
+    def rung(self, iteration, sample_index):
+        bracket = int(sample_index) % self.brackets
+        rung = self.min_iters * self.eta ** bracket
+        while rung < iteration:
+            rung *= self.eta
+        if rung != iteration or (self.max_iters is not None and iteration >= self.max_iters):
+            return None
+        return '{}_{}'.format(bracket, iteration)
+
+    def promote(self, value, values):
+        n_values = len(values) + 1
+        if n_values < self.min_samples:
+            return True
+        return self._better(value, values) < max(n_values // self.eta, 1)
+
+
+class MedianStopping(Scheduler):
+    """ Stop experiments whose value is worse than the median of values of other experiments at the same iteration.
+
+    Parameters
+    ----------
+    unit : str
+        name of the unit to track
+    variable : str
+        name of the variable to track
+    mode : 'min' or 'max'
+        whether smaller or greater values are better
+    grace : int
+        the first iteration to make decisions at
+    every : int
+        how often to make decisions
+    min_samples : int
+        the number of values of other experiments needed to stop experiments
+    """
+    def __init__(self, unit, variable, mode='min', grace=1, every=1, min_samples=3):
+        super().__init__(unit, variable, mode)
+        self.grace = grace
+        self.every = every
+        self.min_samples = min_samples
+
+    def rung(self, iteration, sample_index):
+        _ = sample_index
+        if iteration < self.grace or (iteration - self.grace) % self.every != 0:
+            return None
+        return str(iteration)
+
+    def promote(self, value, values):
+        if len(values) < self.min_samples:
+            return True
+        median = np.median(values)
+        return value <= median if self.mode == 'min' else value >= median
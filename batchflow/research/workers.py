@@ -1,12 +1,15 @@
 """ Workers for research. """
 
 import os
+import gc
 from copy import copy
 import time
+from collections import OrderedDict
 from queue import Empty as EmptyException
 import multiprocess as mp
 import psutil
 
+from .. import Pipeline
 from .distributor import Signal
 from .executable import PipelineStopIteration
 
@@ -14,8 +17,13 @@ class Worker:
     """ Worker that creates subprocess to execute job.
     Worker get queue of jobs, pop one job and execute it in subprocess. That subprocess
     call init, main and post class methods.
+
+    By default a new subprocess is started for each job and each trial. With `reuse=True`
+    the subprocess is kept alive between jobs: modules imported, executable units (pipelines along
+    with their datasets) are transferred to it only once and are used as templates for all the following jobs.
+    The subprocess is killed on timeout and a new one is started only for the next trial after a failure.
     """
-    def __init__(self, devices, worker_name=None, worker_config=None, timeout=5, trials=2, logger=None):
+    def __init__(self, devices, worker_name=None, worker_config=None, timeout=5, trials=2, logger=None, reuse=False):
         """
         Parameters
         ----------
@@ -29,6 +37,8 @@ class Worker:
 
         worker_config : dict or str
             additional config for pipelines in worker
+        reuse : bool
+            whether to execute all jobs in one long-lived subprocess
         args, kwargs
             will be used in init, post and main
         """
@@ -45,6 +55,7 @@ class Worker:
         self.timeout = timeout
         self.trials = trials
         self.logger = logger
+        self.reuse = reuse
 
         self.job = None
         self.finished_iterations = None
@@ -56,6 +67,9 @@ class Worker:
 
         self.last_update_time = None
 
+        self._task = None
+        self._executable_units = None
+
     def init(self):
         """ Run before main. """
 
@@ -65,6 +79,45 @@ class Worker:
     def main(self):
         """ Main part of the worker. """
 
+    def _start_task(self):
+        """ Start a subprocess with its queues unless an alive one can be reused """
+        if self._task is not None and self._task['process'].is_alive():
+            return self._task
+
+        task = dict(queue=mp.JoinableQueue(), feedback_queue=mp.JoinableQueue(),
+                    last_update_time=mp.Value('d', time.time()), units_sent=False)
+        task['process'] = mp.Process(target=self._run_task, args=(task['queue'], task['feedback_queue'],
+                                                                  task['last_update_time']))
+        task['process'].start()
+        task['pid'] = task['feedback_queue'].get()
+        self._task = task
+        return task
+
+    def _send_job(self, task, job, trial):
+        """ Put a job into the subprocess queue (executable units are sent only once to a reused subprocess) """
+        task['last_update_time'].value = time.time()
+        if self.reuse and task['units_sent']:
+            idx, job_object = job
+            job_object = copy(job_object)
+            job_object.executable_units = None
+            job = idx, job_object
+        task['units_sent'] = True
+        task['queue'].put((trial, job))
+
+    def _kill_task(self, task):
+        try:
+            psutil.Process(task['pid']).terminate()
+        except psutil.NoSuchProcess:
+            pass
+        task['process'].join()
+        self._task = None
+
+    def _stop_task(self):
+        if self._task is not None:
+            if self._task['process'].is_alive():
+                self._task['queue'].put(None)
+            self._task['process'].join()
+            self._task = None
 
     def __call__(self, queue, results):
         """ Run worker.
@@ -85,31 +138,36 @@ class Worker:
             self.logger.error(exception)
         else:
             while job is not None:
+                pid = None
+                final_signal = Signal(worker=self.worker_name, job=job[0], iteration=0,
+                                      n_iters=job[1].n_iters, trial=0, done=False, exception=None)
                 try:
                     finished = False
-                    self.logger.info(self.worker_name + ' is creating process for Job ' + str(job[0]))
+                    self.logger.info(self.worker_name + ' is sending Job ' + str(job[0]) + ' to a subprocess')
                     for trial in range(self.trials):
-                        one_job_queue = mp.JoinableQueue()
-                        one_job_queue.put(job)
-                        feedback_queue = mp.JoinableQueue()
-                        last_update_time = mp.Value('d', time.time())
-
-                        task = mp.Process(target=self._run_task, args=(one_job_queue, feedback_queue,
-                                                                       trial, last_update_time))
-                        task.start()
-                        pid = feedback_queue.get()
+                        task = self._start_task()
+                        pid = task['pid']
+                        self._send_job(task, job, trial)
+                        feedback_queue = task['feedback_queue']
                         final_signal = Signal(worker=self.worker_name, job=job[0], iteration=0,
                                               n_iters=job[1].n_iters, trial=trial, done=False,
                                               exception=None)
 
                         while True:
+                            alive = task['process'].is_alive()
                             try:
                                 signal = feedback_queue.get(timeout=1)
                             except EmptyException:
                                 signal = None
-                            if signal is None and (time.time() - last_update_time.value) / 60 > self.timeout:
-                                p = psutil.Process(pid)
-                                p.terminate()
+                            if signal is None and not alive:
+                                message = 'Job {} [{}] crashed in {}'.format(job[0], pid, self.worker_name)
+                                self.logger.info(message)
+                                self._task = None
+                                final_signal.exception = RuntimeError(message)
+                                results.put(copy(final_signal))
+                                break
+                            if signal is None and (time.time() - task['last_update_time'].value) / 60 > self.timeout:
+                                self._kill_task(task)
                                 message = 'Job {} [{}] failed in {}'.format(job[0], pid, self.worker_name)
                                 self.logger.info(message)
                                 final_signal.exception = TimeoutError(message)
@@ -122,6 +180,8 @@ class Worker:
                             if signal is not None:
                                 final_signal = signal
                                 results.put(copy(final_signal))
+                        if not self.reuse and self._task is not None:
+                            self._stop_task()
                         if finished:
                             break
                 except Exception as exception: #pylint:disable=broad-except
@@ -137,34 +197,62 @@ class Worker:
                     results.put(copy(final_signal))
                 queue.task_done()
                 job = queue.get()
+            self._stop_task()
             queue.task_done()
 
 
-    def _run_task(self, queue, feedback_queue, trial, last_update_time):
-        exception = None
-        try:
-            self.feedback_queue = feedback_queue
-            self.trial = trial
-            self.last_update_time = last_update_time
-
-            feedback_queue.put(os.getpid())
-            self.job = queue.get()
-
-            self.logger.info(
-                'Job {} was started in subprocess [id:{}] by {}'.format(self.job[0], os.getpid(), self.worker_name)
-            )
-            self.init()
-            self.main()
-            self.post()
-        except Exception as e: #pylint:disable=broad-except
-            exception = e
-            self.logger.error(exception)
-        self.logger.info('Job {} [{}] was finished by {}'.format(self.job[0], os.getpid(), self.worker_name))
-        signal = Signal(worker=self.worker_name, job=self.job[0], iteration=self.finished_iterations,
-                        n_iters=self.job[1].n_iters, trial=self.trial, done=True,
-                        exception=[exception]*len(self.job[1].experiments))
-        self.feedback_queue.put(signal)
-        queue.task_done()
+    @staticmethod
+    def _copy_units(units):
+        copied = OrderedDict()
+        for name, unit in units.items():
+            unit = unit.get_copy()
+            if unit.root_pipeline is not None:
+                unit.root_pipeline = unit.root_pipeline + Pipeline()
+            copied[name] = unit
+        return copied
+
+    def _run_task(self, queue, feedback_queue, last_update_time):
+        self.feedback_queue = feedback_queue
+        self.last_update_time = last_update_time
+        feedback_queue.put(os.getpid())
+
+        while True:
+            item = queue.get()
+            if item is None:
+                queue.task_done()
+                break
+
+            self.trial, self.job = item
+            if self.job[1].executable_units is not None:
+                self._executable_units = self.job[1].executable_units
+            if self.reuse:
+                # received units are kept intact as templates, so that every job starts from a clean state
+                self.job[1].executable_units = self._copy_units(self._executable_units)
+            self.finished_iterations = None
+
+            exception = None
+            try:
+                self.logger.info(
+                    'Job {} was started in subprocess [id:{}] by {}'.format(self.job[0], os.getpid(), self.worker_name)
+                )
+                self.init()
+                self.main()
+                self.post()
+            except Exception as e: #pylint:disable=broad-except
+                exception = e
+                self.logger.error(exception)
+            finally:
+                self.job[1].close()
+            self.logger.info('Job {} [{}] was finished by {}'.format(self.job[0], os.getpid(), self.worker_name))
+            signal = Signal(worker=self.worker_name, job=self.job[0], iteration=self.finished_iterations,
+                            n_iters=self.job[1].n_iters, trial=self.trial, done=True,
+                            exception=[exception]*len(self.job[1].experiments))
+            self.job = None
+            gc.collect()
+            self.feedback_queue.put(signal)
+            queue.task_done()
+            if not self.reuse:
+                break
 
 
 class PipelineWorker(Worker):
@@ -250,6 +338,11 @@ class PipelineWorker(Worker):
                             self.logger.info(message)
                         job.stopped[i] = True
 
+                # stop experiments which are not promoted at a rung
+                for i, decision in job.schedule(iteration, unit_name, exec_actions, exceptions):
+                    self.logger.info("J {} [{}] I {}: '{}' [{}]: scheduler decision is '{}'"
+                                     .format(idx_job, os.getpid(), iteration+1, unit_name, i, decision))
+
                 # dump results
                 dump_actions = job.get_actions(iteration, unit_name, action='dump')
                 for i, experiment in enumerate(job.experiments):
@@ -0,0 +1,591 @@
+""" Contains out-of-core data sources which read only the items a batch needs """
+import io
+import os
+import json
+import threading
+from collections import OrderedDict
+import concurrent.futures as cf
+
+import numpy as np
+
+from ._lazy import LazyModule
+from .dsindex import DatasetIndex
+from .pools import _workers_count
+
+pd = LazyModule('pandas')
+pa = LazyModule('pyarrow')
+pa_feather = LazyModule('pyarrow.feather')
+
+
+# read_csv options which prevent from parsing separate rows of a csv file
+CSV_ROW_UNSAFE = ('header', 'names', 'skiprows', 'skipfooter', 'nrows', 'chunksize', 'iterator',
+                  'comment', 'lineterminator', 'compression', 'encoding', 'escapechar')
+
+
+class TableSource:
+    """ A table file which is opened once and then read by rows
+
+    Parameters
+    ----------
+    path : str
+        a path to a file
+    fmt : {'csv', 'hdf5', 'feather'}
+        a file format. If None, it is inferred from the file extension.
+    key : str
+        a group in an hdf5 file. If None, the first group in the file is used.
+    index_col : int or str
+        a column which contains item indices. If None, item indices are row numbers
+        (for hdf5 files, the stored frame index is always used).
+    kwargs
+        other parameters passed to a reader (e.g. `sep` or `usecols` for csv, `columns` for feather)
+
+    Notes
+    -----
+    Only the rows which a batch needs are read from disk:
+
+    - hdf5 files in the `table` format are queried by row coordinates
+    - feather files are memory-mapped as Arrow tables and the rows are taken from them
+    - csv files are scanned once to find row offsets and then the rows are read by seeking
+
+    Hdf5 files in the `fixed` format and csv files read with options which change the row structure
+    (e.g. `skiprows` or `comment`) do not support row access, so they are read once and kept in memory.
+
+    Item positions in the file are looked up with a :class:`~.DatasetIndex` built from the file index.
+
+    Examples
+    --------
+    ::
+
+        source = TableSource('/path/to/data.feather')
+        dataset = Dataset(source.index, batch_class=MyBatch)
+        pipeline = dataset.p.load(src=source, dst=('features', 'labels'))
+    """
+    def __init__(self, path, fmt=None, key=None, index_col=None, **kwargs):
+        if fmt is None:
+            fmt = self.infer_format(path)
+        if fmt not in ('csv', 'hdf5', 'feather'):
+            raise ValueError("Unknown format " + str(fmt))
+        self.path = path
+        self.fmt = fmt
+        self.key = key
+        self.index_col = index_col
+        self.kwargs = kwargs
+
+        self._lock = threading.Lock()
+        self._opened = False
+        self._handle = None
+        self._frame = None
+        self._index = None
+
+    @staticmethod
+    def infer_format(path):
+        """ Return a table format by the file extension """
+        ext = os.path.splitext(path)[1].lower()
+        if ext in ('.h5', '.hdf', '.hdf5'):
+            return 'hdf5'
+        if ext in ('.feather', '.arrow'):
+            return 'feather'
+        return 'csv'
+
+    def __getstate__(self):
+        return {'path': self.path, 'fmt': self.fmt, 'key': self.key, 'index_col': self.index_col,
+                'kwargs': self.kwargs}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['fmt'], state['key'], state['index_col'], **state['kwargs'])
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def index(self):
+        """: DatasetIndex - item indices stored in the file """
+        self.open()
+        return self._index
+
+    def open(self):
+        """ Open the file and build the row-position index (only once) """
+        if not self._opened:
+            with self._lock:
+                if not self._opened:
+                    getattr(self, '_open_' + self.fmt)()
+                    self._opened = True
+        return self
+
+    def close(self):
+        """ Release the file """
+        with self._lock:
+            if self.fmt == 'hdf5' and self._handle is not None:
+                self._handle.close()
+            self._handle = None
+            self._frame = None
+            self._index = None
+            self._opened = False
+
+    def _open_hdf5(self):
+        store = pd.HDFStore(self.path, mode='r')
+        self.key = self.key or store.keys()[0]
+        if store.get_storer(self.key).is_table:
+            self._handle = store
+            labels = store.select_column(self.key, 'index').values
+        else:
+            self._frame = store.select(self.key, **self.kwargs)
+            store.close()
+            labels = self._frame.index.values
+        self._index = DatasetIndex(labels)
+
+    def _open_feather(self):
+        table = pa_feather.read_table(self.path, memory_map=True, columns=self.kwargs.get('columns'))
+        self._handle = table
+        if self.index_col is None:
+            labels = np.arange(table.num_rows)
+        else:
+            column = self.index_col if isinstance(self.index_col, str) else table.column_names[self.index_col]
+            labels = table.column(column).to_numpy()
+        self._index = DatasetIndex(labels)
+
+    def _open_csv(self):
+        if any(arg in self.kwargs for arg in CSV_ROW_UNSAFE):
+            self._frame = pd.read_csv(self.path, index_col=self.index_col, **self.kwargs)
+            self._index = DatasetIndex(self._frame.index.values)
+            return
+
+        quotechar = None if self.kwargs.get('quoting') == 3 else self.kwargs.get('quotechar', '"')
+        self._handle = self._scan_csv_rows(self.path, quotechar)
+        if self.index_col is None:
+            labels = np.arange(len(self._handle) - 1)
+        else:
+            kwargs = {k: v for k, v in self.kwargs.items() if k in ('sep', 'delimiter', 'dtype', 'quotechar')}
+            labels = pd.read_csv(self.path, usecols=[self.index_col], **kwargs).iloc[:, 0].values
+        self._index = DatasetIndex(labels)
+
+    @staticmethod
+    def _scan_csv_rows(path, quotechar='"', chunk_size=2**26):
+        """ Return offsets of all data rows in a csv file (and the end of the last row)
+
+        Newlines inside quoted fields do not end rows.
+        """
+        offsets = []
+        start, quoted = 0, 0
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                chunk = np.frombuffer(chunk, dtype=np.uint8)
+                ends = np.flatnonzero(chunk == ord('\n'))
+                if quotechar is not None:
+                    # a newline ends a row only if an even number of quotes precedes it
+                    quotes = np.flatnonzero(chunk == ord(quotechar))
+                    ends = ends[(np.searchsorted(quotes, ends) + quoted) % 2 == 0]
+                    quoted = (quoted + len(quotes)) % 2
+                offsets.append(ends + start + 1)
+                start += len(chunk)
+        offsets = np.concatenate([[0], *offsets]).astype(np.int64)
+        if offsets[-1] != start:
+            # the last line does not end with a newline
+            offsets = np.append(offsets, start)
+        # skip the header and drop empty rows at the end of the file
+        offsets = offsets[1:]
+        while len(offsets) > 1 and offsets[-1] - offsets[-2] <= 1:
+            offsets = offsets[:-1]
+        return offsets
+
+    def get_pos(self, indices):
+        """ Return row positions of the items in the file """
+        return self.index.get_pos(indices)
+
+    def read(self, indices):
+        """ Read rows for given items
+
+        Parameters
+        ----------
+        indices : sequence
+            item indices
+
+        Returns
+        -------
+        pandas.DataFrame
+            rows in the same order as `indices` with item indices as the frame index
+        """
+        indices = np.asarray(indices)
+        pos = self.get_pos(indices)
+
+        if self._frame is not None:
+            return self._frame.iloc[pos]
+
+        # read each row only once and in the file order
+        unique_pos, inverse = np.unique(pos, return_inverse=True)
+        data = getattr(self, '_read_' + self.fmt)(unique_pos)
+        data = data.iloc[inverse]
+        if self.index_col is None and self.fmt != 'hdf5':
+            data.index = indices
+        return data
+
+    def _read_hdf5(self, pos):
+        with self._lock:
+            return self._handle.select(self.key, where=pd.Index(pos), **self.kwargs)
+
+    def _read_feather(self, pos):
+        data = self._handle.take(pa.array(pos)).to_pandas()
+        if self.index_col is not None:
+            data = data.set_index(data.columns[self.index_col] if isinstance(self.index_col, int) else self.index_col)
+        return data
+
+    def _read_csv(self, pos):
+        offsets = self._handle
+        buffer = io.BytesIO()
+        with open(self.path, 'rb') as f:
+            buffer.write(f.read(offsets[0]))
+            for start, end in zip(offsets[pos], offsets[pos + 1]):
+                f.seek(start)
+                buffer.write(f.read(end - start))
+        buffer.seek(0)
+        return pd.read_csv(buffer, index_col=self.index_col, **self.kwargs)
+
+
+def read_rows(data, pos):
+    """ Read array rows at given positions
+
+    Rows are read once and in the ascending order, which is much faster for memory-mapped files,
+    and then arranged in the requested order.
+
+    Parameters
+    ----------
+    data : np.ndarray or np.memmap
+        an array to read from
+    pos : int or sequence of int
+        row positions
+
+    Returns
+    -------
+    np.ndarray
+        an in-memory array
+    """
+    pos = np.asarray(pos)
+    if pos.ndim == 0 or len(pos) < 2:
+        return np.asarray(data[pos])
+    unique_pos, inverse = np.unique(pos, return_inverse=True)
+    return np.asarray(data[unique_pos])[inverse]
+
+
+class ArrayStore:
+    """ On-disk storage of component arrays which are memory-mapped when read
+
+    A store is a directory with one `.npy` (or raw binary) file per component and a `manifest.json`
+    which describes components and their files, and an optional `index.npy` with item indices.
+
+    Parameters
+    ----------
+    path : str
+        a store directory
+    mode : {'r', 'r+'}
+        a mode to open files with
+
+    Notes
+    -----
+    The store might be passed as `preloaded` to :class:`~.Dataset` or as `src` to :meth:`~.Batch.load`.
+    Then batches read only their own rows from disk, so datasets larger than RAM can be processed
+    with a flat memory consumption.
+
+    When the store is pickled (e.g. to send to another process) only its path is serialized,
+    and files are mapped again upon the first access.
+
+    A raw binary file might be described in the manifest with its dtype, shape and offset::
+
+        {"components": {"images": {"file": "images.bin", "format": "raw",
+                                   "dtype": "uint8", "shape": [60000, 28, 28], "offset": 0}}}
+
+    Examples
+    --------
+    ::
+
+        ArrayStore.create('/path/to/store', dict(images=images, labels=labels))
+
+        store = ArrayStore('/path/to/store')
+        dataset = Dataset(store.index, batch_class=ImagesBatch, preloaded=store)
+    """
+    MANIFEST = 'manifest.json'
+    INDEX = 'index.npy'
+
+    def __init__(self, path, mode='r'):
+        self.path = path
+        self.mode = mode
+        with open(os.path.join(path, self.MANIFEST), 'r') as f:
+            self.manifest = json.load(f)
+        self.components = tuple(self.manifest['components'])
+
+        self._lock = threading.Lock()
+        self._arrays = None
+        self._index = None
+
+    @classmethod
+    def create(cls, path, data=None, components=None, index=None, shapes=None, dtypes=None, chunk_size=1024):
+        """ Create a new store
+
+        Parameters
+        ----------
+        path : str
+            a directory to create the store in
+        data : dict, tuple or np.ndarray
+            component arrays (if `tuple` or `ndarray`, `components` should be specified)
+        components : str or sequence of str
+            component names
+        index : array-like
+            item indices (if None, item indices are row numbers)
+        shapes : dict
+            shapes of empty components to create (when `data` is None)
+        dtypes : dict
+            dtypes of empty components to create (when `data` is None)
+        chunk_size : int
+            number of rows to copy at once
+
+        Returns
+        -------
+        ArrayStore
+            a store opened for writing
+        """
+        if isinstance(components, str):
+            components = (components,)
+            data = (data,) if data is not None else None
+        if data is not None:
+            if not isinstance(data, dict):
+                if components is None:
+                    raise ValueError("components should be specified when data is not a dict")
+                data = dict(zip(components, data))
+            shapes = {comp: np.shape(value) for comp, value in data.items()}
+            dtypes = {comp: np.asarray(value[:0]).dtype for comp, value in data.items()}
+        elif shapes is None:
+            raise ValueError("Either data or shapes should be specified")
+        components = tuple(components or shapes.keys())
+
+        os.makedirs(path, exist_ok=True)
+        manifest = {'components': {}}
+        for comp in components:
+            file_name = comp + '.npy'
+            dtype = np.dtype((dtypes or {}).get(comp, np.float32))
+            array = np.lib.format.open_memmap(os.path.join(path, file_name), mode='w+',
+                                              dtype=dtype, shape=tuple(shapes[comp]))
+            if data is not None:
+                for start in range(0, len(array), chunk_size):
+                    array[start:start + chunk_size] = data[comp][start:start + chunk_size]
+            array.flush()
+            del array
+            manifest['components'][comp] = {'file': file_name, 'format': 'npy'}
+
+        if index is not None:
+            index = index.indices if isinstance(index, DatasetIndex) else np.asarray(index)
+            np.save(os.path.join(path, cls.INDEX), index)
+            manifest['index'] = cls.INDEX
+
+        with open(os.path.join(path, cls.MANIFEST), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        return cls(path, mode='r+')
+
+    def __getstate__(self):
+        return {'path': self.path, 'mode': self.mode}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __len__(self):
+        return len(self.arrays[self.components[0]])
+
+    def _map(self, component):
+        spec = self.manifest['components'][component]
+        file_name = os.path.join(self.path, spec['file'])
+        if spec.get('format', 'npy') == 'raw':
+            return np.memmap(file_name, dtype=spec['dtype'], mode=self.mode, shape=tuple(spec['shape']),
+                             offset=spec.get('offset', 0))
+        return np.load(file_name, mmap_mode=self.mode)
+
+    @property
+    def arrays(self):
+        """: dict - memory-mapped component arrays """
+        if self._arrays is None:
+            with self._lock:
+                if self._arrays is None:
+                    self._arrays = {comp: self._map(comp) for comp in self.components}
+        return self._arrays
+
+    @property
+    def index(self):
+        """: DatasetIndex - item indices stored in the store """
+        if self._index is None:
+            if 'index' in self.manifest:
+                self._index = DatasetIndex(np.load(os.path.join(self.path, self.manifest['index'])))
+            else:
+                self._index = DatasetIndex(len(self))
+        return self._index
+
+    def get_pos(self, indices):
+        """ Return row positions of given items """
+        if 'index' in self.manifest:
+            return self.index.get_pos(indices)
+        return indices
+
+    def get(self, component, indices=None):
+        """ Return a component array or its rows for given items
+
+        Parameters
+        ----------
+        component : str
+            a component name
+        indices : sequence or None
+            item indices. If None, the whole memory-mapped array is returned.
+
+        Returns
+        -------
+        np.ndarray or np.memmap
+        """
+        data = self.arrays.get(component)
+        if data is None or indices is None:
+            return data
+        return read_rows(data, self.get_pos(indices))
+
+    def __getitem__(self, indices):
+        """ Return rows of all components for given items """
+        data = tuple(self.get(comp, indices) for comp in self.components)
+        return data[0] if len(data) == 1 else data
+
+    def flush(self):
+        """ Write changes to disk """
+        if self._arrays is not None:
+            for array in self._arrays.values():
+                if isinstance(array, np.memmap):
+                    array.flush()
+
+
+def read_file(path):
+    """ Return file contents as bytes """
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+class ReadAhead:
+    """ Background reader which fetches files of upcoming batches
+
+    Parameters
+    ----------
+    n_batches : int
+        a number of upcoming batches to read in advance
+    n_workers : int or None
+        a number of reading threads. If None, the number of cores times 4.
+    max_items : int or None
+        a maximum number of files kept in memory. If None, it is enough for `n_batches` + 1 batches
+        for each file kind requested by load actions.
+
+    Notes
+    -----
+    A reader is attached to a dataset with :meth:`~.Dataset.read_ahead`. Whenever the dataset produces a batch,
+    the reader takes positions of the next items from the iteration order and starts reading
+    files of the batch and of the next `n_batches` batches in background threads.
+
+    Load actions (e.g. `load(fmt='blosc')` or `load(fmt='image')` in :class:`~.ImagesBatch`) register
+    how file paths are built with :meth:`.register` when they are called for the first time,
+    and then get file contents with :meth:`.read`, so only decoding is left for the action itself.
+
+    Only the current epoch order is looked at, so reading ahead does not cross an epoch boundary.
+    """
+    def __init__(self, n_batches=2, n_workers=None, max_items=None):
+        self.n_batches = n_batches
+        self.n_workers = n_workers
+        self.max_items = max_items
+        self.requests = set()
+
+        self._lock = threading.Lock()
+        self._files = OrderedDict()
+        self._executor = None
+
+    def __getstate__(self):
+        return {'n_batches': self.n_batches, 'n_workers': self.n_workers, 'max_items': self.max_items}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def register(self, method, src=None):
+        """ Register a batch method which builds file paths
+
+        Parameters
+        ----------
+        method : str
+            a name of a batch method with `(ix, src)` arguments which returns a file path for an item
+        src
+            a source passed to the method
+        """
+        try:
+            self.requests.add((method, src))
+        except TypeError:
+            # unhashable sources cannot be read in advance
+            pass
+
+    def _get_paths(self, batch):
+        paths = []
+        for method, src in list(self.requests):
+            try:
+                paths.extend(getattr(batch, method)(ix, src) for ix in batch.indices)
+            except Exception:   # pylint: disable=broad-except
+                # a path cannot be built for this batch, so files will be read as usual
+                continue
+        return paths
+
+    def schedule(self, dataset, batch, batch_size, iter_params):
+        """ Start reading files of a batch and the batches which follow it
+
+        Parameters
+        ----------
+        dataset : Dataset
+            a dataset which produced the batch
+        batch : Batch
+            a batch just created
+        batch_size : int
+            a batch size
+        iter_params : dict
+            iteration parameters with the current order of items
+        """
+        if not self.requests:
+            return
+
+        batches = [batch]
+        order = iter_params.get('_order')
+        if order is not None and self.n_batches > 0:
+            start = iter_params.get('_start_index', 0)
+            positions = order[start : start + self.n_batches * batch_size]
+            if len(positions) > 0:
+                batches.append(dataset.create_batch(dataset.index.create_batch(positions, pos=True)))
+
+        paths = [path for one_batch in batches for path in self._get_paths(one_batch)]
+        max_items = self.max_items or (self.n_batches + 1) * batch_size * len(self.requests)
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = cf.ThreadPoolExecutor(max_workers=self.n_workers or _workers_count(),
+                                                       thread_name_prefix='batchflow_read_ahead')
+            for path in paths:
+                if path not in self._files:
+                    self._files[path] = self._executor.submit(read_file, path)
+            while len(self._files) > max_items:
+                _, future = self._files.popitem(last=False)
+                future.cancel()
+
+    def read(self, path):
+        """ Return file contents which are read in advance or read the file now """
+        with self._lock:
+            future = self._files.pop(path, None)
+        if future is not None and not future.cancelled():
+            try:
+                return future.result()
+            except OSError:
+                # raise an error from the usual read below
+                pass
+        return read_file(path)
+
+    def clear(self):
+        """ Drop all files read in advance and stop reading threads """
+        with self._lock:
+            files, self._files = self._files, OrderedDict()
+            executor, self._executor = self._executor, None
+        for future in files.values():
+            future.cancel()
+        if executor is not None:
+            executor.shutdown(wait=False)
@@ -0,0 +1,84 @@
+# pylint: disable=missing-docstring, protected-access
+import numpy as np
+import pytest
+
+from batchflow import Dataset, Batch, Pipeline, action, B, C, V
+from batchflow.named_expr import compile_expr, eval_expr
+
+
+class PlanBatch(Batch):
+    @action
+    def record(self, value, to=None, options=None):
+        self.pipeline.get_variable(to).append((value, options))
+        return self
+
+    @action
+    def extend(self, items, to=None):
+        items.append(len(items))
+        self.pipeline.get_variable(to).append(len(items))
+        return self
+
+
+@pytest.mark.parametrize('expr', [
+    1, 'a', [1, 2], (1, [2, {'a': 3}]), {'a': [1, 2]}, None,
+])
+def test_constant(expr):
+    assert compile_expr(expr) is None
+
+@pytest.mark.parametrize('expr, copied', [
+    ([1, 2], True), ((1, [2, {'a': 3}]), True), ({'a': (1, 2)}, True), ((1, 'a'), False), (None, False),
+])
+def test_copy_containers(expr, copied):
+    getter = compile_expr(expr, copy=True)
+    assert (getter is not None) == copied
+    if copied:
+        value = getter()
+        assert value == expr
+        assert value is not expr
+
+@pytest.mark.parametrize('expr', [
+    C('a'), [1, C('a')], (1, [2, {'x': C('a')}]), {C('b'): 1, 'c': [C('a')]},
+])
+def test_compiled_equals_eval(expr):
+    pipeline = Pipeline(config={'a': 10, 'b': 'key'})
+    assert compile_expr(expr)(pipeline=pipeline) == eval_expr(expr, pipeline=pipeline)
+
+
+def test_plan_results():
+    options = [1, {'x': 2}]
+    pipeline = (Dataset(10, batch_class=PlanBatch).p
+                .init_variable('out', [])
+                .init_variable('n', 0)
+                .record(B('size'), to='out', options=options)
+                .record(0, to='out', options=[C('k'), 1])
+                .update(V('n'), V('n') + 1)
+                << {'k': 5})
+    pipeline.run(4, n_epochs=1)
+
+    out = pipeline.v('out')
+    assert out[::2] == [(4, options), (4, options), (2, options)]
+    assert out[1::2] == [(0, [5, 1])] * 3
+    assert pipeline.v('n') == 3
+
+
+def test_plan_invalidation():
+    pipeline = (Dataset(10, batch_class=PlanBatch).p
+                .init_variable('out', [])
+                .record(C('k'), to='out')
+                << {'k': 1})
+    pipeline.run(5, n_epochs=1)
+    pipeline.set_config({'k': 2})
+    nested = Pipeline().record(3, to='out')
+    pipeline.append_pipeline(nested)
+    pipeline.run(5, n_epochs=1)
+
+    assert [value for value, _ in pipeline.v('out')] == [1, 1, 2, 3, 2, 3]
+    assert np.all([step[1] == 'batch' for step in pipeline._get_plan(nested._actions)])
+
+
+def test_plan_arguments_not_shared():
+    pipeline = (Dataset(10, batch_class=PlanBatch).p
+                .init_variable('out', [])
+                .extend(['a'], to='out'))
+    pipeline.run(3, n_epochs=1, prefetch=2)
+    assert pipeline.v('out') == [2] * 4
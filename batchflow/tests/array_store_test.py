@@ -0,0 +1,66 @@
+""" Test memory-mapped component storage """
+# pylint: disable=missing-docstring, redefined-outer-name
+import pickle
+
+import numpy as np
+import pytest
+
+from batchflow import Dataset, Batch
+from batchflow.sources import ArrayStore, read_rows
+
+
+SIZE = 40
+
+
+class MyBatch(Batch):
+    components = ('images', 'labels')
+
+
+@pytest.fixture
+def data():
+    return dict(images=np.random.random((SIZE, 4, 4)), labels=np.arange(SIZE))
+
+
+@pytest.fixture
+def store(tmp_path, data):
+    ArrayStore.create(str(tmp_path), data, index=np.arange(SIZE) * 3)
+    return ArrayStore(str(tmp_path))
+
+
+def test_read_rows():
+    data = np.arange(10) * 2
+    assert (read_rows(data, [7, 1, 7, 3]) == data[[7, 1, 7, 3]]).all()
+    assert read_rows(data, 4) == 8
+
+
+def test_store_is_memmapped(store, data):
+    assert store.components == ('images', 'labels')
+    assert isinstance(store.get('images'), np.memmap)
+    assert (store.index.indices == np.arange(SIZE) * 3).all()
+
+    rows = store.get('labels', [30, 3, 30])
+    assert not isinstance(rows, np.memmap)
+    assert (rows == data['labels'][[10, 1, 10]]).all()
+
+
+def test_pickle_keeps_only_path(store):
+    restored = pickle.loads(pickle.dumps(store))
+    assert restored.__getstate__() == {'path': store.path, 'mode': 'r'}
+    assert (restored.get('labels', [0, 3]) == [0, 1]).all()
+
+
+def test_dataset_preloaded(store, data):
+    dataset = Dataset(store.index, batch_class=MyBatch, preloaded=store)
+    for batch in dataset.p.gen_batch(7, shuffle=True, n_epochs=1):
+        pos = batch.indices // 3
+        assert (batch.images == data['images'][pos]).all()
+        assert (batch.labels == data['labels'][pos]).all()
+
+
+def test_load_from_memmap(tmp_path, data):
+    ArrayStore.create(str(tmp_path), data)
+    images = np.load(str(tmp_path / 'images.npy'), mmap_mode='r')
+
+    dataset = Dataset(SIZE, batch_class=MyBatch)
+    batch = dataset.p.load(src=images, dst='images').next_batch(5, shuffle=True)
+    assert (batch.images == data['images'][batch.indices]).all()
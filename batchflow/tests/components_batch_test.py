@@ -290,3 +290,53 @@ class TestItems:
 
         assert (item.images == 25).all()
         assert (item.labels == 1025).all()
+
+
+@pytest.mark.parametrize('dst', [False, None])
+class TestCopy:
+    def test_components(self, dst):
+        labels = np.arange(DATASET_SIZE)
+        images = np.ones((DATASET_SIZE,) + IMAGE_SHAPE) * labels.reshape(-1, 1, 1)
+        data = dict(images=images, labels=labels+1000)
+
+        batch = get_batch(data, True, batch_class=MyBatch4, skip=2, dst=dst)
+        batch.create_attrs(meta=[1, 2])
+        new_batch = batch.copy()
+        new_batch.images[:] = 0
+        new_batch.labels = new_batch.labels + 1
+        new_batch.meta.append(3)
+
+        assert type(new_batch) is MyBatch4
+        assert new_batch.pipeline is batch.pipeline
+        assert (batch.images[:, 0, 0] == np.arange(20, 30)).all()
+        assert (batch.labels == np.arange(1020, 1030)).all()
+        assert (new_batch.labels == np.arange(1021, 1031)).all()
+        assert batch.meta == [1, 2]
+
+    def test_no_components(self, dst):
+        data = dict(comp1=np.arange(DATASET_SIZE) + 100, comp2=np.arange(DATASET_SIZE).astype(object))
+
+        batch = get_batch(data, False, skip=2, dst=dst)
+        new_batch = batch.copy()
+        new_batch.data['comp1'][:] = 0
+
+        assert (batch.data['comp1'] == np.arange(120, 130)).all()
+        assert (new_batch.data['comp2'] == np.arange(20, 30)).all()
+
+    def test_deepcopy(self, dst):
+        labels = np.arange(DATASET_SIZE)
+        images = np.ones((DATASET_SIZE,) + IMAGE_SHAPE) * labels.reshape(-1, 1, 1)
+        data = dict(images=images, labels=labels+1000)
+
+        batch = get_batch(data, True, batch_class=MyBatch4, skip=2, dst=dst)
+        batch.create_attrs(meta=dict(items=[np.zeros(3)]))
+        new_batch = batch.deepcopy()
+        new_batch.images[:] = 0
+        new_batch.meta['items'][0][:] = 1
+        new_batch.meta['items'].append(None)
+
+        assert type(new_batch) is MyBatch4
+        assert new_batch.pipeline is batch.pipeline
+        assert (batch.images[:, 0, 0] == np.arange(20, 30)).all()
+        assert len(batch.meta['items']) == 1
+        assert (batch.meta['items'][0] == 0).all()
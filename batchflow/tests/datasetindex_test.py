@@ -8,6 +8,7 @@ import pytest
 import numpy as np
 
 from batchflow import DatasetIndex
+from batchflow.dsindex import ItemPositions
 
 @pytest.mark.parametrize('constructor', [5,
                                          range(10, 20, 2),
@@ -44,3 +45,50 @@ def test_create_batch_child():
         pass
     dsi = ChildSet(5)
     assert isinstance(dsi.create_batch(range(5)), ChildSet)
+
+def test_create_batch_shared():
+    """ Batches taken by positions share the parent's storage and find positions lazily. """
+    dsi = DatasetIndex(['a', 'b', 'c', 'd', 'e'])
+    batch = dsi.create_batch([3, 1])
+    assert (batch.indices == ['d', 'b']).all()
+    assert batch._pos_cache is None
+    assert (batch.get_pos(['b', 'd']) == [1, 0]).all()
+    assert batch.train is None and batch._iter_params['_n_iters'] == 0
+
+def test_create_batch_custom_subset():
+    """ Custom 'create_subset' is called for batches too. """
+    class ChildSet(DatasetIndex):
+        # pylint: disable=too-few-public-methods
+        def create_subset(self, index):
+            subset = super().create_subset(index)
+            subset.custom = True
+            return subset
+    assert ChildSet(5).create_batch([0, 1]).custom
+
+@pytest.mark.parametrize('items', [np.array(['b', 'd', 'a', 'c']),
+                                   np.arange(4) * 2,
+                                   np.array([3, 'a', None, 1.5], dtype=object)])
+def test_item_positions(items):
+    positions = ItemPositions(items)
+    assert positions.find(items[2]) == 2
+    assert (positions.find(items[[3, 0, 3]]) == [3, 0, 3]).all()
+    assert items[1] in positions
+    with pytest.raises(KeyError):
+        positions.find([items[0], 'missing'])
+
+@pytest.mark.parametrize('last, expected', [(False, 0), (True, 2)])
+def test_item_positions_non_unique(last, expected):
+    assert ItemPositions(np.array([5, 1, 5]), last=last).find(5) == expected
+
+def test_item_positions_empty():
+    positions = ItemPositions(np.array([], dtype=np.int64))
+    assert 1 not in positions
+    with pytest.raises(KeyError):
+        positions.find([1, 2])
+    assert len(positions.find([])) == 0
+
+def test_get_pos_iterable():
+    dsi = DatasetIndex(['a', 'b', 'c', 'd', 'e'])
+    assert (dsi.get_pos(['e', 'a']) == [4, 0]).all()
+    assert (dsi.get_pos(np.array(['c'])) == [2]).all()
+    assert dsi.get_pos('d') == 3
@@ -3,6 +3,7 @@
 # pylint: disable=protected-access
 # pylint: disable=redefined-outer-name
 import os
+import pickle
 import shutil
 
 from contextlib import ExitStack as does_not_raise
@@ -98,3 +99,11 @@ def test_create_subset(files_setup, index):
     assert isinstance(new_findex.indices, np.ndarray)
     assert os.path.dirname(full_path) == path
     assert os.path.basename(full_path) == file_name
+
+def test_create_batch_own_paths(files_setup):
+    path, _, _ = files_setup
+    findex = FilesIndex(path=os.path.join(path, '*'), sort=True)
+    batch = findex.create_batch([2, 0]).create_batch([1])
+    assert len(pickle.dumps(batch)) < len(pickle.dumps(findex))
+    assert batch.get_fullpath('file_0.txt') == os.path.join(path, 'file_0.txt')
+    assert batch.paths == {'file_0.txt': os.path.join(path, 'file_0.txt')}
@@ -0,0 +1,55 @@
+""" Test that importing batchflow is fast and doesn't import heavy dependencies """
+# pylint: disable=missing-docstring, import-outside-toplevel
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+
+HEAVY = ['matplotlib', 'IPython', 'skimage', 'pandas', 'scipy', 'numba', 'PIL', 'tqdm.notebook', 'pyarrow', 'blosc']
+
+SCRIPT = """
+import sys, time, json
+start = time.perf_counter()
+import numpy
+numpy_time = time.perf_counter() - start
+from batchflow import Dataset, Pipeline, Batch, B, V
+total = time.perf_counter() - start
+print(json.dumps(dict(total=total, numpy=numpy_time, modules=sorted(sys.modules))))
+"""
+
+def run_import():
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join([root, os.environ.get('PYTHONPATH', '')])}
+    output = subprocess.run([sys.executable, '-c', SCRIPT], check=True, stdout=subprocess.PIPE, env=env).stdout
+    return json.loads(output.decode().strip().split('\n')[-1])
+
+
+def test_no_heavy_imports():
+    modules = run_import()['modules']
+    assert [name for name in HEAVY if name in modules] == []
+
+
+@pytest.mark.slow
+def test_startup_time():
+    """ Startup time benchmark: the best of several imports should stay in the low hundreds of milliseconds """
+    times = [run_import() for _ in range(3)]
+    best = min(item['total'] - item['numpy'] for item in times)
+    print('batchflow import takes {:.3f}s besides numpy'.format(best))
+    assert best < 0.5
+
+
+def test_lazy_attributes():
+    import batchflow
+    assert batchflow.ImagesBatch.__name__ == 'ImagesBatch'
+    assert batchflow.NumpySampler.__name__ == 'NumpySampler'
+    assert batchflow.research.Research.__name__ == 'Research'
+    assert 'ImagesBatch' in dir(batchflow)
+    with pytest.raises(AttributeError):
+        _ = batchflow.no_such_attribute
+
+    from batchflow import ScipySampler, StackedImagesBatch
+    assert ScipySampler is batchflow.ScipySampler
+    assert StackedImagesBatch is batchflow.StackedImagesBatch
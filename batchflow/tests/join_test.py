@@ -0,0 +1,65 @@
+# pylint: disable=missing-docstring, redefined-outer-name
+import time
+
+import numpy as np
+import pytest
+
+from batchflow import Dataset, Batch, action
+
+
+DELAY = 0.2
+
+
+class JoinBatch(Batch):
+    components = 'source', 'value'
+
+    @action
+    def fill(self, source, delay=0):
+        time.sleep(delay)
+        self.source = np.full(len(self), source)
+        self.value = self.indices.copy()
+        return self
+
+    @action
+    def collect(self, batches, to):
+        self.pipeline.get_variable(to).append([(batch.source[0], batch.indices.tolist()) for batch in batches])
+        return self
+
+
+@pytest.fixture
+def dataset():
+    return Dataset(12, batch_class=JoinBatch)
+
+
+@pytest.mark.parametrize('parallel', [False, True])
+def test_join_order(dataset, parallel):
+    pipelines = [dataset.p.fill(i, delay=DELAY) for i in range(3)]
+    pipeline = dataset.p.init_variable('out', []).join(*pipelines, parallel=parallel).collect('out')
+
+    start = time.time()
+    pipeline.run(6, n_epochs=1)
+    elapsed = time.time() - start
+
+    assert pipeline.v('out') == [[(i, list(range(j, j + 6))) for i in range(3)] for j in (0, 6)]
+    if parallel:
+        assert elapsed < 2 * 2 * DELAY
+
+
+@pytest.mark.parametrize('parallel, prefetch', [(False, 0), (True, 0), (True, 2)])
+def test_merge_order(dataset, parallel, prefetch):
+    pipelines = [dataset.p.fill(i + 1).run(3, shuffle=i, n_epochs=None, lazy=True) for i in range(2)]
+    pipeline = (dataset.p
+                .fill(0)
+                .merge(*pipelines, parallel=parallel, prefetch=prefetch)
+                .run(4, n_epochs=2, lazy=True))
+
+    batches = [pipeline.next_batch() for _ in range(4)]
+    pipeline.reset('iter')
+    batches.append(pipeline.next_batch())
+    result = [(batch.source.tolist(), batch.value.tolist()) for batch in batches]
+
+    expected = [dataset.p.fill(i + 1).run(3, shuffle=i, n_epochs=None, lazy=True) for i in range(2)]
+    expected = [[expected[i].next_batch().indices.tolist() for _ in range(5)] for i in range(2)]
+    for j, (source, value) in enumerate(result):
+        assert source == [0] * 4 + [1] * 3 + [2] * 3
+        assert value[4:] == expected[0][j] + expected[1][j]
@@ -0,0 +1,54 @@
+""" Test instance matching for segmentation metrics """
+# pylint: disable=missing-docstring
+import numpy as np
+from scipy.ndimage import measurements
+
+from batchflow.models.metrics import get_components, label_items, match_instances
+
+
+TARGETS = np.array([[[1, 1, 0, 0, 1],
+                     [0, 0, 0, 0, 1],
+                     [1, 0, 0, 0, 0]],
+
+                    [[0, 0, 0, 0, 0],
+                     [0, 0, 0, 0, 0],
+                     [0, 0, 0, 0, 0]],
+
+                    [[0, 1, 1, 1, 0],
+                     [0, 0, 0, 0, 0],
+                     [0, 0, 0, 0, 0]]])
+
+PREDICTIONS = np.array([[[1, 0, 0, 0, 0],
+                         [0, 0, 0, 0, 1],
+                         [0, 0, 1, 1, 0]],
+
+                        [[1, 0, 0, 0, 0],
+                         [0, 0, 0, 0, 0],
+                         [0, 0, 0, 0, 0]],
+
+                        [[0, 0, 0, 1, 0],
+                         [0, 0, 0, 1, 0],
+                         [0, 0, 0, 1, 0]]])
+
+
+def test_label_items():
+    labels, items = label_items(TARGETS > 0)
+    assert labels.max() == 4
+    assert list(items) == [0, 0, 0, 0, 2]
+    assert (labels[1] == 0).all()
+
+
+def test_match_instances():
+    true_positive, false_negative, false_positive = match_instances(TARGETS, PREDICTIONS, iot=.5)
+    assert list(true_positive) == [2, 0, 0]
+    assert list(false_negative) == [1, 0, 1]
+    assert list(false_positive) == [1, 1, 0]
+
+
+def test_get_components():
+    components = get_components(TARGETS, batch=True)
+    for item, item_components in zip(TARGETS, components):
+        labels, num_components = measurements.label(item)
+        assert len(item_components) == num_components
+        for j, coords in enumerate(item_components):
+            assert (np.stack(coords) == np.stack(np.where(labels == j + 1))).all()
@@ -0,0 +1,81 @@
+""" Test streaming accumulation of classification metrics and confusion matrix counting """
+# pylint: disable=missing-docstring, redefined-outer-name, protected-access
+import numpy as np
+import pytest
+
+from batchflow import Dataset, B, V
+from batchflow.models.metrics import ClassificationMetrics, SegmentationMetricsByInstances, get_confusion_matrix
+
+
+SIZE = 100
+NUM_CLASSES = 4
+
+
+@pytest.fixture
+def data():
+    rng = np.random.RandomState(42)
+    targets = rng.randint(0, NUM_CLASSES, (SIZE, 6, 6))
+    predictions = np.where(rng.rand(SIZE, 6, 6) > .3, targets, rng.randint(0, NUM_CLASSES, (SIZE, 6, 6)))
+    return targets, predictions
+
+
+def gather(data, stream, prefetch=0, metrics_class='class', num_classes=NUM_CLASSES):
+    pipeline = (Dataset(SIZE, preloaded=data).p
+                .init_variable('metrics')
+                .gather_metrics(metrics_class, targets=B.data[0], predictions=B.data[1], fmt='labels',
+                                num_classes=num_classes, stream=stream, save_to=V('metrics', mode='u')))
+    pipeline.run(8, n_epochs=1, prefetch=prefetch)
+    return pipeline.v('metrics')
+
+
+@pytest.mark.parametrize('prefetch', [0, 3])
+def test_stream_total(data, prefetch):
+    expected = ClassificationMetrics(*data, fmt='labels', num_classes=NUM_CLASSES)
+    metrics = gather(data, True, prefetch)
+
+    assert metrics._confusion_matrix.shape == (1, NUM_CLASSES, NUM_CLASSES)
+    assert (metrics.confusion_matrix == expected.confusion_matrix).all()
+    assert np.isclose(metrics.evaluate('accuracy'), expected.evaluate('accuracy'))
+
+
+@pytest.mark.parametrize('prefetch', [0, 3])
+def test_stream_items(data, prefetch):
+    expected = ClassificationMetrics(*data, fmt='labels', num_classes=NUM_CLASSES)
+    metrics = gather(data, 'items', prefetch)
+
+    assert metrics._confusion_matrix.shape == (SIZE, NUM_CLASSES, NUM_CLASSES)
+    assert (metrics.confusion_matrix == expected.confusion_matrix).all()
+    if prefetch == 0:
+        assert (metrics._confusion_matrix == expected._confusion_matrix).all()
+        assert np.allclose(metrics.evaluate('recall', agg=None), expected.evaluate('recall', agg=None))
+        assert (metrics[10:12]._confusion_matrix == expected._confusion_matrix[10:12]).all()
+
+
+def test_stream_instances(data):
+    binary = tuple((item > 1).astype(int) for item in data)
+    expected = SegmentationMetricsByInstances(*binary, fmt='labels', num_classes=2)
+    metrics = gather(binary, True, metrics_class=SegmentationMetricsByInstances, num_classes=2)
+
+    assert (metrics.confusion_matrix == expected.confusion_matrix).all()
+
+
+def test_copy_detaches_stream(data):
+    metrics = ClassificationMetrics(data[0][:5], data[1][:5], fmt='labels', num_classes=NUM_CLASSES, stream=True)
+    metrics.update(ClassificationMetrics(data[0][5:], data[1][5:], fmt='labels', num_classes=NUM_CLASSES))
+    copied = metrics.copy()
+    copied.update(metrics)
+
+    assert (copied.confusion_matrix == 2 * metrics.confusion_matrix).all()
+
+
+@pytest.mark.parametrize('chunk_size', [None, 7, 36, 100])
+def test_confusion_matrix_chunks(data, chunk_size):
+    targets, predictions = data
+    targets = np.where(targets == 3, -1, targets)
+    expected = np.zeros((SIZE, NUM_CLASSES, NUM_CLASSES), dtype=np.intp)
+    for i, (targ, pred) in enumerate(zip(targets, predictions)):
+        for t, p in zip(targ.ravel(), pred.ravel()):
+            if t >= 0:
+                expected[i, p, t] += 1
+
+    assert (get_confusion_matrix(targets, predictions, NUM_CLASSES, chunk_size) == expected).all()
@@ -2,6 +2,7 @@
 import sys
 from contextlib import ExitStack as does_not_raise
 
+import numpy as np
 import pytest
 
 sys.path.append('..')
@@ -105,3 +106,52 @@ def test_d(size, n_splits):
             pipeline.run(1)
 
             assert pipeline.v('indices') == result[:start] + result[end:]
+
+
+@pytest.mark.parametrize('expr, vectorized', [
+    (R('normal', 0, 1), True),
+    (R(['a', 'b', 'c'], p=[.2, .3, .5]), True),
+    (R('normal', 0, 1, size=2), False),
+    (R('uniform', 0, R('uniform', 1, 2)), False),
+    (R('choice', 100, replace=False), False),
+    (R(np.arange(100), replace=False), False),
+    (R('choice', 100, replace=True), True),
+    (R('uniform', [0, 0], [1, 2]), True),
+    (R('normal', loc=[0, 10]), True),
+    (R('multivariate_normal', [0, 10], np.eye(2)), True),
+])
+def test_p_sample(expr, vectorized):
+    batch = Dataset(50).create_batch(np.arange(50))
+    assert expr.can_sample() == vectorized
+    value = P(expr).get(batch=batch, parallel=True)
+    assert np.shape(value) == (50, *np.shape(expr.get(batch=batch)))
+    assert len(np.unique(value)) > 1
+
+def test_p_sample_without_replacement():
+    batch = Dataset(8).create_batch(np.arange(8))
+    value = P(R('choice', [1, 2, 3], replace=False)).get(batch=batch, parallel=True)
+    assert len(value) == 8
+    assert set(value) <= {1, 2, 3}
+
+def test_batch_random_state():
+    batch = Dataset(10).create_batch(np.arange(10))
+    batch.random_state = np.random.RandomState(3)
+    expected = np.random.RandomState(3).normal(size=10)
+    assert np.allclose(P(R('normal')).get(batch=batch, parallel=True), expected)
+
+    batch.random_state = np.random.RandomState(3)
+    assert R('uniform', seed=5).get(batch=batch) == np.random.RandomState(5).uniform()
+
+@pytest.mark.parametrize('prefetch', [0, 4])
+def test_random_seed(prefetch):
+    def run(seed):
+        values = {}
+        (Dataset(50).p
+         .call(lambda batch, value: values.update({batch.indices[0]: value}), R('uniform'))
+         .run(5, n_epochs=1, prefetch=prefetch, random_seed=seed))
+        return values
+
+    values = run(42)
+    assert len(values) == 10
+    assert values == run(42)
+    assert values != run(43)
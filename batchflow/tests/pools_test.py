@@ -0,0 +1,146 @@
+""" Test worker pools shared by parallel actions """
+# pylint: disable=missing-docstring, redefined-outer-name, protected-access
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from batchflow import Dataset, DatasetIndex, Batch, Pipeline, action, inbatch_parallel
+from batchflow.exceptions import SkipBatchException
+from batchflow.pools import PoolDirectory, SharedMemoryExecutor, _pickle_batch, _unpickle_batch
+
+
+class Counter:
+    def __init__(self):
+        self.current = 0
+        self.max = 0
+        self.lock = threading.Lock()
+
+
+class MyBatch(Batch):
+    components = ('images',)
+
+    @action
+    @inbatch_parallel(init='indices', post='_assemble', dst='images')
+    def double(self, ix):
+        return self.images[self.index.get_pos(ix)] * 2
+
+    @action
+    @inbatch_parallel(init='indices')
+    def record_concurrency(self, _, counter):
+        with counter.lock:
+            counter.current += 1
+            counter.max = max(counter.max, counter.current)
+        time.sleep(.01)
+        with counter.lock:
+            counter.current -= 1
+
+    @action
+    @inbatch_parallel(init='indices')
+    def nested(self, _):
+        self.record_pool()
+
+    @inbatch_parallel(init='indices')
+    def record_pool(self, _):
+        return threading.current_thread().name
+
+    @action
+    def record_pid(self):
+        self.images = self.images + os.getpid()
+        return self
+
+    @action
+    def skip_odd(self):
+        if self.indices[0] % 2:
+            raise SkipBatchException
+        return self
+
+
+@pytest.fixture
+def dataset():
+    return Dataset(20, batch_class=MyBatch, preloaded=(np.arange(20),))
+
+
+def test_pool_is_reused(dataset):
+    pipeline = dataset.p.double()
+    pools = []
+    pipeline = pipeline.call(lambda batch: pools.append(batch.pipeline.pools.get('threads')))
+    pipeline.run(5, n_epochs=1)
+
+    assert len(pools) == 4
+    assert all(pool is pools[0] for pool in pools)
+
+
+def test_reset_shuts_pools_down(dataset):
+    pipeline = (dataset.p.double() << dataset)
+    batch = pipeline.next_batch(5)
+    assert (batch.images == np.arange(5) * 2).all()
+    assert 'threads' in pipeline.pools.pools
+
+    pipeline.reset('iter')
+    assert pipeline.pools.pools == {}
+
+
+def test_n_workers_limits_tasks(dataset):
+    counter = Counter()
+    pipeline = Pipeline().record_concurrency(counter, n_workers=2) << dataset
+    pipeline.run(10, n_epochs=1)
+
+    assert 1 <= counter.max <= 2
+
+
+def test_nested_calls(dataset):
+    pipeline = dataset.p.nested()
+    pipeline.pools.max_workers = 2
+    pipeline.run(10, n_epochs=1)
+
+
+def test_pickle_drops_executors():
+    pools = PoolDirectory(max_workers=3)
+    pools.get('threads')
+    state = pools.__getstate__()
+    assert state == {'max_workers': 3}
+    pools.shutdown()
+
+
+@pytest.mark.skipif(not SharedMemoryExecutor.available(), reason="shared memory is not supported")
+@pytest.mark.parametrize('attr, out_of_band', [(None, True), (lambda x: x, False)])
+def test_pickle_batch(dataset, attr, out_of_band):
+    batch = dataset.create_batch(dataset.indices[:5])
+    batch.fn = attr
+    payload, buffers = _pickle_batch(batch)
+    assert (len(buffers) > 0) == out_of_band
+
+    restored = _unpickle_batch(payload, buffers)
+    assert (restored.images == np.arange(5)).all()
+    assert restored.pipeline is None and restored._preloaded is None
+
+
+def test_mpc_prefetch(dataset):
+    pipeline = dataset.p.double().record_pid()
+    batches = list(pipeline.gen_batch(4, n_epochs=1, prefetch=2, target='mpc'))
+
+    assert len(batches) == 5
+    images = np.concatenate([batch.images for batch in batches])
+    pids = images - np.arange(20) * 2
+    assert os.getpid() not in pids
+    assert all(batch.pipeline is pipeline for batch in batches)
+    assert not batches[0].images.flags.owndata
+
+
+@pytest.mark.skipif(not SharedMemoryExecutor.available(), reason="shared memory is not supported")
+def test_mpc_prefetch_skip(dataset):
+    pipeline = dataset.p.skip_odd()
+    batches = list(pipeline.gen_batch(1, n_epochs=1, prefetch=1, target='mpc'))
+    indices = sorted(batch.indices[0] for batch in batches)
+    assert indices == list(range(0, 20, 2))
+
+
+@pytest.mark.skipif(not SharedMemoryExecutor.available(), reason="shared memory is not supported")
+def test_mpc_prefetch_index(dataset):
+    batches = list(dataset.p.double().gen_batch(4, shuffle=1, n_epochs=1, prefetch=2, target='mpc'))
+    for batch in batches:
+        assert type(batch.index) is DatasetIndex
+        assert (batch.images == batch.indices * 2).all()
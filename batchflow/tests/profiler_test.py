@@ -0,0 +1,62 @@
+""" Test pipeline profiling """
+# pylint: disable=missing-docstring, redefined-outer-name
+import pytest
+
+from batchflow import Dataset, Batch, action
+from batchflow.profiler import ProfileStore
+
+
+class MyBatch(Batch):
+    @action
+    def work(self):
+        sum(range(1000))
+        return self
+
+
+@pytest.fixture
+def pipeline():
+    return Dataset(20, batch_class=MyBatch).p.work()
+
+
+@pytest.mark.parametrize('profile, detailed', [(True, True), ('detailed', True), ('time', False)])
+def test_profile_info(pipeline, profile, detailed):
+    pipeline.run(5, n_epochs=1, profile=profile)
+    info = pipeline.profile_info
+
+    assert list(info.index.names) == ['action', 'id']
+    assert sorted(info['iter'].unique()) == [1, 2, 3, 4]
+    assert ('ncalls' in info.columns) is detailed
+    assert (info['total_time'] >= info['eval_expr_time']).all()
+
+    result = pipeline.show_profile_info()
+    assert list(result.index) == ['work #0']
+    if detailed:
+        assert len(pipeline.show_profile_info(detailed=True)) > 0
+    else:
+        with pytest.raises(ValueError):
+            pipeline.show_profile_info(detailed=True)
+
+
+def test_no_profile_info(pipeline):
+    pipeline.run(5, n_epochs=1)
+    assert pipeline.profile_info is None
+    with pytest.raises(ValueError):
+        pipeline.show_profile_info()
+
+
+def test_profile_every(pipeline):
+    pipeline.run(2, n_epochs=1, profile='time', profile_every=3)
+    assert list(pipeline.profile_info['iter']) == [3, 6, 9]
+
+
+def test_profile_accumulates(pipeline):
+    pipeline.run(5, n_epochs=1, profile='time')
+    pipeline.run(5, n_epochs=1, profile='time')
+    assert len(pipeline.profile_info) == 8
+
+
+def test_store_grows():
+    store = ProfileStore(detailed=False, capacity=2)
+    for i in range(5):
+        store.add('action', i, 0, exec_time=i, start_time=0, eval_expr_time=0)
+    assert list(store.info['total_time']) == list(range(5))
@@ -0,0 +1,46 @@
+""" Test reading files of upcoming batches in advance """
+# pylint: disable=missing-docstring, redefined-outer-name, protected-access
+import os
+
+import numpy as np
+import PIL.Image
+import pytest
+
+from batchflow import Dataset, FilesIndex, ImagesBatch
+
+
+SIZE = 12
+
+
+@pytest.fixture
+def images_dir(tmp_path):
+    images = np.random.randint(0, 256, size=(SIZE, 8, 8, 3)).astype(np.uint8)
+    for i, image in enumerate(images):
+        PIL.Image.fromarray(image).save(str(tmp_path / '{:02d}.png'.format(i)))
+    return str(tmp_path), images
+
+
+def test_read_ahead_images(images_dir):
+    path, images = images_dir
+    index = FilesIndex(path=os.path.join(path, '*.png'), no_ext=True, sort=True)
+    dataset = Dataset(index, batch_class=ImagesBatch).read_ahead(n_batches=2)
+    pipeline = dataset.p.load(fmt='image', dst='images')
+
+    batches = []
+    for i, batch in enumerate(pipeline.gen_batch(3, n_epochs=1)):
+        batches.append(batch)
+        if i == 1:
+            # files of the next two batches are being read
+            expected = {index.get_fullpath(ix) for ix in index.indices[6:12]}
+            assert expected <= set(dataset.reader._files)
+
+    for batch in batches:
+        positions = [int(ix) for ix in batch.indices]
+        assert (np.stack([np.asarray(image) for image in batch.images]) == images[positions]).all()
+
+
+def test_read_ahead_off():
+    dataset = Dataset(10).read_ahead(n_batches=2)
+    assert dataset.reader is not None
+    dataset.read_ahead(None)
+    assert dataset.reader is None
@@ -4,12 +4,17 @@ import numpy as np
 import pytest
 
 from batchflow import Dataset, Pipeline, Batch
+from batchflow.rebatch import RebatchBuffer
 
 
 class MyBatch(Batch):
     components = ('dummy', )
 
 
+class TwoComponentsBatch(Batch):
+    components = ('images', 'labels')
+
+
 DATASET_SIZE = 60
 PARAMETERS = [(20, 30), (1, 10), (10, 60), (1, 60), (15, 40), (13, 17)]
 PARAMETERS = PARAMETERS + [(b, a) for a, b in PARAMETERS]
@@ -69,3 +74,71 @@ def test_merge(merge_factor):
     assert merged.dummy.shape[0] == b.dummy.shape[0] * merge_factor
     assert merged.dummy.shape[1] == b.dummy.shape[1]
     assert rest is None
+
+
+@pytest.mark.parametrize('prefetch, inner_prefetch', [(0, 2), (2, None), (3, 0)])
+def test_rebatch_prefetch(prefetch, inner_prefetch):
+    """ checks that rebatch with prefetch on both sides keeps the order of items """
+    data = (np.arange(DATASET_SIZE).reshape(-1, 1), )
+    dataset = Dataset(index=DATASET_SIZE, batch_class=MyBatch, preloaded=data)
+
+    items = []
+    p = (Pipeline()
+         .rebatch(7, prefetch=inner_prefetch)
+         .call(lambda batch: items.append(batch.dummy[:, 0].tolist()))
+         ) << dataset
+
+    p.run(batch_size=4, n_epochs=1, prefetch=prefetch)
+
+    assert sorted(items) == [list(range(i, min(i + 7, DATASET_SIZE))) for i in range(0, DATASET_SIZE, 7)]
+
+
+@pytest.mark.parametrize('sizes, batch_size', [([3, 5, 2, 7], 4), ([10], 3), ([1, 1, 1], 5), ([4, 4], 4)])
+def test_buffer_as_merge(sizes, batch_size):
+    """ checks that the rebatch buffer gives the same batches as merging batches one by one """
+    start, batches = 0, []
+    for size in sizes:
+        images = np.random.rand(size, 2, 3)
+        labels = np.arange(start, start + size) if start > 0 else np.arange(size, dtype=np.int32)
+        batches.append(TwoComponentsBatch.from_data(np.arange(size), (images, labels)))
+        start += size
+
+    buffer = RebatchBuffer(batch_size)
+    result = [batch for item in batches for batch in buffer.put(item)] + [buffer.flush()]
+
+    expected, rest = [], None
+    for item in batches:
+        rest = item if rest is None else TwoComponentsBatch.merge([rest, item])[0]
+        while rest is not None and len(rest) >= batch_size:
+            batch, rest = TwoComponentsBatch.merge([rest], batch_size=batch_size)
+            expected.append(batch)
+    expected.append(rest)
+
+    assert len(result) == len(expected)
+    for batch, expected_batch in zip(result, expected):
+        assert (batch is None) == (expected_batch is None)
+        if batch is not None:
+            assert batch.components == ('images', 'labels')
+            assert np.array_equal(batch.images, expected_batch.images)
+            assert np.array_equal(batch.labels, expected_batch.labels)
+            assert batch.labels.dtype == expected_batch.labels.dtype
+
+
+def test_buffer_none_component():
+    """ checks that components which are None only in some batches are not allowed """
+    buffer = RebatchBuffer(10)
+    buffer.put(TwoComponentsBatch.from_data(np.arange(3), (np.zeros(3), np.zeros(3))))
+    with pytest.raises(ValueError):
+        buffer.put(TwoComponentsBatch.from_data(np.arange(3), (np.zeros(3), None)))
+
+
+@pytest.mark.parametrize('shape', [(2, 1), (2,), (2, 3, 1)])
+def test_buffer_item_shapes(shape):
+    """ checks that items of different shapes are not broadcast """
+    buffer = RebatchBuffer(10)
+    buffer.put(TwoComponentsBatch.from_data(np.arange(2), (np.zeros((2, 3)), np.zeros(2))))
+    with pytest.raises(ValueError):
+        buffer.put(TwoComponentsBatch.from_data(np.arange(2), (np.ones(shape), np.zeros(2))))
+    with pytest.raises(ValueError):
+        TwoComponentsBatch.merge([TwoComponentsBatch.from_data(np.arange(2), (np.zeros((2, 3)), np.zeros(2))),
+                                  TwoComponentsBatch.from_data(np.arange(2), (np.ones(shape), np.zeros(2)))])
@@ -11,7 +11,9 @@ import pytest
 import numpy as np
 np.seterr(divide='ignore', invalid='ignore')
 
+from batchflow import Dataset, B, V
 from batchflow.models.metrics import RegressionMetrics
+from batchflow.models.metrics.regression import QuantileSketch
 
 PARAMS_DEFINED = [(None, 'mae', [1.5, 0.25]),
                   (None, 'mse', [3, 0.25]),
@@ -84,3 +86,57 @@ def test_single_value(agg, targets, predictions, metric_name, exp_res):
         assert np.isnan(res).all()
     else:
         assert res == exp_res
+
+
+@pytest.mark.parametrize('output_agg, metric_name, exp_res', PARAMS_DEFINED)
+def test_stream_defined_values(output_agg, metric_name, exp_res):
+    metrics = RegressionMetrics([1, 1], [1, 0], weights=[1], multi=True, stream=True)
+    metrics.update(RegressionMetrics([2, 2], [4, 2], weights=[3], multi=True))
+    res = metrics.evaluate(metrics=metric_name, agg=output_agg)
+    assert np.allclose(res, exp_res, atol=0.01, rtol=0.01)
+
+
+def test_stream_copy_merge():
+    metrics = RegressionMetrics([1, 1], [1, 0], weights=[1], multi=True, stream=True)
+    copied = metrics.copy()
+    copied.update(RegressionMetrics([2, 2], [4, 2], weights=[3], multi=True, stream=True))
+    assert metrics.stats.weight.tolist() == [1, 1]
+
+    metrics.merge(copied.stats)
+    assert metrics.stats.weight.tolist() == [5, 5]
+    assert np.allclose(metrics.evaluate('max_error', agg=None), [2, 1])
+
+
+@pytest.mark.parametrize('prefetch', [0, 3])
+def test_stream_gather(prefetch):
+    rng = np.random.RandomState(42)
+    targets = rng.randn(1000, 2)
+    predictions = targets + rng.randn(1000, 2) * [.1, 2]
+    expected = RegressionMetrics(targets, predictions, multi=True)
+
+    pipeline = (Dataset(len(targets), preloaded=(targets, predictions)).p
+                .init_variable('metrics')
+                .gather_metrics('regression', targets=B.data[0], predictions=B.data[1], multi=True,
+                                stream=True, relative_accuracy=.005, save_to=V('metrics', mode='u')))
+    pipeline.run(64, n_epochs=1, prefetch=prefetch)
+    metrics = pipeline.v('metrics')
+
+    for name in ['mae', 'mse', 'r2', 'explained_variance_ratio', 'max_error']:
+        assert np.allclose(metrics.evaluate(name, agg=None), expected.evaluate(name, agg=None))
+    assert np.allclose(metrics.evaluate('median_absolute_error', agg=None),
+                       expected.evaluate('median_absolute_error', agg=None), rtol=.01)
+
+
+def test_sketch_bounded():
+    rng = np.random.RandomState(42)
+    values = np.exp(rng.uniform(-30, 30, size=(10000, 1)))
+    sketch = QuantileSketch(relative_accuracy=.01, max_buckets=1000)
+    for chunk in np.array_split(values, 10):
+        other = QuantileSketch(relative_accuracy=.01, max_buckets=1000)
+        other.add(chunk)
+        sketch.merge(other)
+
+    assert sketch.counts.shape[1] <= 1000
+    assert sketch.count[0] == len(values)
+    for q in [.9, .99]:
+        assert np.isclose(sketch.quantile(q)[0], np.quantile(values, q), rtol=.02)
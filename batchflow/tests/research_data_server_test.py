@@ -0,0 +1,62 @@
+""" Test data server for root pipelines of research """
+# pylint: disable=missing-docstring, redefined-outer-name
+import os
+
+import numpy as np
+import pytest
+
+from batchflow import Dataset, Pipeline, B, V, C
+from batchflow.research import Research, Option, DataServer
+from batchflow.research.data_server import shared_memory
+
+pytestmark = pytest.mark.skipif(shared_memory is None, reason='requires Python 3.8')
+
+
+def make_research(n_epochs):
+    dataset = Dataset(20, preloaded=np.arange(20))
+    root = dataset.p.run_later(5, n_epochs=n_epochs, shuffle=True)
+    branch = (Pipeline()
+              .init_variable('s', 0)
+              .init_variable('n', 0)
+              .update(V('s'), V('s') + B.data.sum() * C('k'))
+              .update(V('n'), V('n') + 1))
+    return Research().add_pipeline(root, branch, variables=['s', 'n'], name='ppl', dump='last')
+
+
+@pytest.mark.parametrize('n_epochs', [1, None])
+def test_clients_share_batches(n_epochs):
+    research = make_research(n_epochs)
+    server = DataServer(research.executables, buffer=2).start()
+    try:
+        clients = [server.client(), server.client()]
+        batches = [[], []]
+        for _ in range(4):
+            for client, items in zip(clients, batches):
+                items.append(client.next_batch('ppl').indices)
+        assert all((first == second).all() for first, second in zip(*batches))
+        assert len(np.unique(np.concatenate(batches[0]))) == 20
+
+        if n_epochs == 1:
+            with pytest.raises(StopIteration):
+                clients[0].next_batch('ppl')
+            clients[0].reset('ppl')
+            assert len(clients[0].next_batch('ppl').indices) == 5
+        for client in clients:
+            client.close()
+    finally:
+        server.stop()
+
+
+@pytest.mark.parametrize('n_epochs, n_iters', [(1, None), (None, 8)])
+def test_research_data_server(tmp_path, n_epochs, n_iters):
+    results = []
+    for data_server in [False, True]:
+        research = make_research(n_epochs).init_domain(Option('k', [1, 2, 3, 4, 5]))
+        research.run(n_iters, name=str(tmp_path / str(data_server)), workers=2, branches=2, data_server=data_server)
+        results.append(research.load_results().df.groupby('k')[['s', 'n']].max())
+    assert results[0].n.equals(results[1].n)
+    if n_epochs == 1:
+        # each job reads the whole epoch, while jobs reading an endless root may join it in the middle of an epoch
+        assert results[0].equals(results[1])
+        assert (results[1].s == 190 * results[1].index.astype(int)).all()
+    assert not any(name.startswith('psm_') for name in os.listdir('/dev/shm'))
@@ -0,0 +1,68 @@
+""" Test storage and loading of research results """
+# pylint: disable=missing-docstring, redefined-outer-name
+import os
+import json
+
+import dill
+import numpy as np
+import pytest
+
+from batchflow.research import Results
+from batchflow.research.domain import ConfigAlias
+from batchflow.research.results import dump_chunk
+
+
+N_ITERS = 6
+
+
+@pytest.fixture
+def research_path(tmp_path):
+    path = str(tmp_path)
+    for folder in ['configs', 'description', 'results']:
+        os.makedirs(os.path.join(path, folder))
+    description = {'executables': {'train': {'variables': ['loss', 'mask']}, 'test': {'variables': ['info']}}}
+    with open(os.path.join(path, 'description', 'research.json'), 'w') as file:
+        json.dump(description, file)
+
+    for k in range(3):
+        config = ConfigAlias([('k', k), ('repetition', 0), ('update', 0)])
+        with open(os.path.join(path, 'configs', config.alias(as_string=True)), 'wb') as file:
+            dill.dump(config, file)
+        experiment_path = os.path.join('results', config.alias(as_string=True))
+        os.makedirs(os.path.join(path, experiment_path))
+        for end in range(2, N_ITERS + 1, 2):
+            iterations = [end - 2, end - 1]
+            dump_chunk(path, experiment_path, 'id', 'train', end,
+                       {'loss': [k * 10 + it for it in iterations], 'mask': [np.full(2, it) for it in iterations],
+                        'iteration': iterations})
+        dump_chunk(path, experiment_path, 'id', 'test', N_ITERS,
+                   {'info': [{'k': k}, 'text'], 'iteration': [1, N_ITERS - 1]})
+    return path
+
+
+def test_load_all(research_path):
+    df = Results(research_path).df
+    train = df[df.name == 'train'].sort_values(['k', 'iteration'])
+
+    assert len(df) == 3 * (N_ITERS + 2)
+    assert (train.loss.values == [k * 10 + it for k in range(3) for it in range(N_ITERS)]).all()
+    assert all((mask == it).all() for mask, it in zip(train['mask'], train.iteration))
+    assert train['info'].isnull().all()
+    assert list(df[df.name == 'test'].sort_values(['k', 'iteration'])['info'])[:2] == [{'k': 0}, 'text']
+
+
+def test_filter(research_path):
+    df = Results(research_path, names='train', variables='loss', iterations=[1, 4], k=1).df
+
+    assert list(df.columns) == ['name', 'loss', 'iteration', 'sample_index', 'k', 'repetition', 'update']
+    assert list(df.iteration) == [1, 4]
+    assert list(df.loss) == [11, 14]
+
+
+def test_redumped_chunk(research_path):
+    config = ConfigAlias([('k', 0), ('repetition', 0), ('update', 0)])
+    experiment_path = os.path.join('results', config.alias(as_string=True))
+    dump_chunk(research_path, experiment_path, 'id', 'train', 2, {'loss': [-1, -2], 'iteration': [0, 1]})
+
+    df = Results(research_path, names='train', variables='loss', k=0).df
+    assert list(df.sort_values('iteration').loss) == [-1, -2, 2, 3, 4, 5]
@@ -0,0 +1,66 @@
+""" Test research schedulers """
+# pylint: disable=missing-docstring, redefined-outer-name
+import numpy as np
+import pytest
+
+from batchflow import Dataset, Pipeline, V, C
+from batchflow.research import Research, Option, SuccessiveHalving, MedianStopping
+
+
+@pytest.mark.parametrize('brackets, iterations, rungs', [
+    (1, [1, 2, 3, 9, 27], ['0_1', None, '0_3', '0_9', None]),
+    (2, [1, 3, 9], [None, '1_3', '1_9']),
+])
+def test_successive_halving_rungs(brackets, iterations, rungs):
+    scheduler = SuccessiveHalving('ppl', 'loss', min_iters=1, eta=3, max_iters=27, brackets=brackets)
+    sample_index = str(brackets - 1)
+    assert [scheduler.rung(iteration, sample_index) for iteration in iterations] == rungs
+
+
+@pytest.mark.parametrize('mode, value, promote', [('min', 0, True), ('min', 4, False),
+                                                  ('max', 9, True), ('max', 4, False)])
+def test_successive_halving_promote(mode, value, promote):
+    scheduler = SuccessiveHalving('ppl', 'loss', mode=mode, eta=3)
+    assert scheduler.promote(value, [1, 2, 3, 5, 6, 7]) == promote
+    assert scheduler.promote(100, [1])
+
+
+def test_median_stopping():
+    scheduler = MedianStopping('ppl', 'loss', grace=2, every=2, min_samples=2)
+    assert [scheduler.rung(iteration, '0') for iteration in range(1, 6)] == [None, '2', None, '4', None]
+    assert scheduler.promote(10, [1])
+    assert scheduler.promote(1, [1, 2, 3])
+    assert not scheduler.promote(2.5, [1, 2, 3])
+
+
+def test_research_scheduler(tmp_path):
+    dataset = Dataset(10, preloaded=np.arange(10))
+    ppl = (dataset.p
+           .init_variable('loss', 0)
+           .update(V('loss'), V('loss') + C('k'))
+           .run_later(1, n_epochs=None))
+
+    domain = Option('k', [0, 1, 2, 3, 4, 5])
+    research = (Research()
+                .add_pipeline(ppl, variables='loss', name='ppl', dump=1)
+                .add_scheduler(SuccessiveHalving('ppl', 'loss', mode='min', min_iters=2, eta=2, min_samples=1))
+                .init_domain(domain))
+    research.run(8, name=str(tmp_path / 'research'), workers=1, bar=False)
+
+    df = research.load_results(names='ppl').df
+    n_iters = df.groupby('k').iteration.max() + 1
+    assert n_iters['0'] == 8
+    assert (n_iters < 8).any()
+
+    decisions = research.load_results(names='scheduler').df
+    assert set(decisions.decision) == {'promote', 'stop'}
+    stopped = decisions[decisions.decision == 'stop']
+    assert all(n_iters[row.k] == row.iteration + 1 for row in stopped.itertuples())
+
+
+def test_add_scheduler_errors():
+    research = Research().add_pipeline(Pipeline(), variables='loss', name='ppl')
+    with pytest.raises(ValueError):
+        research.add_scheduler(SuccessiveHalving('train', 'loss'))
+    with pytest.raises(ValueError):
+        research.add_scheduler(MedianStopping('ppl', 'acc'))
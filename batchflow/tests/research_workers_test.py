@@ -0,0 +1,39 @@
+""" Test research workers """
+# pylint: disable=missing-docstring, redefined-outer-name
+import os
+
+import numpy as np
+import pytest
+
+from batchflow import Dataset, Pipeline, B, V, C
+from batchflow.research import Research, Option, RC
+
+
+def pid_or_exit(config):
+    if config.config()['k'] == 2:
+        os._exit(1)
+    return os.getpid()
+
+
+@pytest.mark.parametrize('reuse', [False, True])
+def test_reuse_workers(tmp_path, reuse):
+    dataset = Dataset(10, preloaded=np.arange(10))
+    root = dataset.p.run_later(5, n_epochs=1)
+    branch = Pipeline().init_variable('s', 0).update(V('s'), V('s') + B.data.sum() * C('k'))
+
+    research = (Research()
+                .add_pipeline(root, branch, variables='s', name='ppl', execute='last')
+                .add_callable(pid_or_exit, config=RC('ppl'), returns='pid', name='pid', execute='last')
+                .init_domain(Option('k', [0, 1, 2, 3])))
+    research.run(1, name=str(tmp_path / 'research'), reuse_workers=reuse, trials=1)
+
+    df = research.load_results().df
+    sums = df[df.name == 'ppl'].set_index('k').s
+    assert all(sums[k] == 10 * int(k) for k in ['0', '1', '2', '3'])
+
+    pids = df[df.name == 'pid'].set_index('k').pid
+    assert sorted(pids.index) == ['0', '1', '3']
+    if reuse:
+        assert pids['0'] == pids['1'] != pids['3']
+    else:
+        assert len(set(pids)) == 3
@@ -0,0 +1,106 @@
+""" Test vectorized actions of StackedImagesBatch """
+# pylint: disable=missing-docstring, redefined-outer-name
+import numpy as np
+import PIL.Image
+import pytest
+
+from batchflow import Dataset, ImagesBatch, StackedImagesBatch, P, R
+
+
+SIZE = 6
+
+
+@pytest.fixture
+def images():
+    return np.random.RandomState(42).randint(0, 256, size=(SIZE, 20, 30, 3)).astype(np.uint8)
+
+
+def run_per_item(images, action, *args, **kwargs):
+    batch = Dataset(SIZE, batch_class=ImagesBatch).create_batch(np.arange(SIZE))
+    batch.images = np.empty(SIZE, dtype=object)
+    batch.images[:] = [PIL.Image.fromarray(image) for image in images]
+    getattr(batch, action)(*args, **kwargs)
+    return np.stack([np.asarray(image) for image in batch.images])
+
+
+def run_stacked(images, action, *args, **kwargs):
+    batch = Dataset(SIZE, batch_class=StackedImagesBatch).create_batch(np.arange(SIZE))
+    batch.images = images.copy()
+    getattr(batch, action)(*args, **kwargs)
+    return batch.images
+
+
+@pytest.mark.parametrize('action, args, kwargs', [
+    ('flip', (), dict(mode='lr')),
+    ('flip', (), dict(mode='ud')),
+    ('invert', (), {}),
+    ('clip', (50, 200), {}),
+    ('crop', ((3, 2), (10, 8)), {}),
+    ('crop', ((25, 15), (10, 8)), {}),
+    ('shift', ((3, -2),), {}),
+    ('shift', ((3, -2),), dict(mode='wrap')),
+    ('rotate', (30,), {}),
+    ('rotate', (180,), {}),
+    ('posterize', (3,), {}),
+    ('cutout', ((2, 3), (5, 4), (10, 20, 30)), {}),
+])
+def test_same_as_per_item(images, action, args, kwargs):
+    expected = run_per_item(images, action, *args, **kwargs)
+    result = run_stacked(images, action, *args, **kwargs)
+
+    assert isinstance(result, np.ndarray) and result.dtype == np.uint8
+    assert (result == expected).all()
+
+
+def test_item_params(images):
+    modes = ['lr', 'ud'] * (SIZE // 2)
+    result = run_stacked(images, 'flip', mode=P(modes))
+    assert (result[0] == images[0, :, ::-1]).all()
+    assert (result[1] == images[1, ::-1]).all()
+
+    multipliers = np.arange(SIZE) / SIZE
+    result = run_stacked(images, 'multiply', multiplier=P(multipliers))
+    assert np.allclose(result, images * np.float32(multipliers)[:, None, None, None])
+
+
+def test_probability(images):
+    mask = np.array([1, 0] * (SIZE // 2))
+    result = run_stacked(images, 'flip', p=P(mask))
+    assert (result[0] == images[0, :, ::-1]).all()
+    assert (result[1] == images[1]).all()
+
+
+def test_pipeline(images):
+    dataset = Dataset(SIZE, batch_class=StackedImagesBatch, preloaded=(images,))
+    batch = (dataset.p
+             .rotate(angle=P(R('uniform', -30, 30)))
+             .crop(origin='random', shape=(10, 12))
+             .cutout('random', P(R('randint', 2, 5)), 0, p=.5)
+             .next_batch(SIZE))
+    assert batch.images.shape == (SIZE, 12, 10, 3)
+
+
+def test_ragged_fallback(images):
+    ragged = np.empty(3, dtype=object)
+    ragged[:] = [images[0], images[1, :10], images[2, :, :15]]
+    dataset = Dataset(3, batch_class=StackedImagesBatch, preloaded=(ragged,))
+
+    batch = dataset.p.flip().crop('top_left', (4, 5)).next_batch(3)
+    assert batch.images.shape == (3, 5, 4, 3)
+    assert (batch.images[0] == images[0, :5, ::-1][:, :4]).all()
+
+
+@pytest.mark.parametrize('src', ['images', ['images', 'masks']])
+def test_probability_random_state(images, src):
+    def run():
+        batch = Dataset(SIZE, batch_class=StackedImagesBatch).create_batch(np.arange(SIZE))
+        batch.images, batch.masks = images.copy(), images.copy()
+        batch.random_state = np.random.RandomState(7)
+        batch.flip(src=src, dst=src, p=.5)
+        return batch
+
+    mask = np.random.RandomState(7).binomial(1, .5, size=SIZE).astype(bool)
+    batch = run()
+    assert (batch.images[mask] == images[mask, :, ::-1]).all()
+    assert (batch.images[~mask] == images[~mask]).all()
+    assert (batch.masks == run().masks).all()
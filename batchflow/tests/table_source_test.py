@@ -0,0 +1,75 @@
+""" Test row-wise reading of table files """
+# pylint: disable=missing-docstring, redefined-outer-name
+import numpy as np
+import pandas as pd
+import pytest
+
+from batchflow import Dataset, Batch
+from batchflow.sources import TableSource
+
+
+SIZE = 30
+
+
+class MyBatch(Batch):
+    components = ('features', 'labels')
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({'features': np.arange(SIZE) * 10., 'labels': np.arange(SIZE) % 3},
+                        index=np.arange(SIZE) + 100)
+
+
+@pytest.mark.parametrize('index_col', [None, 0])
+def test_csv_rows(tmp_path, frame, index_col):
+    path = str(tmp_path / 'data.csv')
+    frame.to_csv(path, index=index_col is not None)
+    expected = frame.reset_index(drop=True) if index_col is None else frame
+
+    source = TableSource(path, index_col=index_col)
+    indices = expected.index.values[[5, 1, 5, 29]]
+    data = source.read(indices)
+
+    assert (data.index.values == indices).all()
+    assert (data.values == expected.loc[indices].values).all()
+
+
+@pytest.mark.parametrize('index_col', [None, 0])
+def test_csv_multiline_rows(tmp_path, frame, index_col):
+    path = str(tmp_path / 'data.csv')
+    frame['text'] = ['line {}\n"quoted"\nend'.format(i) if i % 4 == 0 else 'row {}'.format(i) for i in range(SIZE)]
+    frame.to_csv(path, index=index_col is not None)
+    expected = frame.reset_index(drop=True) if index_col is None else frame
+
+    source = TableSource(path, index_col=index_col)
+    indices = expected.index.values[[4, 1, 8, 29, 28]]
+    data = source.read(indices)
+
+    assert len(source) == SIZE
+    assert (data.index.values == indices).all()
+    assert (data.values == expected.loc[indices].values).all()
+
+
+def test_csv_unsafe_options(tmp_path, frame):
+    path = str(tmp_path / 'data.csv')
+    frame.to_csv(path, index=False)
+
+    source = TableSource(path, skiprows=[1, 2])
+    data = source.read([0, 1])
+    assert (data.values == frame.values[[2, 3]]).all()
+
+
+def test_opened_once_per_dataset(tmp_path, frame):
+    path = str(tmp_path / 'data.csv')
+    frame.to_csv(path)
+
+    dataset = Dataset(frame.index.values, batch_class=MyBatch)
+    dataset.split(.5)
+    pipeline = dataset.train.p.load(src=path, fmt='csv', index_col=0)
+
+    for batch in pipeline.gen_batch(4, shuffle=True, n_epochs=1):
+        assert (batch.features == frame.loc[batch.indices, 'features'].values).all()
+        assert (batch.labels == frame.loc[batch.indices, 'labels'].values).all()
+
+    assert len(dataset._table_sources) == 1  # pylint: disable=protected-access
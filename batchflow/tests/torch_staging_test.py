@@ -0,0 +1,91 @@
+""" Test staging of TorchModel inputs """
+# pylint: disable=import-error, no-name-in-module, missing-docstring
+import numpy as np
+import pytest
+import torch
+
+from batchflow.models.torch import TorchModel
+from batchflow.models.torch.staging import StagingArea
+
+
+DEVICES = ['cpu', pytest.param('cuda:0', marks=pytest.mark.skipif(not torch.cuda.is_available(), reason='no gpu'))]
+
+
+def test_zero_copy_on_cpu():
+    staging = StagingArea('cpu')
+    array = np.arange(6, dtype=np.float32).reshape(2, 3)
+    tensor = staging.to_device(array)
+    assert np.shares_memory(tensor.numpy(), array)
+
+    tensor = staging.to_device(np.arange(6).reshape(2, 3))
+    assert tensor.dtype == torch.float32
+    assert (tensor.numpy() == array).all()
+
+    staging.wait([tensor, [tensor]])
+
+
+@pytest.mark.parametrize('device', DEVICES)
+def test_staged_values(device):
+    staging = StagingArea(device, slots=2, max_shapes=2)
+    arrays = [np.random.rand(4, 3) * i for i in range(5)] + [np.arange(i + 1) for i in range(3)]
+    tensors = [staging.to_device(array) for array in arrays]
+    staging.wait(tensors)
+    for array, tensor in zip(arrays, tensors):
+        assert str(tensor.device) == device
+        assert np.allclose(tensor.cpu().numpy(), array.astype(np.float32))
+
+
+@pytest.mark.parametrize('device', DEVICES)
+def test_train_with_staging(device):
+    def run(staging):
+        torch.manual_seed(0)
+        config = {'inputs': {'images': {'shape': (8,)}, 'targets': {'shape': (1,)}},
+                  'initial_block': {'inputs': 'images', 'layout': 'f', 'units': 1},
+                  'loss': 'mse', 'device': device, 'staging': staging}
+        model = TorchModel(config)
+        x = np.random.RandomState(0).normal(size=(16, 8)).astype(np.float32)
+        y = np.random.RandomState(1).normal(size=(16, 1))
+        losses = [model.train(x, y, fetches='loss') for _ in range(3)]
+        return losses, model.predict(x, fetches='predictions')
+
+    losses, predictions = run(False)
+    staged_losses, staged_predictions = run(True)
+    assert np.allclose(losses, staged_losses)
+    assert np.allclose(predictions, staged_predictions)
+
+
+def test_wait_stream(monkeypatch):
+    calls = []
+
+    class FakeStream:
+        def __init__(self, name):
+            self.name = name
+
+        def wait_stream(self, stream):
+            calls.append((self.name, stream.name))
+
+    staging = StagingArea('cpu')
+    staging.cuda = True
+    staging.stream = FakeStream('copy')
+    monkeypatch.setattr(torch.cuda, 'current_stream', lambda device=None: FakeStream('compute'))
+    staging.wait([torch.zeros(2), [torch.ones(2)]])
+    assert calls == [('compute', 'copy')]
+
+
+def test_wait_before_compute():
+    config = {'inputs': {'images': {'shape': (8,)}, 'targets': {'shape': (1,)}},
+              'initial_block': {'inputs': 'images', 'layout': 'f', 'units': 1},
+              'loss': 'mse', 'device': 'cpu', 'staging': True}
+    model = TorchModel(config)
+    staging = model.staging
+    assert isinstance(staging, StagingArea)
+
+    calls = []
+    to_device, wait, forward = staging.to_device, staging.wait, model.model.forward
+    staging.to_device = lambda value: calls.append('copy') or to_device(value)
+    staging.wait = lambda tensors: calls.append('wait') or wait(tensors)
+    model.model.forward = lambda *args, **kwargs: calls.append('forward') or forward(*args, **kwargs)
+
+    model.train(np.zeros((4, 8)), np.zeros((4, 1)))
+    assert model.staging is staging
+    assert calls == ['copy', 'copy', 'wait', 'forward']
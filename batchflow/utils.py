@@ -4,9 +4,6 @@ import functools
 import itertools
 
 import numpy as np
-import pandas as pd
-from matplotlib import pyplot as plt
-from matplotlib import colors as mcolors
 
 from .named_expr import NamedExpression
 
@@ -84,6 +81,8 @@ def plot_results_by_config(results, variables, figsize=None, layout=None, **kwar
     layout: 'flat', 'square' or None
         plot arranging strategy when only one variable is needed (default: None, plots are arranged vertically)
     """
+    # pylint: disable=import-outside-toplevel
+    from matplotlib import pyplot as plt
     if isinstance(variables, dict):
         variables = variables.items()
     elif len(variables) == 2 and isinstance(variables[0], str):
@@ -162,6 +161,9 @@ def show_research(df, layouts=None, titles=None, average_repetitions=False, log_
             - ``nrows = 1``
             - ``ncols = len(layouts)``
     """
+    # pylint: disable=import-outside-toplevel
+    from matplotlib import pyplot as plt
+    from matplotlib import colors as mcolors
     if layouts is None:
         layouts = []
         for nlabel, ndf in df.groupby("name"):
@@ -242,6 +244,7 @@ def print_results(df, layout, average_repetitions=False, sort_by=None, ascending
         : DataFrame
         Research results in DataFrame, where indices is a config parameters and colums is `layout` values
     """
+    import pandas as pd # pylint: disable=import-outside-toplevel
     columns = []
     data = []
     index = []
@@ -299,6 +302,8 @@ def plot_images(images, labels=None, proba=None, ncols=5, classes=None, models_n
     kwargs : dict
         Additional keyword arguments for plt.subplots().
     """
+    # pylint: disable=import-outside-toplevel
+    from matplotlib import pyplot as plt
     if isinstance(models_names, str):
         models_names = (models_names, )
     if not isinstance(proba, (list, tuple)):